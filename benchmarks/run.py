@@ -0,0 +1,258 @@
+"""Benchmarks of the generation of help messages.
+
+Measures the throughput (samples per second), the latency per sample
+(p50 and p99) and the peak memory of:
+
+- `HelpGenerator.annotations` with the configuration of every example
+  in examples/*_like.py and examples/git/*.
+- `main.generate_sample` with tests/data/dataset.yaml.
+- The `cli-help-maker` command end to end, in a subprocess.
+
+The results are written to a json file and compared against a baseline,
+the command exits with an error if any benchmark is slower than the
+baseline (beyond the tolerance). The baseline is created from the results
+the first time, or when running with --update-baseline.
+
+$ nox -s benchmarks
+$ nox -s benchmarks -- --samples 200 --filter git
+"""
+
+import ast
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import srsly
+import typer
+from ruamel.yaml import YAML
+
+import cli_help_maker
+from cli_help_maker import main as cli_main
+from cli_help_maker.generator import HelpGenerator
+
+root = Path(__file__).parent.parent
+examples_path = root / "examples"
+dataset_path = root / "tests" / "data" / "dataset.yaml"
+
+# Number of samples to measure the memory, tracemalloc slows down the generation.
+MEMORY_SAMPLES = 50
+
+
+def example_configs() -> dict[str, dict[str, Any]]:
+    """Arguments passed to HelpGenerator in each example.
+
+    They are read from the source of the scripts, to avoid running them.
+    The values are literals or arithmetic on them (i.e. 1 / 15).
+    """
+    paths = sorted(examples_path.glob("*_like.py")) + sorted(
+        (examples_path / "git").glob("*_like.py")
+    )
+    configs = {}
+    for path in paths:
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.Call) and getattr(node.func, "attr", "") == (
+                "HelpGenerator"
+            ):
+                name = path.relative_to(root).with_suffix("").as_posix()
+                configs[name] = {
+                    kw.arg: eval(ast.unparse(kw.value), {"__builtins__": {}})
+                    for kw in node.keywords
+                }
+    return configs
+
+
+def measure(generate: Callable[[int], Any], samples: int, warmup: int) -> dict:
+    """Runs `generate` with the indices of the samples and measures it.
+
+    Args:
+        generate (Callable[[int], Any]): Generates the sample of an index.
+        samples (int): Number of samples to time.
+        warmup (int): Number of samples generated before timing.
+
+    Returns:
+        dict: samples per second, p50 and p99 latency in milliseconds
+            and the peak memory allocated to generate a sample, in MB.
+    """
+    for i in range(warmup):
+        generate(i)
+
+    latencies = []
+    start = time.perf_counter_ns()
+    for i in range(warmup, warmup + samples):
+        t = time.perf_counter_ns()
+        generate(i)
+        latencies.append(time.perf_counter_ns() - t)
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+
+    peak = 0
+    tracemalloc.start()
+    for i in range(min(samples, MEMORY_SAMPLES)):
+        tracemalloc.reset_peak()
+        generate(i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "samples": samples,
+        "samples_per_second": samples / elapsed,
+        "p50_ms": quantiles[49] / 1e6,
+        "p99_ms": quantiles[98] / 1e6,
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def measure_cli(samples: int, workers: int = 1) -> dict:
+    """Runs `cli-help-maker` on tests/data/dataset.yaml with `samples` as size.
+
+    The latency isn't measured per sample, and the peak memory is the
+    maximum resident set size of the process.
+    """
+    yaml = YAML(typ="safe")
+    config = yaml.load(dataset_path.read_text())
+    config["size"] = samples
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        input_path = tmpdir / "dataset.yaml"
+        with open(input_path, "w") as f:
+            yaml.dump(config, f)
+        start = time.perf_counter()
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "cli_help_maker.main",
+                str(input_path),
+                str(tmpdir / "output"),
+                "--seed",
+                "0",
+                "--workers",
+                str(workers),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        elapsed = time.perf_counter() - start
+
+    # Kilobytes in linux, bytes in macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == "darwin":  # pragma: no cover
+        max_rss /= 1024
+    return {
+        "samples": samples,
+        "samples_per_second": samples / elapsed,
+        "p50_ms": None,
+        "p99_ms": None,
+        "peak_memory_mb": max_rss / 1024,
+    }
+
+
+def run_benchmarks(samples: int, warmup: int, keyword: str | None = None) -> dict:
+    """Runs every benchmark whose name contains `keyword`."""
+    benchmarks = {}
+    for name, kwargs in example_configs().items():
+        benchmarks[name] = lambda kwargs=kwargs: measure(
+            lambda i: HelpGenerator(seed=i, **kwargs).annotations, samples, warmup
+        )
+
+    def dataset() -> dict:
+        sampler = cli_main.compile_config(cli_main.load_config(dataset_path))
+        return measure(
+            lambda i: cli_main.generate_sample(i, 0, sampler), samples, warmup
+        )
+
+    benchmarks["tests/data/dataset"] = dataset
+    benchmarks["cli-help-maker"] = lambda: measure_cli(samples)
+
+    results = {}
+    for name, benchmark in benchmarks.items():
+        if keyword and keyword not in name:
+            continue
+        results[name] = benchmark()
+        print(f"{name:<40} {results[name]['samples_per_second']:>10.1f} samples/s")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Benchmarks slower than the baseline.
+
+    A benchmark is a regression if its throughput is lower, or its p99
+    latency higher, than the baseline by more than `tolerance` (relative).
+    """
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if reference is None:
+            continue
+        if current["samples_per_second"] < reference["samples_per_second"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{name}: {current['samples_per_second']:.1f} samples/s "
+                f"(baseline {reference['samples_per_second']:.1f})"
+            )
+        if reference["p99_ms"] and current["p99_ms"] > reference["p99_ms"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{name}: p99 {current['p99_ms']:.2f} ms "
+                f"(baseline {reference['p99_ms']:.2f})"
+            )
+    return regressions
+
+
+def main(
+    samples: int = typer.Option(500, min=2, help="Samples timed per benchmark."),
+    warmup: int = typer.Option(20, min=0, help="Samples generated before timing."),
+    keyword: Optional[str] = typer.Option(
+        None,
+        "--filter",
+        help="Run only the benchmarks whose name contains this string.",
+    ),
+    output: Path = typer.Option(
+        root / "benchmarks" / "results.json", help="Path of the results."
+    ),
+    baseline: Path = typer.Option(
+        root / "benchmarks" / "baseline.json", help="Results to compare against."
+    ),
+    update_baseline: bool = typer.Option(
+        False, help="Store the results as the new baseline."
+    ),
+    tolerance: float = typer.Option(
+        0.2, min=0, help="Relative slowdown allowed before failing."
+    ),
+):
+    """Runs the benchmarks and compares them against the baseline."""
+    results = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": cli_help_maker.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": run_benchmarks(samples, warmup, keyword=keyword),
+    }
+    srsly.write_json(output, results)
+
+    if update_baseline or not baseline.is_file():
+        srsly.write_json(baseline, results)
+        print(f"Baseline written to: {baseline}")
+        return
+
+    regressions = compare(results, srsly.read_json(baseline), tolerance)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise typer.Exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,219 @@
+"""Streaming compression of the jsonl files of a dataset.
+
+The lines are compressed (gzip, or zstd which requires zstandard) in a
+background thread, so the compression overlaps with the generation of
+the samples. The output is split in independent frames (gzip members) of
+at least `frame_size` uncompressed bytes, concatenated in the same file:
+
+- Any reader of the format reads the file as a single stream.
+- A frame ends on every checkpoint, so a file can be truncated to the size
+  it had in the checkpoint and continued, as the uncompressed ones.
+
+`open_compressed` reads any of the files, compressed or not.
+"""
+
+import gzip
+import io
+import queue
+import threading
+import zlib
+from enum import Enum
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator
+
+import srsly
+
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover
+    zstandard = None
+
+# Uncompressed bytes per frame.
+DEFAULT_FRAME_SIZE = 1 << 22
+# Uncompressed bytes sent to the background thread at once.
+CHUNK_SIZE = 1 << 16
+
+
+class Compression(str, Enum):
+    """Compression of the jsonl files."""
+
+    zstd = "zstd"
+    gzip = "gzip"
+
+    @property
+    def suffix(self) -> str:
+        """Added to the extension of the files."""
+        return ".zst" if self is Compression.zstd else ".gz"
+
+
+class _GzipFrames:
+    """Each frame is a gzip member (with mtime 0, the output is reproducible)."""
+
+    def __init__(self, level: int | None) -> None:
+        self.level = 6 if level is None else level
+
+    def new_frame(self) -> Any:
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    @staticmethod
+    def flush(frame: Any) -> bytes:
+        return frame.flush(zlib.Z_SYNC_FLUSH)
+
+    @staticmethod
+    def end(frame: Any) -> bytes:
+        return frame.flush()
+
+
+class _ZstdFrames:
+    """Each frame is a zstd frame, compressed with the same context."""
+
+    def __init__(self, level: int | None) -> None:
+        if zstandard is None:  # pragma: no cover
+            raise ModuleNotFoundError(
+                "zstd compression requires zstandard, install it with: "
+                "pip install cli-help-maker[zstd]"
+            )
+        self._compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+
+    def new_frame(self) -> Any:
+        return self._compressor.compressobj()
+
+    @staticmethod
+    def flush(frame: Any) -> bytes:
+        return frame.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    @staticmethod
+    def end(frame: Any) -> bytes:
+        return frame.flush()
+
+
+class BackgroundCompressor:
+    """Compresses the data written in a background thread.
+
+    The data is buffered in chunks of CHUNK_SIZE bytes before being sent to
+    the thread, which writes the compressed bytes with `write`.
+
+    Args:
+        write (Callable[[bytes], None]): Called from the thread with the
+            compressed bytes, in order.
+        compression (Compression): Format of the output.
+        level (int or None, optional): Compression level, the default one
+            of the format if None. Defaults to None.
+        frame_size (int, optional): Minimum number of uncompressed bytes of
+            each frame. Defaults to DEFAULT_FRAME_SIZE.
+
+    Raises:
+        ModuleNotFoundError: If zstd is used and zstandard isn't installed.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[bytes], None],
+        compression: Compression,
+        level: int | None = None,
+        frame_size: int = DEFAULT_FRAME_SIZE,
+    ) -> None:
+        compression = Compression(compression)
+        if compression is Compression.zstd:
+            self._frames = _ZstdFrames(level)
+        else:
+            self._frames = _GzipFrames(level)
+        self._write = write
+        self.frame_size = frame_size
+        self._pending: list[bytes] = []
+        self._pending_size = 0
+        self._error: BaseException | None = None
+        # Bounded to stop the generation if the compression can't keep up.
+        self._queue: queue.Queue = queue.Queue(maxsize=64)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        frame = None
+        frame_size = 0
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is not None:
+                    continue
+                if isinstance(item, bytes):
+                    if frame is None:
+                        frame = self._frames.new_frame()
+                    self._write(frame.compress(item))
+                    frame_size += len(item)
+                    if frame_size < self.frame_size:
+                        continue
+                elif frame is None:
+                    continue
+                elif item == "flush":
+                    self._write(self._frames.flush(frame))
+                    continue
+                # End of the frame
+                self._write(self._frames.end(frame))
+                frame = None
+                frame_size = 0
+            except BaseException as e:  # pragma: no cover
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _submit(self) -> None:
+        if self._pending:
+            self._queue.put(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _wait(self) -> None:
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data: bytes) -> None:
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= CHUNK_SIZE:
+            self._submit()
+
+    def flush(self, end_frame: bool = False) -> None:
+        """Waits until the data is written.
+
+        Args:
+            end_frame (bool, optional): Whether to end the current frame, so the
+                output written so far is complete. Otherwise the data is flushed
+                to be read by a streaming decompressor. Defaults to False.
+        """
+        self._submit()
+        self._queue.put("end" if end_frame else "flush")
+        self._wait()
+
+    def close(self) -> None:
+        self.flush(end_frame=True)
+        self._queue.put(None)
+        self._thread.join()
+
+
+def open_compressed(path: Path) -> BinaryIO:
+    """Opens a file of a dataset for reading, decompressing it if its
+    extension is .gz or .zst."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        if zstandard is None:  # pragma: no cover
+            raise ModuleNotFoundError(
+                "Reading zstd files requires zstandard, install it with: "
+                "pip install cli-help-maker[zstd]"
+            )
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), read_across_frames=True, closefd=True
+        )
+        return io.BufferedReader(reader)
+    return open(path, "rb")
+
+
+def read_jsonl(path: Path) -> Iterator[Any]:
+    """Reads a jsonl file, compressed or not."""
+    with open_compressed(path) as f:
+        for line in f:
+            yield srsly.json_loads(line)
@@ -0,0 +1,170 @@
+"""Word corpus used to name the programs, commands, arguments and options.
+
+The words are loaded the first time they are needed, from the nltk's `words`
+corpus by default. As parsing the nltk corpus takes a while (and every process
+keeps its own copy), the words can be compiled once to a binary file that is
+memory mapped by the processes that use it:
+
+$ python -m cli_help_maker.corpus words.bin
+
+The file is used setting the environment variable CLI_HELP_MAKER_CORPUS
+or the `--corpus` option of cli-help-maker.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import textwrap
+from array import array
+from pathlib import Path
+from typing import Iterable, Sequence
+
+# Header of a compiled corpus: magic, version and number of words.
+_HEADER = struct.Struct("<8sII")
+_MAGIC = b"CHMWORDS"
+_VERSION = 1
+
+CORPUS_ENV_VAR = "CLI_HELP_MAKER_CORPUS"
+
+
+def nltk_words() -> list[str]:
+    """Reads the wordlist corpora defined in:
+    https://www.nltk.org/book/ch02.html#code-unusual
+    """
+    try:
+        from nltk.corpus import words
+
+    except ModuleNotFoundError as e:  # pragma: no cover
+        msg = textwrap.dedent("""
+            To generate words for the command arguments, and options
+            you need the nltk's `words` dataset, otherwise `get_word`
+            function will fail.
+
+            Please use the NLTK Downloader to obtain the resource:
+
+            >>> import nltk
+            >>> nltk.download('words')
+            """)
+        raise ModuleNotFoundError(msg) from e
+
+    return words.words()
+
+
+def compile_corpus(path: Path, words: Iterable[str] | None = None) -> int:
+    """Writes a list of words to a compiled corpus.
+
+    The file contains a header, the offsets of each word (n + 1 unsigned ints)
+    and the words encoded in utf-8 one after the other, in lowercase.
+
+    Args:
+        path (Path): Path of the file to write.
+        words (Iterable[str] or None, optional): Words to write, if None,
+            the nltk's words corpus. Defaults to None.
+
+    Returns:
+        int: number of words written.
+    """
+    if words is None:
+        words = nltk_words()
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for w in words:
+        blob += w.lower().encode("utf8")
+        offsets.append(len(blob))
+
+    if sys.byteorder == "big":  # pragma: no cover
+        offsets.byteswap()
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(offsets) - 1))
+        f.write(offsets.tobytes())
+        f.write(blob)
+
+    return len(offsets) - 1
+
+
+class MappedWords(Sequence[str]):
+    """Words of a compiled corpus, read from a memory mapped file.
+
+    Only the pages of the file that are accessed are loaded, and they are
+    shared between all the processes that map the same file.
+
+    Args:
+        path (Path): Path to a file written by `compile_corpus`.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a compiled corpus: {path}")
+
+        start = _HEADER.size
+        end = start + (size + 1) * 4
+        if sys.byteorder == "big":  # pragma: no cover
+            offsets = array("I", self._mmap[start:end])
+            offsets.byteswap()
+            self._offsets = offsets
+        else:
+            self._offsets = memoryview(self._mmap)[start:end].cast("I")
+        self._blob_start = end
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> str:
+        if not -self._size <= i < self._size:
+            raise IndexError("word index out of range")
+        i %= self._size
+        start = self._blob_start + self._offsets[i]
+        end = self._blob_start + self._offsets[i + 1]
+        return self._mmap[start:end].decode("utf8")
+
+
+class WordCorpus:
+    """Words to sample from, loaded the first time they are requested.
+
+    Args:
+        path (Path or None, optional): Compiled corpus to use. If None, the value
+            of CLI_HELP_MAKER_CORPUS is used if defined, otherwise the nltk's
+            words corpus. Defaults to None.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._words = None
+
+    def use(self, path: Path | None) -> None:
+        """Changes the source of the words, loaded in the next request."""
+        self._path = path
+        self._words = None
+
+    def load(self) -> Sequence[str]:
+        """Returns the words, reading them if it wasn't done yet."""
+        if self._words is None:
+            path = self._path or os.environ.get(CORPUS_ENV_VAR) or None
+            self._words = nltk_words() if path is None else MappedWords(Path(path))
+        return self._words
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    def __getitem__(self, i: int) -> str:
+        return self.load()[i]
+
+
+if __name__ == "__main__":
+    import typer
+
+    def main(
+        path: Path = typer.Argument(..., help="Path of the compiled corpus."),
+    ):
+        """Compiles the nltk's words corpus to use it with cli-help-maker."""
+        print(f"Words written to {path}: {compile_corpus(path)}")
+
+    typer.run(main)
@@ -0,0 +1,288 @@
+"""Streaming deduplication of the messages of a dataset.
+
+Small configs (few options, no descriptions...) generate the same messages
+(or almost) again and again. A `Deduplicator` remembers the messages of a
+dataset as they are generated, in a memory fixed by the size of the dataset:
+
+- `exact`: the messages are normalized (lowercase, single spaces) and hashed
+  to a Bloom filter.
+- `near`: additionally, the MinHash signature of the word trigrams of each
+  message is split in bands (LSH). A message sharing any band with a previous
+  one is a near duplicate. The bands are stored in a Bloom filter too, so
+  the near duplicates are detected with a Jaccard similarity around
+  (1 / bands) ** (1 / rows) without keeping the signatures. Requires numpy.
+
+The Bloom filters may report a message as a duplicate that isn't one (with
+probability `error_rate`), but never miss one. They use about
+1.44 * log2(1 / error_rate) bits per message and filter, that is 2.4 bytes
+per sample for `exact` and 2.4 * (1 + bands) for `near` with the default
+error rate.
+
+>>> deduplicator = Deduplicator(capacity=1000, mode="near")
+>>> deduplicator.check(message)  # None, "exact" or "near"
+>>> deduplicator.insert(message)
+"""
+
+import hashlib
+import math
+import zlib
+from collections import Counter
+from enum import Enum
+from typing import Any
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover
+    np = None
+
+# Regenerations of a sample before keeping it even if it's a duplicate.
+MAX_ATTEMPTS = 20
+# Counts of a Deduplicator: messages checked, duplicates of each kind, samples
+# regenerated and duplicates kept after MAX_ATTEMPTS.
+COUNTS = ("checked", "exact", "near", "regenerated", "kept")
+
+
+class DedupMode(str, Enum):
+    """Duplicates removed from a dataset."""
+
+    exact = "exact"
+    near = "near"
+
+
+def normalize(message: str) -> str:
+    """Lowercase message with the whitespace collapsed to single spaces."""
+    return " ".join(message.lower().split())
+
+
+class BloomFilter:
+    """Set of keys with a fixed size and false positives.
+
+    The keys are hashed to `num_hashes` positions of a bit array (double
+    hashing), a key is present when all its bits are set. The positions of
+    many keys can be computed and checked at once with numpy
+    (`array_positions`).
+
+    Args:
+        capacity (int): Number of keys expected.
+        error_rate (float, optional): Probability of a key being reported as
+            present when it isn't, once `capacity` keys are added.
+            Defaults to 1e-4.
+
+    Raises:
+        ValueError: If the error rate isn't between 0 and 1.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4) -> None:
+        if not 0 < error_rate < 1:
+            raise ValueError(f"The error rate must be between 0 and 1: {error_rate}")
+        capacity = max(capacity, 1)
+        bits_per_key = -math.log(error_rate) / math.log(2) ** 2
+        self.num_bits = math.ceil(capacity * bits_per_key)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def positions(self, key: bytes) -> list[int]:
+        """Bits of a key."""
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def contains(self, positions: list[int]) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def set(self, positions: list[int]) -> None:
+        bits = self._bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.contains(self.positions(key))
+
+    def add(self, key: bytes) -> None:
+        self.set(self.positions(key))
+
+    def array_positions(self, keys: "np.ndarray") -> "np.ndarray":
+        """Bits of many keys at once.
+
+        Args:
+            keys (np.ndarray): Keys already hashed, as uint64.
+
+        Returns:
+            np.ndarray: Array of (len(keys), num_hashes) positions.
+        """
+        h2 = ((keys >> np.uint64(29)) ^ keys) * np.uint64(0xBF58476D1CE4E5B9)
+        h2 |= np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (keys[:, None] + steps * h2[:, None]) % np.uint64(self.num_bits)
+
+    def contains_any(self, positions: "np.ndarray") -> bool:
+        """Whether any of the keys of `array_positions` is present."""
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        found = (bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1
+        return bool(found.all(axis=1).any())
+
+    def set_array(self, positions: "np.ndarray") -> None:
+        """Adds the keys of `array_positions`."""
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        flat = positions.ravel()
+        np.bitwise_or.at(
+            bits,
+            flat >> np.uint64(3),
+            (np.uint8(1) << (flat & np.uint64(7)).astype(np.uint8)),
+        )
+
+
+class MinHasher:
+    """Computes the LSH bands of the MinHash signature of the word trigrams
+    of a text.
+
+    Args:
+        bands (int, optional): Number of bands. Defaults to 8.
+        rows (int, optional): Hashes per band. Defaults to 8.
+        seed (int, optional): Seed of the hash functions. Defaults to 0.
+
+    Raises:
+        ModuleNotFoundError: If numpy isn't installed.
+    """
+
+    def __init__(self, bands: int = 8, rows: int = 8, seed: int = 0) -> None:
+        if np is None:  # pragma: no cover
+            raise ModuleNotFoundError(
+                "Near duplicates detection requires numpy, install it with: "
+                "pip install cli-help-maker[numpy]"
+            )
+        self.bands = bands
+        self.rows = rows
+        generator = np.random.default_rng(seed)
+        # Multiply-shift hash functions, (a * x + b) >> 32 (mod 2 ** 64).
+        high = np.iinfo(np.uint64).max
+        self._a = generator.integers(1, high, bands * rows, dtype=np.uint64) | 1
+        self._b = generator.integers(0, high, bands * rows, dtype=np.uint64)
+        # Combine the rows of each band (and its position) in a single key.
+        self._rows = generator.integers(1, high, rows, dtype=np.uint64) | 1
+        self._offsets = generator.integers(0, high, bands, dtype=np.uint64)
+
+    def bands_of(self, text: str) -> "np.ndarray":
+        """Key of each band of the signature of a normalized text, as uint64."""
+        words = np.array(
+            [zlib.crc32(word.encode()) for word in text.split()] or [0],
+            dtype=np.uint64,
+        )
+        if len(words) >= 3:
+            words = (
+                words[:-2] * np.uint64(0x9E3779B97F4A7C15)
+                + words[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F)
+                + words[2:]
+            )
+        hashes = (np.multiply.outer(words, self._a) + self._b) >> np.uint64(32)
+        signature = hashes.min(axis=0).reshape(self.bands, self.rows)
+        return (signature * self._rows).sum(axis=1) + self._offsets
+
+
+class Deduplicator:
+    """Remembers the messages of a dataset to detect the duplicates.
+
+    Args:
+        capacity (int): Number of messages expected, the size of the dataset.
+        mode (DedupMode, optional): Whether to detect only exact duplicates or
+            near duplicates too. Defaults to DedupMode.exact.
+        error_rate (float, optional): False positive rate of the Bloom filters.
+            Defaults to 1e-4.
+        bands (int, optional): LSH bands of the near duplicates. Defaults to 8.
+        rows (int, optional): Rows per band of the near duplicates. Defaults to 8.
+
+    Attributes:
+        counts (Counter): Messages checked, and the duplicates found of each kind.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        mode: DedupMode = DedupMode.exact,
+        error_rate: float = 1e-4,
+        bands: int = 8,
+        rows: int = 8,
+    ) -> None:
+        self.capacity = capacity
+        self.mode = DedupMode(mode)
+        self.error_rate = error_rate
+        self.bands = bands
+        self.rows = rows
+        self._exact = BloomFilter(capacity, error_rate)
+        self._minhasher = self._bands = None
+        if self.mode is DedupMode.near:
+            self._minhasher = MinHasher(bands, rows)
+            self._bands = BloomFilter(capacity * bands, error_rate)
+        self.counts = Counter()
+        # Keys of the last message checked, to insert it without hashing it again.
+        self._last = (None, None)
+
+    def _keys(self, message: str) -> tuple[list[int], "np.ndarray | None"]:
+        """Positions of the message in the filters, of the exact message
+        and of the LSH bands."""
+        if self._last[0] == message:
+            return self._last[1]
+        text = normalize(message)
+        bands = None
+        if self._minhasher is not None:
+            bands = self._bands.array_positions(self._minhasher.bands_of(text))
+        keys = (self._exact.positions(text.encode()), bands)
+        self._last = (message, keys)
+        return keys
+
+    def check(self, message: str) -> str | None:
+        """Checks whether a message is a duplicate of the ones inserted.
+
+        Returns:
+            str or None: "exact" or "near" for duplicates, None otherwise.
+        """
+        exact, bands = self._keys(message)
+        self.counts["checked"] += 1
+        kind = None
+        if self._exact.contains(exact):
+            kind = "exact"
+        elif bands is not None and self._bands.contains_any(bands):
+            kind = "near"
+        if kind is not None:
+            self.counts[kind] += 1
+        return kind
+
+    def insert(self, message: str) -> None:
+        """Adds a message to the ones seen."""
+        exact, bands = self._keys(message)
+        self._exact.set(exact)
+        if bands is not None:
+            self._bands.set_array(bands)
+
+    def restore(self, report: dict[str, Any]) -> None:
+        """Sets the counts of a `report`, to continue a dataset."""
+        self.counts.update({key: report[key] for key in COUNTS})
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the filters."""
+        if self._bands is None:
+            return self._exact.nbytes
+        return self._exact.nbytes + self._bands.nbytes
+
+    def report(self) -> dict[str, Any]:
+        """Settings and counts of the deduplication, with the rate of the
+        messages checked that were duplicates."""
+        checked = self.counts["checked"]
+        duplicates = self.counts["exact"] + self.counts["near"]
+        return {
+            "mode": self.mode.value,
+            "error_rate": self.error_rate,
+            "bands": self.bands,
+            "rows": self.rows,
+            "memory_bytes": self.nbytes,
+            **{key: self.counts[key] for key in COUNTS},
+            "hit_rate": duplicates / checked if checked else 0.0,
+        }
@@ -0,0 +1,157 @@
+"""Help messages as spaCy docs, to train a NER model on them.
+
+The annotations of a message (label, start, end) are the entities of a doc
+tokenized with a blank pipeline. The docs are stored in `DocBin`s, the
+binary `.spacy` files read by `spacy train`:
+
+>>> nlp = blank_nlp()
+>>> doc_bin = DocBin(attrs=ATTRS, store_user_data=False)
+>>> doc_bin.add(annotations_to_doc(nlp, HelpGenerator().annotations))
+>>> doc_bin.to_disk("train.spacy")
+
+When generating a dataset with `--format docbin`, the workers tokenize the
+messages and send each doc serialized (`doc_bytes`), which are merged
+in the `.spacy` shards (`DocBinShard`).
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import spacy
+    from spacy.tokens import Doc, DocBin
+    from spacy.util import filter_spans
+except ModuleNotFoundError:  # pragma: no cover
+    spacy = None
+
+# Token attributes stored, the text and the entities.
+ATTRS = ("ORTH", "ENT_IOB", "ENT_TYPE")
+
+
+def _check_spacy() -> None:
+    if spacy is None:  # pragma: no cover
+        raise ModuleNotFoundError(
+            "The docbin format requires spaCy, install it with: "
+            "pip install cli-help-maker[spacy]"
+        )
+
+
+def blank_nlp(lang: str = "en") -> "spacy.Language":
+    """Blank pipeline used to tokenize the messages.
+
+    Args:
+        lang (str, optional): Language of the tokenizer. Defaults to "en".
+
+    Raises:
+        ModuleNotFoundError: If spaCy isn't installed.
+    """
+    _check_spacy()
+    return spacy.blank(lang)
+
+
+def annotations_to_doc(nlp: "spacy.Language", annotations: dict[str, Any]) -> "Doc":
+    """Tokenizes a message and sets its annotations as entities.
+
+    The annotations may start or end inside a token (i.e. an option between
+    brackets that the tokenizer doesn't split), the entities are expanded to
+    cover the whole tokens.
+
+    Args:
+        nlp (spacy.Language): Pipeline to tokenize the message, see `blank_nlp`.
+        annotations (dict[str, Any]): Output of HelpGenerator.annotations.
+
+    Returns:
+        Doc: The message with the entities.
+    """
+    doc = nlp.make_doc(annotations["message"])
+    spans = []
+    for label, start, end in annotations["annotations"]:
+        span = doc.char_span(start, end, label=label, alignment_mode="expand")
+        if span is not None:
+            spans.append(span)
+    doc.set_ents(filter_spans(spans))
+    return doc
+
+
+def doc_bytes(nlp: "spacy.Language", annotations: dict[str, Any]) -> bytes:
+    """Serializes the doc of a message as a DocBin, to send it between processes."""
+    doc_bin = DocBin(attrs=ATTRS, store_user_data=False)
+    doc_bin.add(annotations_to_doc(nlp, annotations))
+    return doc_bin.to_bytes()
+
+
+def read_docs(path: Path, lang: str = "en") -> Iterator["Doc"]:
+    """Reads the docs of a `.spacy` file.
+
+    Args:
+        path (Path): Path of the file.
+        lang (str, optional): Language of the vocab of the docs. Defaults to "en".
+
+    Raises:
+        ModuleNotFoundError: If spaCy isn't installed.
+    """
+    _check_spacy()
+    doc_bin = DocBin(attrs=ATTRS, store_user_data=False).from_disk(path)
+    return doc_bin.get_docs(blank_nlp(lang).vocab)
+
+
+class DocBinShard:
+    """A `.spacy` file of the dataset.
+
+    The docs are kept in memory and written when the shard is closed,
+    so the shard size bounds the memory used. Like `ColumnarShard`,
+    it can't be continued from a checkpoint.
+
+    Args:
+        path (Path): Path of the file.
+        lang (str, optional): Language of the tokenizer used for the samples
+            that aren't serialized yet. Defaults to "en".
+
+    Raises:
+        ModuleNotFoundError: If spaCy isn't installed.
+    """
+
+    def __init__(self, path: Path, lang: str = "en") -> None:
+        _check_spacy()
+        self.path = path
+        self.lang = lang
+        self.lines = 0
+        self._doc_bin = DocBin(attrs=ATTRS, store_user_data=False)
+        self._nlp = None
+        self._info = None
+
+    def write(self, annotations: dict[str, Any], doc: bytes | None = None) -> None:
+        """Adds the doc of a sample.
+
+        Args:
+            annotations (dict[str, Any]): Output of HelpGenerator.annotations.
+            doc (bytes or None, optional): The doc already serialized by `doc_bytes`,
+                otherwise it's created from the annotations. Defaults to None.
+        """
+        if doc is None:
+            if self._nlp is None:
+                self._nlp = blank_nlp(self.lang)
+            doc = doc_bytes(self._nlp, annotations)
+        self._doc_bin.merge(DocBin(attrs=ATTRS, store_user_data=False).from_bytes(doc))
+        self.lines += 1
+
+    def flush(self, sync: bool = False) -> None:
+        """Nothing to do, the file is written when closed."""
+
+    def close(self) -> None:
+        data = self._doc_bin.to_bytes()
+        self.path.write_bytes(data)
+        self._info = {
+            "path": self.path.name,
+            "lines": self.lines,
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    def info(self) -> dict[str, str | int]:
+        """Entry of the shard in the manifest, the bytes and sha256
+        are only known once the shard is closed."""
+        if self._info is not None:
+            return self._info
+        return {"path": self.path.name, "lines": self.lines, "bytes": 0, "sha256": ""}
@@ -3,12 +3,19 @@
 Currently only docopt is allowed.
 """
 
-import difflib
+import functools
+import inspect
 import random
 import textwrap
+from array import array
 from textwrap import indent
+from typing import TYPE_CHECKING, Any, NamedTuple
 
+from .instrumentation import INSTRUMENTED_PHASES, instrument_method
+from .profiling import NULL_PROFILER
+from .sampling import sample_seed
 from .utils import (
+    add_comma,
     capitalize,
     do_mutually_exclusive_groups,
     do_optional,
@@ -17,13 +24,18 @@ from .utils import (
     make_list,
     make_option,
     make_paragraph,
-    add_comma,
-    update_paragraph,
     maybe_do_optional,
     options_shortcut,
     section_pattern,
+    update_paragraph,
     usage_pattern,
 )
+from .wrapping import WrappedText, fill, fill_with_offsets, wrap
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .instrumentation import Instrument
+    from .profiling import Profiler
+    from .text_pool import TextPool
 
 text_wrapper = textwrap.TextWrapper(width=78)
 
@@ -32,6 +44,65 @@ text_wrapper = textwrap.TextWrapper(width=78)
 CMD = "CMD"  # Command
 ARG = "ARG"  # Argument
 OPT = "OPT"  # Option
+LABELS = (CMD, ARG, OPT)
+# Parts of a message recorded in `HelpGenerator.sections` when written.
+SECTIONS = ("description", "commands", "arguments", "options")
+
+# Arguments of HelpGenerator that aren't part of the layout of the message.
+_RUNTIME_PARAMS = ("self", "seed", "text_pool", "profiler", "instrument")
+# Layout parameters which aren't stored as given.
+_PARSED_PARAMS = frozenset(
+    (
+        "indent_spaces",
+        "total_width",
+        "exclusive_programs",
+        "options_mutually_exclusive_group",
+        "option_set_size",
+        "number_of_commands",
+        "number_of_arguments",
+        "number_of_options",
+        "options_shortcut",
+    )
+)
+_UNSET = object()
+
+
+class AnnotationColumns(NamedTuple):
+    """Annotated messages of a batch, stored by columns.
+
+    The spans of the message `i` are those between `offsets[i]` and
+    `offsets[i + 1]` in `labels`, `starts` and `ends`.
+
+    Attributes:
+        messages (list[str]): The messages.
+        offsets (array): Position of the first span of each message (and
+            the total number of spans at the end), array of type "q".
+        labels (array): Index of the label of each span in LABELS, type "B".
+        starts (array): Start of each span in its message, type "q".
+        ends (array): End of each span in its message, type "q".
+    """
+
+    messages: list[str]
+    offsets: array
+    labels: array
+    starts: array
+    ends: array
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def to_annotations(self) -> list[dict[str, str | list[tuple[str, int, int]]]]:
+        """The samples in the format of HelpGenerator.annotations."""
+        return [
+            {
+                "message": message,
+                "annotations": [
+                    (LABELS[self.labels[j]], self.starts[j], self.ends[j])
+                    for j in range(self.offsets[i], self.offsets[i + 1])
+                ],
+            }
+            for i, message in enumerate(self.messages)
+        ]
 
 
 class HelpGenerator:
@@ -93,6 +164,10 @@ class HelpGenerator:
         number_of_arguments: int | list[int] = 0,
         number_of_options: int | list[int] = 0,
         exclusive_programs: int = 1,
+        seed: int | None = None,
+        text_pool: "TextPool | None" = None,
+        profiler: "Profiler | None" = None,
+        instrument: "Instrument | None" = None,
     ) -> None:
         """_summary_
 
@@ -148,96 +223,218 @@ class HelpGenerator:
                 to the usage pattern. When only one is given, a single program
                 definition occurs. Used to differentiate between different subcommands
                 or different meaning of the arguments. Defaults to 1.
+            seed (int or None): Seed of the random generator of the instance,
+                the same seed and arguments generate the same message.
+                If None, the global random module is used. Defaults to None.
+            text_pool (TextPool or None): Pool to take the descriptions from,
+                instead of generating them one word at a time. Useful to generate
+                many messages, see cli_help_maker.text_pool. Defaults to None.
+            profiler (Profiler or None): Measures the time spent in each part
+                of the message, see cli_help_maker.profiling. Defaults to None.
+            instrument (Instrument or None): Callable receiving the time, characters
+                and spans of each phase, see cli_help_maker.instrumentation.
+                Defaults to None.
         """
-        self._help_message = ""
+        # Layout parameters, must be taken before defining any other variable.
+        params = {k: v for k, v in locals().items() if k not in _RUNTIME_PARAMS}
+        self._rng = random if seed is None else random.Random(seed)
+        self._text_pool = text_pool
+        self._profiler = profiler or NULL_PROFILER
+        if instrument is not None:
+            # Only the instances with an instrument pay for the measures.
+            for name in INSTRUMENTED_PHASES:
+                setattr(self, name, instrument_method(self, name, instrument))
+        # Pieces of the message, joined when the message is requested.
+        self._buffer = []
         self._current_length = 0
         self._annotations = []
+        # Text of each annotated element as it was emitted, before wrapping.
+        self._tokens = []
+        # Description and sections written to the message.
+        self._sections = []
         # To keep track of the options and arguments, in case
         # they are added as a single line and documented on
         # a different section.
         self._command_names = []
         self._option_names = []
         self._argument_names = []
-        # Layout options
-        self._total_width = int(total_width)
-        self._prob_name_capitalized = prob_name_capitalized
-        self._options_style = options_style
-        self._indent_spaces = int(indent_spaces)
-        self._usage_section = usage_section  # Used to split the programs in a section
-        # or in the same line with indentation.
-        self._usage_pattern_capitalized = usage_pattern_capitalized
-
-        self._commands_section = commands_section
-        self._commands_header = commands_header
-        self._commands_capitalized = commands_capitalized
-        self._commands_documented_prob = commands_documented_prob
-
-        self._arguments_section = arguments_section
-        self._arguments_header = arguments_header
-        self._arguments_style = arguments_style
-        self._argument_repeated = argument_repeated
-        self._argument_documented_prob = argument_documented_prob
-        self._arguments_pattern_capitalized = arguments_pattern_capitalized
-        self._argument_capitalized_prob = argument_capitalized_prob
-        self._argument_optional_prob = argument_optional_prob
-
-        self._argument_any_number_prob = argument_any_number_prob
-        self._argument_nested_prob = argument_nested_prob
-
-        self._options_section = options_section
-        self._options_header = options_header
-        self._option_documented_prob = option_documented_prob
-        self._option_argument_separator = option_argument_separator
-        self._option_argument_required = option_argument_required
-        self._options_pattern_capitalized = options_pattern_capitalized
-        self._options_mutually_exclusive_prob = options_mutually_exclusive_prob
-        self._options_mutually_exclusive_group = self._check_number_of_elements(
-            options_mutually_exclusive_group
+        # Variable used to control the proper positioning of the docs
+        self._docs_limited = False
+        self._params = {}
+        self._configure(params)
+
+    def _configure(self, params: dict[str, Any]) -> None:
+        """Sets the layout parameters (those of __init__ except the seed,
+        text_pool, profiler and instrument).
+
+        Only the parameters that differ from the current ones are set again
+        (equal values, like 1 and True, generate the same messages), the options
+        shortcut is drawn every time as in a new instance.
+        """
+        current = self._params
+        changed = {
+            name: value
+            for name, value in params.items()
+            if current.get(name, _UNSET) != value
+        }
+        current.update(changed)
+
+        for name, value in changed.items():
+            if name not in _PARSED_PARAMS:
+                setattr(self, _ATTRIBUTES[name], value)
+            elif name in ("indent_spaces", "total_width", "exclusive_programs"):
+                setattr(self, _ATTRIBUTES[name], int(value))
+            elif name == "options_mutually_exclusive_group":
+                self._options_mutually_exclusive_group = self._check_number_of_elements(
+                    value
+                )
+            elif name == "option_set_size":
+                l, h = self._check_number_of_elements(value)
+                self._option_set_size = lambda l=l, h=h: self._rng.randint(l, h)
+            elif name in ("number_of_commands", "number_of_arguments"):
+                # Explain this is to allow working with a number of
+                # exclusive_programs > 1
+                setattr(self, name, value)
+
+        if "total_width" in changed:
+            # Variables used to control the proper positioning
+            # of the docs
+            self._max_level_docs = int(1 / 3 * self._total_width)
+            self._remaining_space_option_docs = int(
+                self._total_width - self._max_level_docs
+            )
+
+        self._options_shortcut = self._rng.random() > (
+            1 - self._params["options_shortcut"]
         )
-        self._options_shortcut = random.random() > (1 - options_shortcut)
-        self._options_shortcut_capitalized_prob = options_shortcut_capitalized_prob
-        self._options_shortcut_all_caps = options_shortcut_all_caps
-
-        l, h = self._check_number_of_elements(option_set_size)
-        self._option_set_size = lambda: random.randint(l, h)
-        self._option_set_size_prob = option_set_size_prob
-
-        self._exclusive_group_optional_prob = exclusive_group_optional_prob
-        # Program description probability
-        self._description_before = description_before
-        self._description_after = description_after
-        self._program_description_prob = program_description_prob
-        self._read_from_stdin = read_from_stdin
-        self._exclusive_programs = int(exclusive_programs)
-
-        # Explain this is to allow working with a number of
-        # exclusive_programs > 1
-        self.number_of_commands = number_of_commands
-        self.number_of_arguments = number_of_arguments
+        number_of_options = self._params["number_of_options"]
         # If options_shortcut is True, write at least one option
-        if self._options_shortcut:  # pragma: no cover
-            number_of_options = max(1, number_of_options)
+        if self._options_shortcut:
+            l, h = self._check_number_of_elements(number_of_options)
+            number_of_options = [max(1, l), max(1, h)]
 
         self.number_of_options = number_of_options
 
-        # Variables used to control the proper positioning
-        # of the docs
-        self._max_level_docs = int(1 / 3 * self._total_width)
-        self._remaining_space_option_docs = int(
-            self._total_width - self._max_level_docs
-        )
+    def reset(self, seed: int | None = None, **kwargs: Any) -> "HelpGenerator":
+        """Prepares the instance to generate a new message with other arguments.
+
+        The instance generates the same message as `HelpGenerator(seed=seed, **kwargs)`
+        (keeping the text pool, profiler and instrument), but only the parameters
+        that changed are parsed again, and the state of the previous message is
+        cleared instead of allocated again. The parameters not given take
+        their default values.
+
+        Args:
+            seed (int or None): Seed of the random generator, as in __init__.
+            kwargs (Any): Any argument of __init__ except text_pool, profiler
+                and instrument.
+
+        Returns:
+            HelpGenerator: The instance, i.e. `generator.reset(**kwargs).annotations`.
+
+        Raises:
+            TypeError: If an argument isn't a layout parameter of __init__.
+        """
+        defaults = _layout_defaults()
+        unknown = kwargs.keys() - defaults.keys()
+        if unknown:
+            raise TypeError(f"Unexpected arguments: {sorted(unknown)}")
+
+        if seed is None:
+            self._rng = random
+        elif self._rng is random:
+            self._rng = random.Random(seed)
+        else:
+            self._rng.seed(seed)
+
+        self._clear()
+        self._configure({**defaults, **kwargs})
+        return self
+
+    def _clear(self) -> None:
+        """Removes the state of the previous message."""
+        self._buffer.clear()
+        self._current_length = 0
+        self._annotations.clear()
+        self._tokens.clear()
+        self._sections.clear()
+        self._command_names.clear()
+        self._option_names.clear()
+        self._argument_names.clear()
         self._docs_limited = False
 
+    def generate_batch(
+        self, n: int, seed: int | None = None, columnar: bool = False
+    ) -> list[dict[str, str | list[tuple[str, int, int]]]] | AnnotationColumns:
+        """Generates `n` annotated messages with the layout of the instance.
+
+        The state of the instance is reused from one message to the next.
+        With a seed, the message `i` is the one generated by
+        `HelpGenerator(seed=sample_seed(seed, i), **layout)`, so every message
+        can be reproduced on its own. Otherwise the messages are drawn one after
+        another from the random generator of the instance.
+
+        With a `text_pool`, the descriptions are taken from the pool, whose
+        stream isn't reseeded: the message `i` is only reproduced by a generator
+        with a pool in the same state, i.e. after the `i` messages before it.
+
+        Args:
+            n (int): Number of messages.
+            seed (int or None, optional): Base seed of the batch. Defaults to None.
+            columnar (bool, optional): Return the messages and spans by columns
+                instead of a dict per message. Defaults to False.
+
+        Returns:
+            list[dict[str, str | list[tuple[str, int, int]]]] | AnnotationColumns:
+                The messages as returned by `annotations`, or by columns.
+        """
+        layout = self._params
+        if columnar:
+            batch = AnnotationColumns(
+                [], array("q", [0]), array("B"), array("q"), array("q")
+            )
+            label_index = {label: i for i, label in enumerate(LABELS)}
+        else:
+            batch = []
+
+        for i in range(n):
+            if seed is None:
+                self._clear()
+                self._configure(layout)
+            else:
+                self.reset(seed=sample_seed(seed, i), **layout)
+            message = self.sample()
+            if columnar:
+                batch.messages.append(message)
+                for label, start, end in self._annotations:
+                    batch.labels.append(label_index[label])
+                    batch.starts.append(start)
+                    batch.ends.append(end)
+                batch.offsets.append(len(batch.starts))
+            else:
+                batch.append(
+                    {"message": message, "annotations": list(self._annotations)}
+                )
+        return batch
+
     @property
     def help_message(self) -> str:
-        """Anytime the message is updated, the current lenght
-        is updated when the setter is called."""
-        return self._help_message
+        """The message is stored as a list of pieces, which are joined
+        only when the message is requested."""
+        if len(self._buffer) > 1:
+            self._buffer[:] = ["".join(self._buffer)]
+        return self._buffer[0] if self._buffer else ""
 
     @help_message.setter
-    def help_message(self, msg: str) -> str:
-        self._help_message = msg
-        self._current_length = len(self._help_message)
+    def help_message(self, msg: str) -> None:
+        self._buffer = [msg]
+        self._current_length = len(msg)
+
+    def _write(self, text: str) -> None:
+        """Appends text to the message, the current length is updated
+        without measuring the whole message."""
+        self._buffer.append(text)
+        self._current_length += len(text)
 
     @property
     def number_of_commands(self) -> int:
@@ -246,7 +443,7 @@ class HelpGenerator:
     @number_of_commands.setter
     def number_of_commands(self, number: int | list[int]) -> None:
         l, h = self._check_number_of_elements(number)
-        self._number_of_commands = lambda: random.randint(l, h)
+        self._number_of_commands = lambda: self._rng.randint(l, h)
 
     @property
     def number_of_arguments(self) -> int:
@@ -255,7 +452,7 @@ class HelpGenerator:
     @number_of_arguments.setter
     def number_of_arguments(self, number: int | list[int]) -> None:
         l, h = self._check_number_of_elements(number)
-        self._number_of_arguments = lambda: random.randint(l, h)
+        self._number_of_arguments = lambda: self._rng.randint(l, h)
 
     @property
     def number_of_options(self) -> int:
@@ -264,7 +461,7 @@ class HelpGenerator:
     @number_of_options.setter
     def number_of_options(self, number: int | list[int]) -> None:
         l, h = self._check_number_of_elements(number)
-        self._number_of_options = lambda: random.randint(l, h)
+        self._number_of_options = lambda: self._rng.randint(l, h)
 
     def _check_number_of_elements(self, number: int | list[int]) -> tuple[int, int]:
         """Checks the inputs given on number of commands or options.
@@ -282,16 +479,19 @@ class HelpGenerator:
             raise ValueError(f"Must be an int or a list of 2 ints, given: {number}")
         return l, h
 
+    def _paragraph(self) -> str:
+        """Text for the descriptions, taken from the text pool if given."""
+        if self._text_pool is not None:
+            return self._text_pool.paragraph()
+        return make_paragraph(rng=self._rng)
+
     def _description(self) -> str:
-        desc = make_paragraph()
-        return textwrap.fill(
-            desc, width=self._total_width, initial_indent="", subsequent_indent=""
-        )
+        desc = self._paragraph()
+        return fill(desc, self._total_width)
 
-    @staticmethod
-    def _program_name() -> str:
+    def _program_name(self) -> str:
         """Returns a name for the app."""
-        return get_word()
+        return get_word(rng=self._rng)
 
     def _commands(self, total: int = 0) -> list[str]:
         """Returns commands for the app."""
@@ -328,33 +528,35 @@ class HelpGenerator:
         # These are dependent of the point where they are generated:
         if in_section:
             kwargs = {
-                "short": random.choice([True, False]),
-                "long": random.choice([True, False]),
-                "with_value": random.choice([True, False]),
+                "short": self._rng.choice([True, False]),
+                "long": self._rng.choice([True, False]),
+                "with_value": self._rng.choice([True, False]),
             }
 
         else:
-            short = random.choice([True, False])
+            short = self._rng.choice([True, False])
             long = not short
             kwargs = {
                 "short": short,
                 "long": long,
-                "with_value": random.choice([True, False]),
+                "with_value": self._rng.choice([True, False]),
             }
 
         options_arguments.update(
             {
                 "short_capitalized_prob": 0.1,
                 "long_capitalized_prob": 0,
-                "set_size": self._option_set_size()
-                if random.random() > (1 - self._option_set_size_prob)
-                else 0,
+                "set_size": (
+                    self._option_set_size()
+                    if self._rng.random() > (1 - self._option_set_size_prob)
+                    else 0
+                ),
             },
             **kwargs,
         )
         options_arguments.update(**self._options_style)
 
-        option = make_option(**options_arguments)
+        option = make_option(**options_arguments, rng=self._rng)
 
         # TODO: Consider using only the long name if available.
         self._option_names.append(option)
@@ -393,12 +595,12 @@ class HelpGenerator:
             list[str]: list of options to be added to the message.
         """
         kwargs = {
-            "short_separator": random.choice(["=", " "]),
-            "long_separator": random.choice(["=", " "]),
-            "short_long_separator": random.choice([", ", " "]),
+            "short_separator": self._rng.choice(["=", " "]),
+            "long_separator": self._rng.choice(["=", " "]),
+            "short_long_separator": self._rng.choice([", ", " "]),
             "probability_name_cap": 0,
             "probability_value_cap": 0,
-            "style": random.choice(["between_brackets", "all_caps"]),
+            "style": self._rng.choice(["between_brackets", "all_caps"]),
         }
         # Easy way to remove optiosn which appear from make_option as ""
         options = []
@@ -423,12 +625,15 @@ class HelpGenerator:
         arg = make_argument(
             capitalized_prob=0,
             style=self._arguments_style,
-            any_number=True
-            if (1 - random.random()) < self._argument_any_number_prob
-            else False,
-            nested=True
-            if (1 - random.random()) < self._argument_nested_prob
-            else False,
+            any_number=(
+                True
+                if (1 - self._rng.random()) < self._argument_any_number_prob
+                else False
+            ),
+            nested=(
+                True if (1 - self._rng.random()) < self._argument_nested_prob else False
+            ),
+            rng=self._rng,
         )
         # if the name was already generated (it can happen statistically...)
         # try again, just once and expect it doesn't happen again.
@@ -436,16 +641,21 @@ class HelpGenerator:
             arg = make_argument(
                 capitalized_prob=0,
                 style=self._arguments_style,
-                any_number=True
-                if (1 - random.random()) < self._argument_any_number_prob
-                else False,
-                nested=True
-                if (1 - random.random()) < self._argument_nested_prob
-                else False,
+                any_number=(
+                    True
+                    if (1 - self._rng.random()) < self._argument_any_number_prob
+                    else False
+                ),
+                nested=(
+                    True
+                    if (1 - self._rng.random()) < self._argument_nested_prob
+                    else False
+                ),
+                rng=self._rng,
             )
 
         self._argument_names.append(arg)
-        if random.random() > optional_probability:
+        if self._rng.random() > optional_probability:
             arg = do_optional(arg)
 
         return arg
@@ -464,7 +674,7 @@ class HelpGenerator:
             for _ in range(total)
         ]
 
-        if random.random() > (1 - self._argument_repeated):
+        if self._rng.random() > (1 - self._argument_repeated):
             if len(args) > 0:
                 args[-1] = args[-1] + "..."
 
@@ -481,10 +691,10 @@ class HelpGenerator:
             for successive program examples.
         """
         usage = usage_pattern(capitalized=self._usage_pattern_capitalized)
-        self.help_message += usage
+        self._write(usage)
 
         if self._usage_section:
-            self.help_message += "\n"
+            self._write("\n")
             indent_level = self._indent_spaces
         else:
             indent_level = len(usage)
@@ -494,9 +704,9 @@ class HelpGenerator:
         # (as if added in a section).
         # Otherwise, generate multiple programs as is.
         def add_prog(indent_level, prog_name, options_in_section):
-            self.help_message += " " * indent_level
+            self._write(" " * indent_level)
             self._add_program(prog_name, options_in_section=options_in_section)
-            self.help_message += "\n"
+            self._write("\n")
 
         if self._exclusive_programs == 1:
             if self._usage_section:
@@ -522,26 +732,29 @@ class HelpGenerator:
             number : int. Number of program written.
                 For the moment is a simple way of keeping track of the indentation.
         """
-        program = prog_name
-        # Initialize the start of the first label
-        start = self._current_length + len(program) + 1
+        # The elements of the program are joined by a space once finished,
+        # length keeps the length of the program as if they were already joined.
+        pieces = [prog_name]
+        length = len(prog_name)
         # initial_length is a control variable to check the
         # length of the program before and after calling textwrap.
         initial_length = self._current_length
         annotations = []
 
+        def add(element: str, label: str | None = None) -> None:
+            nonlocal length
+            if label is not None:
+                # The label starts after the space that precedes the element.
+                start = initial_length + length + 1
+                annotations.append((label, start, start + len(element)))
+                self._tokens.append(element)
+            pieces.append(element)
+            length += len(element) + 1
+
         cmds = self._commands(total=self.number_of_commands)
 
-        for i, c in enumerate(cmds):
-            if i == 0:
-                # In the first step, start counting from the current program
-                # length, plus the program name, plus 1 for the initial ' '.
-                end = start + len(c)
-            else:
-                start = end + 1
-            end = start + len(c)
-            program += " " + c
-            annotations.append((CMD, start, end))
+        for c in cmds:
+            add(c, CMD)
 
         # FIXME: THE INDENTATION HAS A MUCH BIGGER LENGTH AND FORCES textwrap
         # TO WRITE EVERYTHING IN A COLUMN
@@ -553,18 +766,21 @@ class HelpGenerator:
             + 1
         )
         if self._options_shortcut:
-            program += " " + options_shortcut(
-                capitalized_probability=self._options_shortcut_capitalized_prob,
-                all_caps=self._options_shortcut_all_caps,
+            add(
+                options_shortcut(
+                    capitalized_probability=self._options_shortcut_capitalized_prob,
+                    all_caps=self._options_shortcut_all_caps,
+                    rng=self._rng,
+                )
             )
 
         if self._option_argument_separator:
             sep = "--"
             if self._option_argument_required:
-                sep = maybe_do_optional(sep, probability=0.5)
+                sep = maybe_do_optional(sep, probability=0.5, rng=self._rng)
 
             # TODO: Not yet decided if this should be annotated
-            program += " " + sep
+            add(sep)
 
         # 3) options
         opts = self._options(
@@ -578,174 +794,62 @@ class HelpGenerator:
             probability=self._options_mutually_exclusive_prob,
             groups=self._options_mutually_exclusive_group,
             optional_probability=self._exclusive_group_optional_prob,
+            rng=self._rng,
         )
         # With options shortcut, these get written directly in a section
         if self._options_shortcut:
-            self._option_names = opts
+            self._option_names[:] = opts
             opts = []
 
-        for i, o in enumerate(opts):
+        for o in opts:
             # Only add the option if contained anything.
             if len(o) > 0:  # pragma: no cover
                 if not "|" in o:
                     # Check for the pipe operator to avoid possibly making
                     # the argument twice optional.
-                    o = maybe_do_optional(o, probability=0.5)
+                    o = maybe_do_optional(o, probability=0.5, rng=self._rng)
 
-                if (i == 0) and (len(cmds) == 0):
-                    start = self._current_length + len(program) + 1
-                else:
-                    # If there was at least one command added, start
-                    # from there
-                    start = end + 1
-
-                end = start + len(o)
-                program += " " + o
-                annotations.append((OPT, start, end))
+                add(o, OPT)
 
         # 4) arguments
         args = self._arguments(total=self.number_of_arguments)
 
-        for i, a in enumerate(args):
-            if i == 0:
-                start = (
-                    self._current_length + len(program) + 1
-                )  # Program plus the previous space
-            else:
-                start = end + 1
-            end = start + len(a)
-            program += " " + a
-            annotations.append((ARG, start, end))
-
-        # FIXME: AS THE TEXT IS WRAPPED TO HAVE A NICE ERROR MESSAGE,
-        # THE ANNOTATIONS ARE MISPLACED AND THE POSITIONS MUST BE
-        # CORRECTED TO BE PROPERLY POSITIONED
-
-        filled_program = textwrap.fill(
-            program,
-            width=self._total_width,
-            initial_indent="",
-            subsequent_indent=" " * subsequent_indent,
-        )
-        self.help_message += filled_program
-        self._add_annotations(program, filled_program, annotations, initial_length)
+        for a in args:
+            add(a, ARG)
+
+        program = " ".join(pieces)
+
+        # The text is wrapped to have a nice help message, the annotations
+        # are moved to the positions of the wrapped program.
+        with self._profiler.stage("annotations"):
+            wrapped = fill_with_offsets(
+                program,
+                width=self._total_width,
+                initial_indent="",
+                subsequent_indent=" " * subsequent_indent,
+            )
+            self._write(wrapped.text)
+            self._add_annotations(wrapped, annotations, initial_length)
 
     def _add_annotations(
         self,
-        program: str,
-        filled_program: str,
+        wrapped: WrappedText,
         annotations: list[tuple[str, int, int]],
         initial_length: int,
     ) -> None:
-        """Corrects the annotations if necessary and stores them.
+        """Moves the annotations to the wrapped program and stores them.
 
         Args:
-            program (str): Original program as a string.
-            filled_program (str): Program corrected by textwrapper. May be the same as
-                program if the total_width wasn't exceeded.
+            wrapped (WrappedText): Program wrapped by `fill_with_offsets`.
             annotations (list[tuple[str, int, int]]): List with 3 element tuple that
                 represents the label, the start and end of the label in the program.
-            initial_length (int): Initial length of the program name as a string.
+            initial_length (int): Length of the message before the program.
         """
-        # Compare only the length to see if they are the same
-        if len(program) == len(filled_program):
-            [
-                self._annotations.append((label, start, end))
-                for label, start, end in annotations
-            ]
-            return
-
-        # Obtain the blocks which allow to place the annotations
-        # generated in the original program on the "filled" program
-        blocks = list(
-            difflib.SequenceMatcher(
-                a=program, b=filled_program, autojunk=False
-            ).get_matching_blocks()
-        )[:-1]
-
-        remain = 0  # Variable to avoid checking again blocks in the inner block.
-        inc = (
-            0  # increment in the positions from the original program to the filled one.
-        )
-        # TODO: New variable to control the positions of the blocks,
-        # it is used when in a given line we have to access the following block
-        j = 0
         for label, start, end in annotations:
-            for i, b in enumerate(blocks[remain:]):
-                if b.a == b.b == 0:
-                    # Corresponds to the first line of a program, doesn't need adjustment
-                    if end <= (b.size + initial_length):
-                        # Example: (start 9, end 15) Match(a=0, b=0, size=78)
-                        # The following print is just let for possible debugging
-                        # print(
-                        #     "first block",
-                        #     (start, end),
-                        #     b,
-                        #     program[(start - initial_length) : (end - initial_length)],
-                        # )
-                        self._annotations.append((label, start, end))
-
-                    elif (start <= (b.size + initial_length)) and (
-                        end >= (b.size + initial_length)
-                    ):
-                        # Starts in the first line and continues to the next (an
-                        # element which spans for more than one line)
-                        # Adjusts for the indentation added, and grabs the next block
-                        # Example: (start 77, end 110) Match(a=0, b=0, size=78)
-                        idx = j if (j + 1) >= len(blocks) else (j + 1)
-                        b = blocks[idx]
-                        inc = b.b - b.a
-                        self._annotations.append((label, start, end + inc))
-                        remain += 1
-                        j += 1
-
-                    else:
-                        # This one is the first case from the next block.
-                        # Behaves as the previous block, but increments both the start
-                        # and the end of the span, as this one pertains completely
-                        # to a single line
-                        # Example: (start 86, end 99) Match(a=0, b=0, size=78)
-                        # To avoid requesting a block over the last one
-                        idx = j if (j + 1) >= len(blocks) else (j + 1)
-                        b = blocks[idx]
-                        inc = b.b - b.a
-                        self._annotations.append((label, start + inc, end + inc))
-                        remain += 1
-                        j += 1
-
-                    break
-
-                else:
-                    # Second line plus.
-                    if (start > b.a + initial_length) and (
-                        end <= (b.a + b.size + initial_length)
-                    ):
-                        # General case
-                        # Example: (start 86, end 99) Match(a=0, b=0, size=78)
-                        self._annotations.append((label, start + inc, end + inc))
-
-                    elif (start <= b.a + b.size + initial_length) and (
-                        end > (b.a + b.size + initial_length)
-                    ):
-                        old_inc = inc
-                        b = blocks[j + 1]
-                        inc = b.b - b.a
-                        self._annotations.append((label, start + old_inc, end + inc))
-                        remain += 1
-                        j += 1
-
-                    else:
-                        # Example: (start 86, end 99) Match(a=0, b=0, size=78)
-                        # To avoid requesting a block over the last one
-                        idx = j if (j + 1) >= len(blocks) else (j + 1)
-
-                        b = blocks[idx]
-                        inc = b.b - b.a  # - 1  # Add one for the \n ?
-                        self._annotations.append((label, start + inc, end + inc))
-                        remain += 1
-                        j += 1
-
-                    break
+            start, end = wrapped.span(start - initial_length, end - initial_length)
+            self._annotations.append(
+                (label, start + initial_length, end + initial_length)
+            )
 
     def _add_section(
         self,
@@ -772,12 +876,15 @@ class HelpGenerator:
                 # To avoid writing a section header in the case that only one
                 # option is generated and has no content
                 return
+            self._sections.append(section_name)
 
             if has_header:
-                self.help_message += section_pattern(
-                    section_name, capitalized=capitalized
+                self._write(
+                    section_pattern(
+                        section_name, capitalized=capitalized, rng=self._rng
+                    )
                 )
-                self.help_message += "\n"
+                self._write("\n")
 
             elem_lengths = [len(e) + self._indent_spaces + 2 for e in elements]
             longest_opt = max(elem_lengths)
@@ -803,6 +910,7 @@ class HelpGenerator:
                     label = CMD
 
                 self._annotations.append((label, start, end))
+                self._tokens.append(e)
 
                 elem = self._add_documentation(
                     elem,
@@ -811,7 +919,7 @@ class HelpGenerator:
                     documented_prob,
                 )
 
-                self.help_message += elem + "\n"
+                self._write(elem + "\n")
 
             self._docs_limited = False
 
@@ -831,7 +939,7 @@ class HelpGenerator:
         Returns:
             str: Element with the description attached.
         """
-        if random.random() > (1 - probability) and len(element) > 0:
+        if self._rng.random() > (1 - probability) and len(element) > 0:
             next_line = False
             if length > longest_elem:
                 next_line = True
@@ -844,22 +952,22 @@ class HelpGenerator:
                 initial_indent = longest_elem - length + 2
                 subsequent_indent = longest_elem
 
-            wp = textwrap.TextWrapper(
-                width=self._total_width - self._indent_spaces,
-                initial_indent=" " * initial_indent,
-                subsequent_indent=" " * subsequent_indent,
-            )
-            docs = make_paragraph()
+            docs = self._paragraph()
             # Add the same element as an example to the docs with with 10% probability.
-            if random.random() < 0.1:
+            if self._rng.random() < 0.1:
                 el = (
                     add_comma(element, style="single")
-                    if random.random() > 0.5
+                    if self._rng.random() > 0.5
                     else element
                 )
-                docs = update_paragraph(docs, element=el)
+                docs = update_paragraph(docs, element=el, rng=self._rng)
 
-            pieces = wp.wrap(docs)
+            pieces = wrap(
+                docs,
+                self._total_width - self._indent_spaces,
+                " " * initial_indent,
+                " " * subsequent_indent,
+            )
             # TODO: Not controlled yet
             # To control the length of the first line,
             # otherwise, given the smaller initial indent, doesn't
@@ -872,7 +980,6 @@ class HelpGenerator:
             #     else:
             #         pieces = pieces_
             description = "\n".join(pieces)
-            # description = wp.fill(docs)
             element += description
         return element
 
@@ -881,19 +988,25 @@ class HelpGenerator:
 
         There is a probability of 1/5 of having a list of items in the description.
         """
-        if random.random() > (1 - self._program_description_prob):
+        if self._rng.random() > (1 - self._program_description_prob):
             desc = self._description()
         else:
             desc = ""
 
         if len(desc) > 0:
 
-            if random.random() > 0.2:
+            if self._rng.random() > 0.2:
                 desc += (
                     "\n" * 2
                     + make_list(
-                        elements=random.randint(2, 5),
-                        numbered=bool(random.randint(0, 1)),
+                        elements=self._rng.randint(2, 5),
+                        numbered=bool(self._rng.randint(0, 1)),
+                        rng=self._rng,
+                        sentence=(
+                            self._text_pool.sentence
+                            if self._text_pool is not None
+                            else None
+                        ),
                     )
                     + "\n"
                 )
@@ -904,7 +1017,8 @@ class HelpGenerator:
             if self._description_after:
                 msg = "\n" + desc + "\n"
 
-            self.help_message += msg
+            self._write(msg)
+            self._sections.append("description")
 
     def sample(self) -> str:
         """Generates a sample help message.
@@ -913,15 +1027,20 @@ class HelpGenerator:
             str: random help message.
         """
         if self._description_before:
-            self._add_program_description()
-
-        prog_name = capitalize(
-            self._program_name(), probability=self._prob_name_capitalized
-        )
-        self._add_programs(prog_name)
+            with self._profiler.stage("description"):
+                self._add_program_description()
+
+        with self._profiler.stage("programs"):
+            prog_name = capitalize(
+                self._program_name(),
+                probability=self._prob_name_capitalized,
+                rng=self._rng,
+            )
+            self._add_programs(prog_name)
 
         if self._description_after:
-            self._add_program_description()
+            with self._profiler.stage("description"):
+                self._add_program_description()
 
         def add_section(
             section_name,
@@ -941,18 +1060,19 @@ class HelpGenerator:
                 f = self._options
                 kwargs = {"total": number_of_elements, "in_section": True}
 
-            self.help_message += "\n"
+            self._write("\n")
 
-            if not elements:  # If no element was previously defined, do it here
-                elements = f(**kwargs)
+            with self._profiler.stage(f"{section_name}_section"):
+                if not elements:  # If no element was previously defined, do it here
+                    elements = f(**kwargs)
 
-            self._add_section(
-                elements=elements,
-                has_header=elements_header,
-                section_name=section_name,
-                capitalized=elements_capitalized,
-                documented_prob=elements_doc_prob,
-            )
+                self._add_section(
+                    elements=elements,
+                    has_header=elements_header,
+                    section_name=section_name,
+                    capitalized=elements_capitalized,
+                    documented_prob=elements_doc_prob,
+                )
 
         if self._commands_section:
             add_section(
@@ -994,7 +1114,44 @@ class HelpGenerator:
         to a list of tuples with 3 elements, the label, the character where
         the label starts in the string, and the end.
         This object is easily written to a jsonl file.
+
+        Every access generates a new message, see `generate_batch`
+        to generate many messages.
         """
-        self._help_message = ""
+        self._clear()
         msg = self.sample()
-        return {"message": msg, "annotations": self._annotations}
+        # A copy, the list is cleared when the instance is reset.
+        return {"message": msg, "annotations": list(self._annotations)}
+
+    @property
+    def tokens(self) -> list[str]:
+        """Text of the elements annotated in the message, as they were emitted
+        (before wrapping), in the order of the annotations. Used to validate
+        the spans, see `validation`.
+        """
+        return list(self._tokens)
+
+    @property
+    def sections(self) -> list[str]:
+        """Parts of SECTIONS written in the message (the description, and the
+        sections with at least an element), in the order they are written.
+        The arguments only give the chance of adding them, i.e.
+        `description_before` doesn't add a description with
+        `program_description_prob` = 0, nor `commands_section` a section
+        without commands.
+        """
+        return list(self._sections)
+
+
+@functools.cache
+def _layout_defaults() -> dict[str, Any]:
+    """Default values of the layout parameters of HelpGenerator."""
+    return {
+        name: param.default
+        for name, param in inspect.signature(HelpGenerator).parameters.items()
+        if name not in _RUNTIME_PARAMS
+    }
+
+
+# Attribute storing each layout parameter.
+_ATTRIBUTES = {name: "_" + name for name in _layout_defaults()}
@@ -0,0 +1,204 @@
+"""Events emitted by the phases of a HelpGenerator.
+
+An instrument is any callable receiving an `Event`, passed to
+`HelpGenerator(instrument=...)`. Every call to one of the phases of the
+generator (`INSTRUMENTED_PHASES`) emits an event with the time spent,
+the characters it produced and the annotations (spans) it added. The
+times are inclusive, `programs` contains the time of each `program`.
+
+Without an instrument the methods aren't wrapped, so the default has
+no cost.
+
+`PhaseHistograms` is an instrument that aggregates the events in
+histograms, which can be exported in the Prometheus text format:
+
+>>> histograms = PhaseHistograms()
+>>> for i in range(1000):
+...     HelpGenerator(seed=i, instrument=histograms).annotations
+>>> histograms.write(Path("metrics.prom"))
+"""
+
+import functools
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+# Methods of HelpGenerator that emit events, and the name of their phase.
+INSTRUMENTED_PHASES = {
+    "_add_program_description": "program_description",
+    "_add_programs": "programs",
+    "_add_program": "program",
+    "_add_annotations": "annotations",
+    "_add_section": "section",
+    "_add_documentation": "documentation",
+}
+
+
+class Event(NamedTuple):
+    """Measures of a call to a phase of the generator.
+
+    Attributes:
+        phase (str): Name of the phase, a value of INSTRUMENTED_PHASES.
+        elapsed_ns (int): Time spent in the call, in nanoseconds.
+        chars (int): Characters written to the message, or the length of the text
+            returned for the phases that don't write (`documentation`).
+        spans (int): Number of annotations added.
+    """
+
+    phase: str
+    elapsed_ns: int
+    chars: int
+    spans: int
+
+
+Instrument = Callable[[Event], Any]
+
+
+def instrument_method(
+    generator: Any, name: str, instrument: Instrument
+) -> Callable[..., Any]:
+    """Wraps a method of a HelpGenerator instance to emit its events.
+
+    Args:
+        generator (HelpGenerator): Instance whose method is wrapped.
+        name (str): Name of the method, a key of INSTRUMENTED_PHASES.
+        instrument (Instrument): Callable receiving the events.
+
+    Returns:
+        Callable[..., Any]: The method wrapped.
+    """
+    method = getattr(generator, name)
+    phase = INSTRUMENTED_PHASES[name]
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        length = generator._current_length
+        spans = len(generator._annotations)
+        start = time.perf_counter_ns()
+        result = method(*args, **kwargs)
+        elapsed = time.perf_counter_ns() - start
+        chars = (
+            len(result)
+            if isinstance(result, str)
+            else generator._current_length - length
+        )
+        instrument(Event(phase, elapsed, chars, len(generator._annotations) - spans))
+        return result
+
+    return wrapper
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, as those of Prometheus.
+
+    Args:
+        buckets (tuple[float, ...]): Upper bounds of the buckets, sorted.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # The last count is the +Inf bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+# Buckets of the histograms of each measure.
+DURATION_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+)
+CHARS_BUCKETS = (0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SPANS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (description, buckets)
+_METRICS = {
+    "duration_seconds": ("Time spent in each phase.", DURATION_BUCKETS),
+    "chars": ("Characters produced by each phase.", CHARS_BUCKETS),
+    "spans": ("Annotations added by each phase.", SPANS_BUCKETS),
+}
+
+
+class PhaseHistograms:
+    """Instrument aggregating the events in histograms per phase.
+
+    Args:
+        prefix (str, optional): Prefix of the names of the metrics.
+            Defaults to "cli_help_maker_phase".
+    """
+
+    def __init__(self, prefix: str = "cli_help_maker_phase") -> None:
+        self.prefix = prefix
+        # phase -> metric -> Histogram
+        self.histograms: dict[str, dict[str, Histogram]] = {}
+
+    def _phase(self, phase: str) -> dict[str, Histogram]:
+        histograms = self.histograms.get(phase)
+        if histograms is None:
+            histograms = self.histograms[phase] = {
+                name: Histogram(buckets) for name, (_, buckets) in _METRICS.items()
+            }
+        return histograms
+
+    def __call__(self, event: Event) -> None:
+        histograms = self._phase(event.phase)
+        histograms["duration_seconds"].observe(event.elapsed_ns / 1e9)
+        histograms["chars"].observe(event.chars)
+        histograms["spans"].observe(event.spans)
+
+    def merge(self, other: "PhaseHistograms") -> None:
+        """Adds the events of other instrument, i.e. from another process."""
+        for phase, histograms in other.histograms.items():
+            for name, histogram in self._phase(phase).items():
+                histogram.merge(histograms[name])
+
+    def to_prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = []
+        for name, (description, buckets) in _METRICS.items():
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            for phase in sorted(self.histograms):
+                histogram = self.histograms[phase][name]
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{metric}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'{metric}_sum{{phase="{phase}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{phase="{phase}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """Writes the histograms to a file, replaced atomically to be
+        read by a textfile collector while the generation runs."""
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(self.to_prometheus())
+        os.replace(tmp, path)
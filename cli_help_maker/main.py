@@ -1,17 +1,40 @@
 """CLI module to create a dataset of help messages. """
 
+import hashlib
+import multiprocessing
+import os
 import random
 import textwrap
-from itertools import accumulate
+from collections import deque
 from pathlib import Path
-from typing import Callable, Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import srsly
 import typer
 from pydantic import BaseModel
 from rich.progress import track
 
+from cli_help_maker import utils
+from cli_help_maker.compression import DEFAULT_FRAME_SIZE, Compression
+from cli_help_maker.corpus import CORPUS_ENV_VAR
+from cli_help_maker.dedup import MAX_ATTEMPTS, Deduplicator, DedupMode
+from cli_help_maker.docbin import blank_nlp, doc_bytes
 from cli_help_maker.generator import HelpGenerator
+from cli_help_maker.profiling import NULL_PROFILER, Profiler, Stats, print_report
+from cli_help_maker.readers import iter_messages
+from cli_help_maker.sampling import (
+    ArgumentSampler,
+    ConstantSampler,
+    DiscreteSampler,
+    Sampler,
+    SetSampler,
+    UniformContinuousSampler,
+    UniformDiscreteSampler,
+    sample_seed,
+)
+from cli_help_maker.stats import DatasetStats
+from cli_help_maker.validation import Quarantine, validate_batch
+from cli_help_maker.writers import DatasetWriter, OutputFormat
 
 try:
     from ruamel.yaml import YAML
@@ -63,6 +86,62 @@ class DatasetConfig(BaseModel):
     arguments: dict[str, ArgumentField]
 
 
+# Arguments of HelpGenerator drawn from the config, in the order they are sampled.
+HELP_ARGUMENTS = (
+    "indent_spaces",
+    "total_width",
+    "prob_name_capitalized",
+    "description_before",
+    "description_after",
+    "program_description_prob",
+    "usage_section",
+    "usage_pattern_capitalized",
+    "commands_section",
+    "commands_header",
+    "commands_capitalized",
+    "commands_documented_prob",
+    "arguments_section",
+    "arguments_header",
+    "arguments_style",
+    "argument_repeated",
+    "argument_documented_prob",
+    "arguments_pattern_capitalized",
+    "argument_capitalized_prob",
+    "argument_optional_prob",
+    "argument_any_number_prob",
+    "argument_nested_prob",
+    "options_section",
+    "options_header",
+    "option_documented_prob",
+    "options_pattern_capitalized",
+    "options_shortcut",
+    "options_shortcut_capitalized_prob",
+    "options_shortcut_all_caps",
+    "exclusive_group_optional_prob",
+    "options_mutually_exclusive_prob",
+    "option_set_size",
+    "option_set_size_prob",
+    "number_of_commands",
+    "number_of_arguments",
+    "number_of_options",
+    "exclusive_programs",
+)
+
+
+def load_config(config: Path) -> DatasetConfig:
+    """Reads and validates a configuration file to create a dataset.
+
+    Args:
+        config (Path) Path to the yaml config file.
+
+    Returns:
+        DatasetConfig: The content of the file.
+    """
+    yaml = YAML(typ="safe")  # default, if not specfied, is 'rt' (round-trip)
+    with open(config, "r") as f:
+        return DatasetConfig(**yaml.load(f))
+
+
 def read_config(config: Path) -> dict[str, str]:
     """Reads a configuration file with the parameters to create a dataset
     of help messages.
@@ -86,11 +165,7 @@ def read_config(config: Path) -> dict[str, str]:
     Notes
         An example of this file can be seen [here](https://github.com/plaguss/cli-help-maker/dataset.yaml)
     """
-    yaml = YAML(typ="safe")  # default, if not specfied, is 'rt' (round-trip)
-    with open(config, "r") as f:
-        config = yaml.load(f)
-
-    dataset_config = DatasetConfig(**config)
+    dataset_config = load_config(config)
 
     conf = {
         "version": dataset_config.version,
@@ -103,25 +178,45 @@ def read_config(config: Path) -> dict[str, str]:
     return conf
 
 
-def get_distribution(data: dict[str, str | dict[str, int]]) -> Callable:
-    """Get the distribution of an argument from the config yaml.
+def compile_config(dataset_config: DatasetConfig) -> ArgumentSampler:
+    """Compiles the arguments of a config to a sampler.
+
+    The parameters of the distributions are validated and frozen once,
+    the sampler draws the same arguments as `sample_arguments` does
+    with the output of `read_config`. It can be pickled to be sent to
+    other processes.
+
+    Args:
+        dataset_config (DatasetConfig): Config read with `load_config`.
+
+    Raises:
+        ValueError: If an argument of HelpGenerator is missing or
+            a distribution isn't valid.
+
+    Returns:
+        ArgumentSampler: Sampler of the arguments.
+    """
+    arguments = dataset_config.arguments
+    missing = [name for name in HELP_ARGUMENTS if name not in arguments]
+    if missing:
+        raise ValueError(f"Arguments missing in the config: {missing}")
+    return ArgumentSampler(
+        {name: compile_distribution(arguments[name].dict()) for name in HELP_ARGUMENTS}
+    )
+
+
+def compile_distribution(data: dict[str, str | dict[str, int]]) -> Sampler:
+    """Get the sampler of the distribution of an argument from the config yaml.
 
     Args:
         data (dict[str, str | dict[str, int]]):
-            Corresponds to an argument in yaml parsed:
-            dist: uniform-continuous
-            parameters:
-                min: 0
-                max: 1
+            Corresponds to an argument in yaml parsed, see `get_distribution`.
 
     Raises:
         ValueError: When a value is not allowed.
-            Mainly checks the values expected in the parameters field for each
-            of the 'distributions' selected.
 
     Returns:
-        generator (Callable): A function to generate values according to
-            the distribution selected.
+        Sampler: Sampler with the parameters of the distribution.
     """
     dist, parameters = data.get("dist"), data.get("parameters")
 
@@ -130,42 +225,84 @@ def get_distribution(data: dict[str, str | dict[str, int]]) -> Callable:
             raise ValueError(
                 f"'constant' dist expects a key 'value', you have: {parameters.keys()}"
             )
-        return lambda: parameters["value"]
+        return ConstantSampler(parameters["value"])
     elif dist == "set":
         if "values" not in parameters.keys():
             raise ValueError(
                 f"'range' dist expects a key 'values', you have: {parameters.keys()}"
             )
-        return lambda: random.choice(parameters["values"])
+        return SetSampler(parameters["values"])
     elif dist == "uniform-discrete":
         if "min" not in parameters.keys() or "max" not in parameters.keys():
             raise ValueError(
                 f"'uniform-discrete' dist expects key 'min' and 'max', you have: {parameters.keys()}"
             )
-        return lambda: random.randint(parameters["min"], parameters["max"])
+        return UniformDiscreteSampler(parameters["min"], parameters["max"])
     elif dist == "uniform-continuous":
         if "min" not in parameters.keys() or "max" not in parameters.keys():
             raise ValueError(
                 f"'uniform-continuous' dist expects key 'min' and 'max', you have: {parameters.keys()}"
             )
-        return (
-            lambda: parameters["min"]
-            + (parameters["max"] - parameters["min"]) * random.random()
-        )
+        return UniformContinuousSampler(parameters["min"], parameters["max"])
     elif dist == "custom":
         if "values" not in parameters.keys() or "p" not in parameters.keys():
             raise ValueError(
                 f"'custom' dist expects key 'values' and 'p', you have: {parameters.keys()}"
             )
-        return lambda: random.choices(
-            population=parameters["values"],
-            cum_weights=list(accumulate(parameters["p"])),
-        )[0]
+        return DiscreteSampler(parameters["values"], weights=parameters["p"])
     else:
         raise ValueError(f"`dist` field not defined: {dist}")
 
 
+def get_distribution(data: dict[str, str | dict[str, int]]) -> Callable:
+    """Get the distribution of an argument from the config yaml.
+
+    Args:
+        data (dict[str, str | dict[str, int]]):
+            Corresponds to an argument in yaml parsed:
+            dist: uniform-continuous
+            parameters:
+                min: 0
+                max: 1
+
+    Raises:
+        ValueError: When a value is not allowed.
+            Mainly checks the values expected in the parameters field for each
+            of the 'distributions' selected.
+
+    Returns:
+        generator (Callable): A function to generate values according to
+            the distribution selected. It accepts an optional random.Random
+            instance to draw the values from, the global random module is
+            used by default.
+    """
+    return compile_distribution(data).sample
+
+
 HelpArgs = dict[str, int | float | bool | str | list[int]]
+Annotations = dict[str, str | list[tuple[str, int, int]]]
+
+
+def sample_arguments(
+    input_generator: dict[str, Callable] | ArgumentSampler,
+    rng: random.Random | None = None,
+) -> HelpArgs:
+    """Draws the arguments for a single HelpGenerator from the distributions
+    read from the config file.
+
+    Args:
+        input_generator (dict[str, Callable] or ArgumentSampler): arguments field
+            obtained from `read_config`, or the sampler from `compile_config`.
+        rng (random.Random or None, optional): Source of randomness, the global
+            random module if not given. Defaults to None.
+
+    Returns:
+        HelpArgs: keyword arguments for HelpGenerator.
+    """
+    if isinstance(input_generator, ArgumentSampler):
+        return input_generator.sample(rng)
+    rng = rng or random
+    return {name: input_generator[name](rng) for name in HELP_ARGUMENTS}
 
 
 def argument_generator(
@@ -183,58 +320,366 @@ def argument_generator(
         _type_: _description_
     """
     for _ in track(range(size)):  # Value extracted from conf
-        # TODO: Get the values from the input generator here to keep track
-        # of the values that generated each message (for future use).
-        kwargs = {
-            "indent_spaces": input_generator["indent_spaces"](),
-            "total_width": input_generator["total_width"](),
-            "prob_name_capitalized": input_generator["prob_name_capitalized"](),
-            "description_before": input_generator["description_before"](),
-            "description_after": input_generator["description_after"](),
-            "program_description_prob": input_generator["program_description_prob"](),
-            "usage_section": input_generator["usage_section"](),
-            "usage_pattern_capitalized": input_generator["usage_pattern_capitalized"](),
-            "commands_section": input_generator["commands_section"](),
-            "commands_header": input_generator["commands_header"](),
-            "commands_capitalized": input_generator["commands_capitalized"](),
-            "commands_documented_prob": input_generator["commands_documented_prob"](),
-            "arguments_section": input_generator["arguments_section"](),
-            "arguments_header": input_generator["arguments_header"](),
-            "arguments_style": input_generator["arguments_style"](),
-            "argument_repeated": input_generator["argument_repeated"](),
-            "argument_documented_prob": input_generator["argument_documented_prob"](),
-            "arguments_pattern_capitalized": input_generator[
-                "arguments_pattern_capitalized"
-            ](),
-            "argument_capitalized_prob": input_generator["argument_capitalized_prob"](),
-            "argument_optional_prob": input_generator["argument_optional_prob"](),
-            "argument_any_number_prob": input_generator["argument_any_number_prob"](),
-            "argument_nested_prob": input_generator["argument_nested_prob"](),
-            "options_section": input_generator["options_section"](),
-            "options_header": input_generator["options_header"](),
-            "option_documented_prob": input_generator["option_documented_prob"](),
-            "options_pattern_capitalized": input_generator[
-                "options_pattern_capitalized"
-            ](),
-            "options_shortcut": input_generator["options_shortcut"](),
-            "options_shortcut_capitalized_prob": input_generator[
-                "options_shortcut_capitalized_prob"
-            ](),
-            "options_shortcut_all_caps": input_generator["options_shortcut_all_caps"](),
-            "exclusive_group_optional_prob": input_generator[
-                "exclusive_group_optional_prob"
-            ](),
-            "options_mutually_exclusive_prob": input_generator[
-                "options_mutually_exclusive_prob"
-            ](),
-            "option_set_size": input_generator["option_set_size"](),
-            "option_set_size_prob": input_generator["option_set_size_prob"](),
-            "number_of_commands": input_generator["number_of_commands"](),
-            "number_of_arguments": input_generator["number_of_arguments"](),
-            "number_of_options": input_generator["number_of_options"](),
-            "exclusive_programs": input_generator["exclusive_programs"](),
-        }
-        yield kwargs
+        yield sample_arguments(input_generator)
+
+
+def generate_sample(
+    index: int,
+    seed: int,
+    input_generator: dict[str, Callable] | ArgumentSampler,
+    profiler: Profiler = NULL_PROFILER,
+    generator: HelpGenerator | None = None,
+    attempt: int = 0,
+) -> tuple[HelpArgs, Annotations]:
+    """Generates the sample placed at `index` in the dataset.
+
+    The arguments are drawn from a random.Random seeded with the seed derived
+    from the base seed and the index, so the same sample is obtained independently
+    of the samples generated before it. The seed for the HelpGenerator is drawn
+    from the same stream and stored with the arguments, passing them back
+    to HelpGenerator reproduces the message.
+
+    A sample discarded (i.e. a duplicate) is replaced by the one of the next
+    attempt, seeded with the base seed, the index and the attempt.
+
+    Args:
+        index (int): Position of the sample in the dataset.
+        seed (int): Base seed of the dataset.
+        input_generator (dict[str, Callable] or ArgumentSampler): arguments field
+            obtained from `read_config`, or the sampler from `compile_config`.
+        profiler (Profiler, optional): Measures the time of each stage.
+            Defaults to NULL_PROFILER.
+        generator (HelpGenerator or None, optional): Instance reset with
+            the arguments of the sample instead of creating a new one.
+            Defaults to None.
+        attempt (int, optional): Times the sample was generated before.
+            Defaults to 0.
+
+    Returns:
+        tuple[HelpArgs, Annotations]: The arguments passed to HelpGenerator
+            and the annotated message generated with them.
+    """
+    with profiler.stage("sample"):
+        rng = random.Random(sample_seed(seed, index, attempt))
+        with profiler.stage("arguments"):
+            kwargs = sample_arguments(input_generator, rng=rng)
+            kwargs["seed"] = rng.getrandbits(64)
+        with profiler.stage("generator"):
+            if generator is None:
+                generator = HelpGenerator(**kwargs, profiler=profiler)
+            else:
+                generator.reset(**kwargs)
+            annotations = generator.annotations
+    return kwargs, annotations
+
+
+# State of each process generating samples, set by `_init_worker`.
+_worker_state = {}
+
+
+def _init_worker(
+    sampler: ArgumentSampler,
+    seed: int,
+    profile: bool = False,
+    docbin: bool = False,
+    stats: bool = False,
+    validate: bool = False,
+) -> None:
+    """Sets the state of the process, the sampler of the arguments is
+    compiled once and pickled to the workers."""
+    _worker_state["input_generator"] = sampler
+    _worker_state["seed"] = seed
+    _worker_state["profiler"] = Profiler() if profile else NULL_PROFILER
+    # Stats of the samples of each block, merged by the main process.
+    _worker_state["stats"] = DatasetStats.from_sampler(sampler) if stats else None
+    # Pipeline to tokenize the messages in the worker with --format docbin.
+    _worker_state["nlp"] = blank_nlp() if docbin else None
+    # Whether to validate the annotations of the samples of each block.
+    _worker_state["validate"] = validate
+    # A single generator per process, reset for every sample.
+    _worker_state["generator"] = HelpGenerator(
+        seed=seed, profiler=_worker_state["profiler"]
+    )
+
+
+def _generate(index: int, attempt: int = 0) -> tuple:
+    """Generates a sample with the state of the process.
+
+    With a pipeline to tokenize the messages, the sample contains
+    the serialized doc too.
+    """
+    profiler = _worker_state["profiler"]
+    nlp = _worker_state["nlp"]
+    kwargs, annotations = generate_sample(
+        index,
+        _worker_state["seed"],
+        _worker_state["input_generator"],
+        profiler,
+        _worker_state["generator"],
+        attempt=attempt,
+    )
+    if nlp is None:
+        return kwargs, annotations
+    with profiler.stage("docbin"):
+        return kwargs, annotations, doc_bytes(nlp, annotations)
+
+
+def _validate(samples: list[tuple], tokens: list[list[str]]) -> list[list[str]]:
+    """Problems of the annotations of some samples, see `validate_batch`."""
+    with _worker_state["profiler"].stage("validate"):
+        return validate_batch([sample[1] for sample in samples], tokens)
+
+
+def _generate_block(block: range) -> tuple[
+    list[tuple],
+    Stats,
+    DatasetStats | None,
+    list[list[str]] | None,
+    list[list[str]] | None,
+]:
+    """Generates the samples of a block, and returns them with the
+    timings measured by the profiler of the process, their stats, the
+    problems of their annotations (when validated) and the sections
+    written in them (with the stats)."""
+    profiler = _worker_state["profiler"]
+    generator = _worker_state["generator"]
+    validate, dataset_stats = _worker_state["validate"], _worker_state["stats"]
+    samples, tokens = [], []
+    sections = None if dataset_stats is None else []
+    for i in block:
+        samples.append(_generate(i))
+        if validate:
+            tokens.append(generator.tokens)
+        if sections is not None:
+            sections.append(generator.sections)
+    problems = _validate(samples, tokens) if validate else None
+    if dataset_stats is not None:
+        with profiler.stage("stats"):
+            for (kwargs, annotations, *_), written in zip(samples, sections):
+                dataset_stats.add(kwargs, annotations, written)
+        dataset_stats = dataset_stats.pop()
+    return samples, profiler.pop_stats(), dataset_stats, problems, sections
+
+
+def generate_samples(
+    input_path: Path,
+    size: int,
+    seed: int,
+    workers: int = 1,
+    block_size: int = 64,
+    start: int = 0,
+    profiler: Profiler = NULL_PROFILER,
+    docbin: bool = False,
+    deduplicator: Deduplicator | None = None,
+    max_attempts: int = MAX_ATTEMPTS,
+    stats: DatasetStats | None = None,
+    align: tuple[int, ...] = (),
+    quarantine: Quarantine | None = None,
+) -> Iterable[tuple]:
+    """Generates the samples of a dataset in order.
+
+    The indices are split in blocks which are distributed across a pool
+    of processes when `workers` > 1. The samples are yielded in the same
+    order independently of the number of workers.
+
+    With a deduplicator, the duplicates are generated again (in this process,
+    with the next `attempt` of `generate_sample`) until they are unique, or
+    kept after `max_attempts`. The samples are checked in order, the dataset
+    doesn't depend on the number of workers either.
+
+    With a quarantine, the annotations of the samples are validated in the
+    workers (a block at once). The invalid samples are added to the quarantine
+    and generated again as the duplicates, before checking whether they are
+    duplicates.
+
+    The stats of the samples are computed in the workers, and merged in
+    `stats` before yielding the samples of each block.
+
+    Args:
+        input_path (Path): Path to the yaml config file.
+        size (int): Number of samples to generate.
+        seed (int): Base seed of the dataset.
+        workers (int, optional): Number of processes. Defaults to 1.
+        block_size (int, optional): Number of samples sent to a worker
+            at once. Defaults to 64.
+        start (int, optional): Index of the first sample to generate, used to
+            continue a dataset. Defaults to 0.
+        profiler (Profiler, optional): Collects the timings of the samples,
+            measured in the workers. Defaults to NULL_PROFILER.
+        docbin (bool, optional): Whether to tokenize the messages in the workers
+            and serialize them as spaCy docs (see `docbin.doc_bytes`).
+            Defaults to False.
+        deduplicator (Deduplicator or None, optional): Messages seen, to
+            replace the duplicates. Defaults to None.
+        max_attempts (int, optional): Regenerations of a duplicate (or
+            invalid sample) before keeping it. Defaults to MAX_ATTEMPTS.
+        stats (DatasetStats or None, optional): Stats updated with the samples.
+            Defaults to None.
+        align (tuple[int, ...], optional): The blocks end at the multiples of
+            each of these numbers too, so `stats` contains exactly the samples
+            consumed at those points (i.e. the checkpoints). Defaults to ().
+        quarantine (Quarantine or None, optional): Where the samples with
+            invalid annotations are written. Defaults to None.
+
+    Yields:
+        tuple: arguments and annotations of each sample, and the
+            serialized doc with `docbin`.
+
+    Note:
+        At most 2 blocks per worker are requested ahead of the consumer,
+        the memory used doesn't depend on the size of the dataset.
+    """
+    sampler = compile_config(load_config(input_path))
+    profile = profiler is not NULL_PROFILER
+    blocks = _blocks(start, size, block_size, align)
+    validate = quarantine is not None
+    samples = _generate_samples(
+        sampler, blocks, seed, workers, profiler, docbin, stats, validate
+    )
+    if deduplicator is None and quarantine is None:
+        for sample, *_ in samples:
+            yield sample
+        return
+
+    if workers > 1:
+        # The duplicates and invalid samples are generated again in this process.
+        _init_worker(sampler, seed, profile=profile, docbin=docbin, validate=validate)
+    for index, (sample, problems, sections) in enumerate(samples, start):
+        for attempt in range(1, max_attempts + 2):
+            if quarantine is not None and quarantine.check(
+                index, attempt - 1, sample, problems
+            ):
+                rejected = quarantine
+            else:
+                if deduplicator is None:
+                    break
+                with profiler.stage("dedup"):
+                    if deduplicator.check(sample[1]["message"]) is None:
+                        break
+                rejected = deduplicator
+            if attempt > max_attempts:
+                rejected.counts["kept"] += 1
+                break
+            rejected.counts["regenerated"] += 1
+            if stats is not None:
+                stats.add(*sample[:2], sections, weight=-1)
+            sample = _generate(index, attempt)
+            generator = _worker_state["generator"]
+            if stats is not None:
+                sections = generator.sections
+                stats.add(*sample[:2], sections)
+            if validate:
+                (problems,) = _validate([sample], [generator.tokens])
+            profiler.merge(_worker_state["profiler"].pop_stats())
+        if deduplicator is not None:
+            with profiler.stage("dedup"):
+                deduplicator.insert(sample[1]["message"])
+        yield sample
+
+
+def _blocks(
+    start: int, size: int, block_size: int, align: tuple[int, ...]
+) -> Iterator[range]:
+    """Splits the indices from `start` in blocks of `block_size`, which
+    end at the multiples of each number in `align` too."""
+    i = start
+    while i < size:
+        end = min(i + block_size, size)
+        for step in align:
+            end = min(end, (i // step + 1) * step)
+        yield range(i, end)
+        i = end
+
+
+def _generate_samples(
+    sampler: ArgumentSampler,
+    blocks: Iterable[range],
+    seed: int,
+    workers: int,
+    profiler: Profiler,
+    docbin: bool,
+    stats: DatasetStats | None,
+    validate: bool = False,
+) -> Iterable[tuple[tuple, list[str] | None, list[str] | None]]:
+    """Generates the samples in blocks, see `generate_samples`. Yields each
+    sample with the problems of its annotations (None if not validated)
+    and its sections (None without stats)."""
+    profile = profiler is not NULL_PROFILER
+
+    def collect(result: tuple) -> Iterable[tuple]:
+        block, timings, block_stats, problems, sections = result
+        profiler.merge(timings)
+        if stats is not None:
+            stats.merge(block_stats)
+        missing = [None] * len(block)
+        return zip(block, problems or missing, sections or missing)
+
+    if workers == 1:
+        _init_worker(
+            sampler,
+            seed,
+            profile=profile,
+            docbin=docbin,
+            stats=stats is not None,
+            validate=validate,
+        )
+        for result in map(_generate_block, blocks):
+            yield from collect(result)
+        return
+
+    with multiprocessing.Pool(
+        workers,
+        initializer=_init_worker,
+        initargs=(sampler, seed, profile, docbin, stats is not None, validate),
+    ) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(pool.apply_async(_generate_block, (block,)))
+            if len(pending) >= 2 * workers:
+                yield from collect(pending.popleft().get())
+        while pending:
+            yield from collect(pending.popleft().get())
+
+
+def _progress(
+    dataset_stats: DatasetStats | None, quarantine: Quarantine | None
+) -> dict:
+    """Stats and validation report of the samples generated so far,
+    stored in the checkpoints."""
+    return {
+        "stats": dataset_stats and dataset_stats.to_dict(),
+        "validation": quarantine and quarantine.report(),
+    }
+
+
+def read_checkpoint(path: Path, config_sha256: str) -> dict:
+    """Reads the checkpoint of a dataset to resume its generation.
+
+    The samples only depend on the base seed and their index (see `sample_seed`),
+    so the random state to continue is given by the seed and the last index
+    stored in the checkpoint.
+
+    Args:
+        path (Path): Path to checkpoint.json.
+        config_sha256 (str): sha256 of the config file used to resume.
+
+    Raises:
+        typer.BadParameter: If there is no checkpoint or it was written
+            from a different config file.
+
+    Returns:
+        dict: content of the checkpoint.
+    """
+    if not path.is_file():
+        raise typer.BadParameter(
+            f"There is no checkpoint to resume from in: {path.parent}"
+        )
+    checkpoint = srsly.read_json(path)
+    if checkpoint["config_sha256"] != config_sha256:
+        raise typer.BadParameter(
+            "The config file differs from the one used to generate the dataset."
+        )
+    return checkpoint
 
 
 @app.command()
@@ -246,6 +691,100 @@ def main(
         None,
         help="Dirname of the output path. If not given, creates a directory with the version number",
     ),
+    workers: int = typer.Option(
+        1, "--workers", "-w", min=1, help="Number of processes generating samples."
+    ),
+    seed: Optional[int] = typer.Option(
+        None,
+        help="Base seed of the dataset. The same seed generates the same dataset "
+        "independently of the number of workers. If not given, a random one is used.",
+    ),
+    shard_size: int = typer.Option(
+        0,
+        min=0,
+        help="Maximum number of samples per file. If 0, the dataset is written "
+        "to a single file.",
+    ),
+    checkpoint_every: int = typer.Option(
+        10000, min=1, help="Number of samples between checkpoints."
+    ),
+    resume: bool = typer.Option(
+        False,
+        help="Continue the dataset in the output path from its last checkpoint. "
+        "The seed, shard size, checkpoint interval, format, row group size, "
+        "compression, index, deduplication, stats and validation are those stored "
+        "in the checkpoint.",
+    ),
+    corpus: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        dir_okay=False,
+        envvar=CORPUS_ENV_VAR,
+        help="Compiled word corpus (see cli_help_maker.corpus), shared by the "
+        "workers instead of loading the nltk corpus in each of them.",
+    ),
+    profile: bool = typer.Option(
+        False,
+        help="Measure the time spent in each stage of the generation, written "
+        "to profile.json and profile.collapsed (for flamegraphs) in the output path.",
+    ),
+    output_format: OutputFormat = typer.Option(
+        OutputFormat.jsonl,
+        "--format",
+        help="Format of the files. parquet and arrow (requires pyarrow) write "
+        "the messages, annotations and arguments to a single table. docbin "
+        "(requires spaCy) writes the messages as spaCy docs to .spacy files.",
+    ),
+    row_group_size: int = typer.Option(
+        10000, min=1, help="Number of samples per row group of parquet and arrow."
+    ),
+    compress: Optional[Compression] = typer.Option(
+        None,
+        help="Compress the jsonl files while they are written (in a background "
+        "thread), zstd requires zstandard.",
+    ),
+    compress_level: Optional[int] = typer.Option(
+        None, help="Compression level, the default of the format if not given."
+    ),
+    frame_size: int = typer.Option(
+        DEFAULT_FRAME_SIZE,
+        min=1,
+        help="Minimum uncompressed bytes of each independent frame of the "
+        "compressed files.",
+    ),
+    index: bool = typer.Option(
+        False,
+        help="Write a sidecar index (.idx) with the offset of every line of the "
+        "jsonl files, to read any sample with cli_help_maker.readers.Dataset.",
+    ),
+    dedup: Optional[DedupMode] = typer.Option(
+        None,
+        help="Generate again the samples whose message is a duplicate of a previous "
+        "one, exact (after normalizing the case and whitespace) or near (requires "
+        "numpy). Uses about 2.4 bytes per sample for exact and 22 for near.",
+    ),
+    dedup_error_rate: float = typer.Option(
+        1e-4, help="False positive rate of the filters of --dedup, in (0, 1)."
+    ),
+    max_attempts: int = typer.Option(
+        MAX_ATTEMPTS,
+        min=0,
+        help="Regenerations of a duplicate (or invalid sample with --validate) "
+        "before keeping it anyway.",
+    ),
+    stats: bool = typer.Option(
+        True,
+        help="Compute the stats of the dataset while it's generated (spans of each "
+        "label, lengths, sections, distribution of the arguments...), written "
+        "to stats.json in the output path.",
+    ),
+    validate: bool = typer.Option(
+        False,
+        help="Check the annotations of every sample (within the message, not "
+        "overlapping, not on whitespace and matching the text annotated) while "
+        "they are generated (requires numpy). The invalid samples are written "
+        "to quarantine.jsonl and generated again.",
+    ),
 ):
     """Function to generate a dataset of cli help messages from a .yaml file
     with the info.
@@ -258,25 +797,217 @@ def main(
 
     - dataset.jsonl:
         A dataset of help messages with annotations.
+
+    Both files are aligned line by line. When --shard-size is given, the files
+    are split in shards (dataset-00000-of-00010.jsonl,
+    arguments-00000-of-00010.jsonl...).
+
+    - manifest.json:
+        Number of lines, bytes and checksum of every file.
+
+    - stats.json:
+        Spans of each label, histograms of the length, lines and wrapped lines
+        of the messages, sections present and the distribution of each
+        argument. Computed by the workers while the samples are generated,
+        unless --no-stats is given.
+
+    While the dataset is generated, a checkpoint.json file keeps the last
+    sample written to disk. If the process is interrupted, run the command
+    again with --resume to continue from that point, the files obtained are the
+    same as those of an uninterrupted run.
+
+    With --format parquet (or arrow), both files are replaced by dataset.parquet
+    (dataset.arrow), a table with the message, the annotations and a column
+    per argument. With --format docbin, dataset.jsonl is replaced by
+    dataset.spacy, the messages tokenized (in the workers) as spaCy docs with
+    the annotations as entities, ready for `spacy train`. These files can't be
+    continued, --resume starts again from the last shard completed.
+
+    With --compress zstd (or gzip) the jsonl files are compressed, written
+    as .jsonl.zst (.jsonl.gz). They can be read by any zstd (gzip) reader,
+    or with cli_help_maker.compression.read_jsonl.
+
+    With --dedup, the messages are checked as they are generated, and
+    the duplicates are generated again (with the same seed, index and the
+    attempt). The counts are stored in the manifest.
+
+    With --validate, the spans of every sample are checked in the workers
+    (see cli_help_maker.validation), and the invalid samples are generated
+    again like the duplicates. The counts are stored in the manifest.
+
+    - quarantine.jsonl:
+        Only with --validate, the invalid samples with their problems, index,
+        attempt and arguments. Only written if any sample is invalid.
+
+    With --index, every jsonl file gets a sidecar file (dataset.jsonl.idx...)
+    with the offset of its lines, cli_help_maker.readers.Dataset uses them to
+    read any sample (and its arguments) without scanning the files.
+
+    - profile.json, profile.collapsed:
+        Only with --profile, time spent in each stage.
     """
+    profiler = Profiler() if profile else NULL_PROFILER
 
-    conf = read_config(input_path)
-    input_generator = conf["arguments"]
+    if corpus is not None:
+        # The workers read the corpus from the environment variable.
+        os.environ[CORPUS_ENV_VAR] = str(corpus)
+        utils.word_list.use(corpus)
+
+    with profiler.stage("config"):
+        conf = read_config(input_path)
     if output_path is None:
         output_path = input_path.parent / ("dataset_v" + conf["version"])
-        if not output_path.is_dir():
-            output_path.mkdir()
-
-    kwargs = list(argument_generator(conf["size"], input_generator))
-    srsly.write_jsonl(
-        path=output_path / "arguments.jsonl",
-        lines=(kw for kw in kwargs),
-    )
-    srsly.write_jsonl(
-        path=output_path / "dataset.jsonl",
-        lines=(HelpGenerator(**kw).annotations for kw in kwargs),
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    checkpoint_path = output_path / "checkpoint.json"
+    config_sha256 = hashlib.sha256(input_path.read_bytes()).hexdigest()
+    state = None
+    if resume:
+        checkpoint = read_checkpoint(checkpoint_path, config_sha256)
+        seed, shard_size = checkpoint["seed"], checkpoint["shard_size"]
+        state = checkpoint["writer"]
+        output_format = OutputFormat(state["format"])
+        compress = state.get("compression")
+        index = state.get("index", False)
+        # The frames of the compressed files end on the checkpoints.
+        checkpoint_every = checkpoint.get("checkpoint_every", checkpoint_every)
+        compress_level = checkpoint.get("compress_level")
+        frame_size = checkpoint.get("frame_size", DEFAULT_FRAME_SIZE)
+        row_group_size = checkpoint.get("row_group_size", row_group_size)
+        # The deduplication of the checkpoint, the options given are ignored.
+        dedup_report = checkpoint.get("dedup")
+        dedup = None
+        if dedup_report is not None:
+            dedup = DedupMode(dedup_report["mode"])
+            dedup_error_rate = dedup_report["error_rate"]
+        max_attempts = checkpoint.get("max_attempts", max_attempts)
+        stats = checkpoint.get("stats") is not None
+        validation_report = checkpoint.get("validation")
+        validate = validation_report is not None
+    elif seed is None:
+        seed = random.randrange(2**32)
+    if compress is not None and output_format in (
+        OutputFormat.parquet,
+        OutputFormat.arrow,
+    ):
+        raise typer.BadParameter(
+            f"--compress can't be used with --format {output_format.value}"
+        )
+    if index and (compress is not None or output_format != OutputFormat.jsonl):
+        raise typer.BadParameter("--index requires uncompressed jsonl files")
+
+    if not 0 < dedup_error_rate < 1:
+        raise typer.BadParameter("--dedup-error-rate must be between 0 and 1")
+    deduplicator = None
+    if dedup is not None:
+        deduplicator = Deduplicator(conf["size"], dedup, error_rate=dedup_error_rate)
+        if state is not None:
+            deduplicator.restore(dedup_report)
+
+    sampler = compile_config(load_config(input_path))
+    dataset_stats = None
+    if stats:
+        dataset_stats = DatasetStats.from_sampler(sampler)
+        if state is not None:
+            dataset_stats.merge(DatasetStats.from_dict(checkpoint["stats"]))
+
+    quarantine = None
+    if validate:
+        quarantine_path = output_path / "quarantine.jsonl"
+        if state is None:
+            quarantine = Quarantine(quarantine_path)
+        else:
+            quarantine = Quarantine(quarantine_path, validation_report["bytes"])
+            quarantine.restore(validation_report)
+
+    start = state["size"] if state else 0
+    samples = generate_samples(
+        input_path,
+        conf["size"],
+        seed,
+        workers=workers,
+        start=start,
+        profiler=profiler,
+        docbin=output_format == OutputFormat.docbin,
+        deduplicator=deduplicator,
+        max_attempts=max_attempts,
+        stats=dataset_stats,
+        quarantine=quarantine,
+        # The stats are complete on every checkpoint, and every shard for the
+        # formats whose checkpoints point to the last shard closed.
+        align=(checkpoint_every, shard_size or conf["size"]),
     )
-    print(f"Directory generated at: {output_path}")
+    with DatasetWriter(
+        output_path,
+        conf["size"],
+        shard_size=shard_size,
+        state=state,
+        output_format=output_format,
+        row_group_size=row_group_size,
+        sampler=sampler,
+        compression=compress,
+        compress_level=compress_level,
+        frame_size=frame_size,
+        index=index,
+    ) as writer:
+        if deduplicator is not None and state is not None:
+            # The messages already written, once the writer removed those
+            # written after the checkpoint.
+            with profiler.stage("dedup"):
+                for message in iter_messages(output_path, state):
+                    deduplicator.insert(message)
+        # Stats and validation of the last shard closed, where the checkpoints
+        # of the formats that can't be continued point to.
+        closed = _progress(dataset_stats, quarantine)
+        for sample in track(samples, total=conf["size"] - start):
+            with profiler.stage("serialize"):
+                writer.write(*sample)
+            if writer.written % writer.shard_size == 0:
+                closed = _progress(dataset_stats, quarantine)
+            if writer.written % checkpoint_every == 0:
+                progress = closed
+                if writer.appendable:
+                    progress = _progress(dataset_stats, quarantine)
+                with profiler.stage("checkpoint"):
+                    writer.checkpoint(
+                        checkpoint_path,
+                        version=conf["version"],
+                        config_sha256=config_sha256,
+                        seed=seed,
+                        shard_size=shard_size,
+                        checkpoint_every=checkpoint_every,
+                        compress_level=compress_level,
+                        frame_size=frame_size,
+                        row_group_size=row_group_size,
+                        dedup=deduplicator and deduplicator.report(),
+                        max_attempts=max_attempts,
+                        **progress,
+                        last_index=writer.written - 1,
+                    )
+
+    checkpoint_path.unlink(missing_ok=True)
+    manifest = {"version": conf["version"], "seed": seed, **writer.manifest()}
+    if deduplicator is not None:
+        manifest["dedup"] = report = deduplicator.report()
+        print(
+            f"Duplicates: {report['exact']} exact and {report['near']} near of "
+            f"{report['checked']} messages ({report['hit_rate']:.2%}), "
+            f"{report['kept']} kept after {max_attempts} attempts."
+        )
+    if quarantine is not None:
+        manifest["validation"] = report = quarantine.report()
+        quarantine.close()
+        print(
+            f"Invalid samples: {report['invalid']} of {report['checked']} checked, "
+            f"{report['kept']} kept after {max_attempts} attempts."
+        )
+    srsly.write_json(output_path / "manifest.json", manifest)
+    if dataset_stats is not None:
+        dataset_stats.write(output_path / "stats.json")
+    if profile:
+        profiler.write(output_path, samples=writer.written - start, workers=workers)
+        print_report(profiler.report())
+    print(f"Directory generated at: {output_path} (seed: {seed})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+"""Timings of the stages of the generation of a dataset.
+
+A `Profiler` measures the time spent in nested stages (reading the config,
+sampling the arguments, each part of a help message, writing the files...),
+used by `cli-help-maker --profile`. The stages are identified by their stack,
+i.e. `sample;generator;programs`, the format of the collapsed stacks used
+by flamegraph tools:
+
+$ flamegraph.pl dataset_v0/profile.collapsed > profile.svg
+
+When no profiler is used, `NULL_PROFILER` makes the stages free.
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Iterator
+
+import srsly
+from rich.console import Console
+from rich.table import Table
+
+# Stack of stages -> [total nanoseconds, calls]
+Stats = dict[str, list[int]]
+
+
+class Profiler:
+    """Accumulates the time spent in each stage.
+
+    Example:
+        >>> profiler = Profiler()
+        >>> with profiler.stage("sample"):
+        ...     with profiler.stage("arguments"):
+        ...         ...
+        >>> profiler.report()
+    """
+
+    def __init__(self) -> None:
+        self._stack: list[str] = []
+        self._stats: Stats = {}
+        self._start = time.perf_counter_ns()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures the time spent inside the block, nested in the current stage."""
+        self._stack.append(name)
+        key = ";".join(self._stack)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._stack.pop()
+            stats = self._stats.get(key)
+            if stats is None:
+                self._stats[key] = [elapsed, 1]
+            else:
+                stats[0] += elapsed
+                stats[1] += 1
+
+    def pop_stats(self) -> Stats:
+        """Returns the timings measured and resets them, used to send the
+        timings of a worker process to the main one."""
+        stats, self._stats = self._stats, {}
+        return stats
+
+    def merge(self, stats: Stats) -> None:
+        """Adds the timings measured by another profiler."""
+        for key, (elapsed, calls) in stats.items():
+            current = self._stats.setdefault(key, [0, 0])
+            current[0] += elapsed
+            current[1] += calls
+
+    def _self_times(self) -> dict[str, int]:
+        """Time spent in each stage excluding its nested stages."""
+        self_times = {key: elapsed for key, (elapsed, _) in self._stats.items()}
+        for key, (elapsed, _) in self._stats.items():
+            parent, sep, _ = key.rpartition(";")
+            if sep and parent in self_times:
+                self_times[parent] -= elapsed
+        return self_times
+
+    def report(self) -> dict[str, Any]:
+        """Summary of the timings.
+
+        Returns:
+            dict[str, Any]: wall time since the profiler was created, and
+                the calls, total and self time (in seconds) and mean time
+                per call (in milliseconds) of each stage.
+        """
+        self_times = self._self_times()
+        stages = {}
+        for key in sorted(self._stats):
+            elapsed, calls = self._stats[key]
+            stages[key] = {
+                "calls": calls,
+                "total_s": elapsed / 1e9,
+                "self_s": max(self_times[key], 0) / 1e9,
+                "mean_ms": elapsed / calls / 1e6,
+            }
+        return {
+            "wall_time_s": (time.perf_counter_ns() - self._start) / 1e9,
+            "stages": stages,
+        }
+
+    def collapsed(self) -> str:
+        """Self time of each stack in microseconds, in the collapsed stack
+        format (one `stage;nested_stage time` per line)."""
+        return "".join(
+            f"{key} {max(elapsed, 0) // 1000}\n"
+            for key, elapsed in sorted(self._self_times().items())
+        )
+
+    def write(self, output_path: Path, **metadata: Any) -> None:
+        """Writes profile.json and profile.collapsed to a directory.
+
+        Args:
+            output_path (Path): Directory where the files are written.
+            metadata (Any): Extra fields to store in profile.json.
+        """
+        srsly.write_json(output_path / "profile.json", {**metadata, **self.report()})
+        (output_path / "profile.collapsed").write_text(self.collapsed())
+
+
+def print_report(report: dict[str, Any]) -> None:
+    """Prints the timings of `Profiler.report` as a table."""
+    table = Table(title=f"Wall time: {report['wall_time_s']:.2f}s")
+    for column in ("Stage", "Calls", "Total (s)", "Self (s)", "Mean (ms)"):
+        table.add_column(column, justify="left" if column == "Stage" else "right")
+    for key, stage in report["stages"].items():
+        depth = key.count(";")
+        table.add_row(
+            "  " * depth + key.rpartition(";")[2],
+            str(stage["calls"]),
+            f"{stage['total_s']:.3f}",
+            f"{stage['self_s']:.3f}",
+            f"{stage['mean_ms']:.3f}",
+        )
+    Console().print(table)
+
+
+class NullProfiler(Profiler):
+    """Profiler that doesn't measure anything."""
+
+    _context = nullcontext()
+
+    def stage(self, name: str) -> ContextManager[None]:
+        return self._context
+
+
+NULL_PROFILER = NullProfiler()
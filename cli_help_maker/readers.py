@@ -0,0 +1,312 @@
+"""Random access to the samples of a dataset written by `cli-help-maker`.
+
+The jsonl files are memory mapped, and the position of each line is read
+from its sidecar index (`dataset.jsonl.idx`, written with `--index`), so
+any sample is read without scanning the file. The index of a file that
+doesn't have one is built the first time it's opened, and written next to
+it when possible.
+
+>>> dataset = Dataset(Path("dataset_v0.0.1"))
+>>> len(dataset)
+100
+>>> dataset[42]
+{'message': '...', 'annotations': [['CMD', 6, 13], ...]}
+>>> dataset.arguments[42]
+{'indent_spaces': 2.0, 'total_width': 78.0, ...}
+>>> dataset[10:20]  # a list with the samples 10 to 19
+
+Only the uncompressed jsonl files can be read this way. `iter_messages`
+reads the messages of a dataset sequentially, in any format.
+"""
+
+import mmap
+import os
+from bisect import bisect_right
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Any, Iterator
+
+import srsly
+
+from .compression import read_jsonl
+from .docbin import read_docs
+from .writers import INDEX_OFFSET, OutputFormat, index_path, pa, pq, shard_names
+
+# Bytes read at once when building an index.
+CHUNK_SIZE = 1 << 20
+
+
+def _last_end(index: bytes) -> int:
+    if len(index) < INDEX_OFFSET.size:
+        return 0
+    return INDEX_OFFSET.unpack_from(index, len(index) - INDEX_OFFSET.size)[0]
+
+
+def build_index(path: Path) -> bytes:
+    """Computes the sidecar index of a jsonl file, and writes it next to
+    the file when the directory is writable.
+
+    Args:
+        path (Path): Path of the jsonl file.
+
+    Returns:
+        bytes: Content of the index, the end of each line.
+    """
+    ends = bytearray()
+    position = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            start = 0
+            while (end := chunk.find(b"\n", start)) != -1:
+                ends += INDEX_OFFSET.pack(position + end + 1)
+                start = end + 1
+            position += len(chunk)
+    if position > _last_end(ends):
+        # The last line doesn't end with a newline.
+        ends += INDEX_OFFSET.pack(position)
+    index = bytes(ends)
+
+    tmp = index_path(path).with_suffix(".tmp")
+    try:
+        tmp.write_bytes(index)
+        os.replace(tmp, index_path(path))
+    except OSError:
+        # Read only, the index is kept in memory.
+        pass
+    return index
+
+
+def _map(path: Path) -> mmap.mmap | bytes:
+    """Maps a file to memory, the empty files can't be mapped."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class JsonlFile:
+    """A jsonl file with random access to its lines.
+
+    Args:
+        path (Path): Path of the file.
+
+    Raises:
+        ValueError: If the file is compressed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        if path.suffix != ".jsonl":
+            raise ValueError(f"Only uncompressed jsonl files can be read: {path}")
+        self.path = path
+        self._data = _map(path)
+        self._index = None
+        if index_path(path).is_file():
+            self._index = _map(index_path(path))
+            if len(self._index) % INDEX_OFFSET.size or _last_end(self._index) != len(
+                self._data
+            ):
+                # The index doesn't belong to the content of the file.
+                self._close_index()
+        if self._index is None:
+            self._index = build_index(path)
+
+    def __len__(self) -> int:
+        return len(self._index) // INDEX_OFFSET.size
+
+    def line(self, i: int) -> bytes:
+        """Content of the line `i` (from 0), with the newline."""
+        end = INDEX_OFFSET.unpack_from(self._index, i * INDEX_OFFSET.size)[0]
+        if i == 0:
+            return self._data[:end]
+        start = INDEX_OFFSET.unpack_from(self._index, (i - 1) * INDEX_OFFSET.size)[0]
+        return self._data[start:end]
+
+    def _close_index(self) -> None:
+        if isinstance(self._index, mmap.mmap):
+            self._index.close()
+        self._index = None
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._close_index()
+
+
+class JsonlReader:
+    """A stream of a dataset, split in shards, as a sequence of its
+    (deserialized) lines.
+
+    Args:
+        paths (list[Path]): Paths of the shards, in order.
+    """
+
+    def __init__(self, paths: list[Path]) -> None:
+        self.files = [JsonlFile(path) for path in paths]
+        # First line of each shard.
+        self._starts = [0, *accumulate(len(f) for f in self.files)]
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def raw(self, i: int) -> bytes:
+        """Content of the line `i`, without deserializing it.
+
+        Raises:
+            IndexError: If the line is out of range.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Index out of range: {i}")
+        shard = bisect_right(self._starts, i) - 1
+        return self.files[shard].line(i - self._starts[shard])
+
+    def __getitem__(self, i: int | slice) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return srsly.json_loads(self.raw(i))
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        for f in self.files:
+            f.close()
+
+
+def stream_paths(path: str | Path, stream: str) -> list[Path]:
+    """Paths of the shards of a stream of a dataset.
+
+    They are read from the manifest.json, or searched in the directory
+    when there is no manifest.
+
+    Args:
+        path (str or Path): Directory of the dataset.
+        stream (str): `dataset` or `arguments`.
+
+    Raises:
+        ValueError: If the dataset isn't written in uncompressed jsonl files.
+        FileNotFoundError: If there are no files of the stream.
+
+    Returns:
+        list[Path]: Paths of the shards, in order.
+    """
+    path = Path(path)
+    manifest_path = path / "manifest.json"
+    if manifest_path.is_file():
+        manifest = srsly.read_json(manifest_path)
+        if manifest.get("format", "jsonl") != "jsonl" or manifest.get("compression"):
+            raise ValueError(
+                f"Only datasets of uncompressed jsonl files can be read: {path}"
+            )
+        return [path / shard[stream]["path"] for shard in manifest["shards"]]
+
+    paths = sorted(path.glob(f"{stream}-*-of-*.jsonl")) or [path / f"{stream}.jsonl"]
+    if not paths[0].is_file():
+        raise FileNotFoundError(f"No {stream} files found in: {path}")
+    if len(paths) > 1 and [p.name for p in paths] != shard_names(stream, len(paths)):
+        raise FileNotFoundError(f"Missing {stream} shards in: {path}")
+    return paths
+
+
+class Dataset:
+    """The samples of a dataset, with random access.
+
+    Both streams are opened, the samples are the annotated messages and
+    `arguments` contains the arguments used to generate each of them.
+    The files are memory mapped, only the samples requested are read.
+
+    Args:
+        path (str or Path): Directory of the dataset.
+        with_arguments (bool, optional): Whether each sample is returned
+            with its arguments, as a tuple. Defaults to False.
+
+    Raises:
+        ValueError: If the dataset isn't written in uncompressed jsonl files,
+            or the streams don't have the same number of samples.
+
+    Example:
+        >>> with Dataset(Path("dataset_v0.0.1"), with_arguments=True) as dataset:
+        ...     annotations, arguments = dataset[12345]
+    """
+
+    def __init__(self, path: str | Path, with_arguments: bool = False) -> None:
+        path = Path(path)
+        self.path = path
+        self.with_arguments = with_arguments
+        self.samples = JsonlReader(stream_paths(path, "dataset"))
+        self.arguments = JsonlReader(stream_paths(path, "arguments"))
+        if len(self.samples) != len(self.arguments):
+            self.close()
+            raise ValueError(
+                f"The dataset has {len(self.samples)} samples "
+                f"and {len(self.arguments)} arguments: {path}"
+            )
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, i: int | slice) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if self.with_arguments:
+            return self.samples[i], self.arguments[i]
+        return self.samples[i]
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __enter__(self) -> "Dataset":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The files are mapped again when unpickled, i.e. in other processes.
+        return {"path": self.path, "with_arguments": self.with_arguments}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def close(self) -> None:
+        self.samples.close()
+        self.arguments.close()
+
+
+def iter_messages(path: str | Path, manifest: dict[str, Any]) -> Iterator[str]:
+    """Reads the messages of a dataset in order, in any of its formats.
+
+    Args:
+        path (str or Path): Directory of the dataset.
+        manifest (dict[str, Any]): Content of its manifest.json, or the state of
+            the writer in a checkpoint. Only the lines of each shard it contains
+            are read.
+
+    Yields:
+        str: The message of each sample.
+    """
+    path = Path(path)
+    output_format = OutputFormat(manifest.get("format", "jsonl"))
+    for shard in manifest["shards"]:
+        info = shard["dataset"]
+        shard_path = path / info["path"]
+        if output_format == OutputFormat.jsonl:
+            rows = (row["message"] for row in read_jsonl(shard_path))
+        elif output_format == OutputFormat.parquet:
+            batches = pq.ParquetFile(shard_path).iter_batches(columns=["message"])
+            rows = (m for batch in batches for m in batch.column(0).to_pylist())
+        elif output_format == OutputFormat.arrow:
+            rows = _arrow_messages(shard_path)
+        else:
+            rows = (doc.text for doc in read_docs(shard_path))
+        yield from islice(rows, info["lines"])
+
+
+def _arrow_messages(path: Path) -> Iterator[str]:
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield from reader.get_batch(i).column("message").to_pylist()
@@ -0,0 +1,325 @@
+"""Discrete distributions frozen to sample from them repeatedly.
+
+`random.choices` computes the cumulative weights (when `weights` are given)
+and the total on every call. A `DiscreteSampler` does it once, and samples
+with a bisection over the frozen cumulative weights.
+
+The draws are the same `random.choices` would return with the same
+generator state, so replacing one with the other doesn't change the
+content generated for a given seed.
+
+Many values can be drawn at once with a NumPy generator (`sample_array`),
+when numpy is installed.
+
+`sample_seed` derives the seed of each sample of a dataset (or batch)
+from a base seed.
+
+The distributions of the arguments of a dataset config are compiled to
+samplers (`ConstantSampler`, `SetSampler`, `UniformDiscreteSampler`,
+`UniformContinuousSampler` and `DiscreteSampler` for `custom`), grouped
+in an `ArgumentSampler`. It draws the arguments of a sample from a
+random.Random, or whole blocks of them at once with NumPy:
+
+>>> sampler.sample(random.Random(1))
+{'indent_spaces': 2, 'total_width': 80, ...}
+>>> sampler.sample_block(10000, np.random.default_rng(1))
+{'indent_spaces': array([4, 2, ...]), 'total_width': array([100, 70, ...]), ...}
+"""
+
+import hashlib
+import random
+from bisect import bisect_right
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any, Generic, Protocol, Sequence, TypeVar
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+T = TypeVar("T")
+
+
+def sample_seed(seed: int, index: int, attempt: int = 0) -> int:
+    """Derives the seed of a single sample from the base seed of the dataset.
+
+    Every sample gets its own random stream, which only depends on the base
+    seed and the position of the sample in the dataset, so the samples can be
+    generated in any order (or process) and still obtain the same content.
+
+    Args:
+        seed (int): Base seed of the dataset.
+        index (int): Position of the sample in the dataset.
+        attempt (int, optional): Number of times the sample was generated
+            again, i.e. to replace a duplicate. Defaults to 0.
+
+    Returns:
+        int: seed for the sample.
+    """
+    key = f"{seed}-{index}" if attempt == 0 else f"{seed}-{index}-{attempt}"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class DiscreteSampler(Generic[T]):
+    """Samples elements of a population with fixed weights.
+
+    Args:
+        population (Sequence[T]): Elements to sample from.
+        weights (Sequence[float] or None, optional): Relative weights
+            of each element. Defaults to None.
+        cum_weights (Sequence[float] or None, optional): Cumulative weights
+            of each element, used instead of `weights`. Defaults to None.
+
+    Example:
+        >>> sampler = DiscreteSampler(range(1, 4), weights=[0.5, 0.3, 0.2])
+        >>> sampler.sample(random.Random(1))
+        1
+    """
+
+    __slots__ = ("population", "cum_weights", "_total", "_hi", "_cdf")
+
+    def __init__(
+        self,
+        population: Sequence[T],
+        weights: Sequence[float] | None = None,
+        cum_weights: Sequence[float] | None = None,
+    ) -> None:
+        if weights is not None and cum_weights is not None:
+            raise TypeError("Cannot specify both weights and cumulative weights")
+        if cum_weights is None:
+            if weights is None:
+                weights = [1.0] * len(population)
+            cum_weights = list(accumulate(weights))
+        if len(cum_weights) != len(population):
+            raise ValueError("The number of weights does not match the population")
+        total = cum_weights[-1] + 0.0
+        if total <= 0.0:
+            raise ValueError("Total of weights must be greater than zero")
+
+        self.population = tuple(population)
+        self.cum_weights = tuple(cum_weights)
+        self._total = total
+        self._hi = len(cum_weights) - 1
+        self._cdf = None
+
+    def __len__(self) -> int:
+        return len(self.population)
+
+    def sample(self, rng: random.Random | None = None) -> T:
+        """Draws an element, equivalent to `rng.choices(...)[0]`."""
+        r = (rng or random).random
+        return self.population[
+            bisect_right(self.cum_weights, r() * self._total, 0, self._hi)
+        ]
+
+    def sample_k(self, k: int, rng: random.Random | None = None) -> list[T]:
+        """Draws `k` elements with replacement, as `rng.choices(..., k=k)`."""
+        r = (rng or random).random
+        population, cum_weights = self.population, self.cum_weights
+        total, hi = self._total, self._hi
+        return [
+            population[bisect_right(cum_weights, r() * total, 0, hi)] for _ in range(k)
+        ]
+
+    def sample_indices(
+        self, size: int, generator: "np.random.Generator"
+    ) -> "np.ndarray":
+        """Draws the positions in the population of `size` elements at once.
+
+        Args:
+            size (int): Number of elements to draw.
+            generator (np.random.Generator): NumPy generator to draw from.
+
+        Returns:
+            np.ndarray: Array of ints with the positions of the elements.
+        """
+        import numpy as np
+
+        if self._cdf is None:
+            self._cdf = np.asarray(self.cum_weights, dtype=np.float64)
+        indices = np.searchsorted(
+            self._cdf, generator.random(size) * self._total, side="right"
+        )
+        return np.minimum(indices, self._hi, out=indices)
+
+    def sample_array(self, size: int, generator: "np.random.Generator") -> "np.ndarray":
+        """Draws `size` elements at once, the population must be numeric.
+
+        Args:
+            size (int): Number of elements to draw.
+            generator (np.random.Generator): NumPy generator to draw from.
+
+        Returns:
+            np.ndarray: The elements drawn.
+        """
+        import numpy as np
+
+        return np.asarray(self.population)[self.sample_indices(size, generator)]
+
+
+class ConstantSampler:
+    """Always draws the same value."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def sample(self, rng: random.Random | None = None) -> Any:
+        return self.value
+
+    def sample_array(self, size: int, generator: "np.random.Generator") -> "np.ndarray":
+        import numpy as np
+
+        if not isinstance(self.value, list):
+            return np.full(size, self.value)
+        values = np.empty(size, dtype=object)
+        values.fill(self.value)
+        return values
+
+
+class SetSampler:
+    """Draws one of the values with equal probability, as `rng.choice(values)`."""
+
+    __slots__ = ("values", "_array")
+
+    def __init__(self, values: Sequence[Any]) -> None:
+        if not values:
+            raise ValueError("Cannot sample from an empty set of values")
+        self.values = tuple(values)
+        self._array = None
+
+    def sample(self, rng: random.Random | None = None) -> Any:
+        return (rng or random).choice(self.values)
+
+    def sample_array(self, size: int, generator: "np.random.Generator") -> "np.ndarray":
+        import numpy as np
+
+        if self._array is None:
+            self._array = np.asarray(self.values)
+        return self._array[generator.integers(len(self.values), size=size)]
+
+
+class UniformDiscreteSampler:
+    """Draws an integer in [low, high], as `rng.randint(low, high)`."""
+
+    __slots__ = ("low", "high")
+
+    def __init__(self, low: int, high: int) -> None:
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: random.Random | None = None) -> int:
+        return (rng or random).randint(self.low, self.high)
+
+    def sample_array(self, size: int, generator: "np.random.Generator") -> "np.ndarray":
+        return generator.integers(self.low, self.high, size=size, endpoint=True)
+
+
+class UniformContinuousSampler:
+    """Draws a float in [low, high)."""
+
+    __slots__ = ("low", "_width")
+
+    def __init__(self, low: float, high: float) -> None:
+        self.low = low
+        self._width = high - low
+
+    @property
+    def high(self) -> float:
+        return self.low + self._width
+
+    def sample(self, rng: random.Random | None = None) -> float:
+        return self.low + self._width * (rng or random).random()
+
+    def sample_array(self, size: int, generator: "np.random.Generator") -> "np.ndarray":
+        return self.low + self._width * generator.random(size)
+
+
+class Sampler(Protocol):
+    """Interface of the samplers of the arguments of a dataset."""
+
+    def sample(self, rng: random.Random | None = None) -> Any: ...
+
+    def sample_array(
+        self, size: int, generator: "np.random.Generator"
+    ) -> "np.ndarray": ...
+
+
+class ArgumentSampler:
+    """Samples the arguments of a HelpGenerator, each one from its own
+    distribution.
+
+    The samplers only contain their (frozen) parameters, an instance can be
+    pickled to send it to other processes.
+
+    Args:
+        samplers (dict[str, Sampler]): Sampler of each argument. The arguments
+            are drawn in the order of the dict.
+    """
+
+    __slots__ = ("names", "samplers", "_draws")
+
+    def __init__(self, samplers: dict[str, Sampler]) -> None:
+        self.names = tuple(samplers)
+        self.samplers = samplers
+        self._draws = tuple(sampler.sample for sampler in samplers.values())
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getstate__(self) -> dict[str, Sampler]:
+        return self.samplers
+
+    def __setstate__(self, samplers: dict[str, Sampler]) -> None:
+        self.__init__(samplers)
+
+    def sample(self, rng: random.Random | None = None) -> dict[str, Any]:
+        """Draws the arguments of a single sample.
+
+        Args:
+            rng (random.Random or None, optional): Source of randomness, the
+                global random module if not given. Defaults to None.
+
+        Returns:
+            dict[str, Any]: The value of each argument.
+        """
+        rng = rng or random
+        return dict(zip(self.names, [draw(rng) for draw in self._draws]))
+
+    def sample_block(
+        self, size: int, generator: "np.random.Generator"
+    ) -> dict[str, "np.ndarray"]:
+        """Draws the arguments of `size` samples at once, by columns.
+
+        The values differ from those of `sample`, which draws from a
+        random.Random.
+
+        Args:
+            size (int): Number of samples.
+            generator (np.random.Generator): NumPy generator to draw from.
+
+        Returns:
+            dict[str, np.ndarray]: Array with the values of each argument.
+        """
+        return {
+            name: sampler.sample_array(size, generator)
+            for name, sampler in self.samplers.items()
+        }
+
+    def sample_rows(
+        self, size: int, generator: "np.random.Generator"
+    ) -> list[dict[str, Any]]:
+        """Draws the arguments of `size` samples at once, as those of `sample`
+        (with python types) to pass them to HelpGenerator.
+
+        Args:
+            size (int): Number of samples.
+            generator (np.random.Generator): NumPy generator to draw from.
+
+        Returns:
+            list[dict[str, Any]]: The arguments of each sample.
+        """
+        columns = [
+            column.tolist() for column in self.sample_block(size, generator).values()
+        ]
+        return [dict(zip(self.names, row)) for row in zip(*columns)]
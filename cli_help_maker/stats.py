@@ -0,0 +1,272 @@
+"""Statistics of a dataset, computed while it's generated.
+
+A `DatasetStats` summarizes the samples added to it in a memory that doesn't
+depend on the size of the dataset:
+
+- Spans of each label (CMD, ARG, OPT), in total and per message.
+- Histograms of the characters, lines and wrapped lines of the messages.
+  A line is counted as wrapped when the first word of the next one doesn't
+  fit in `total_width`, as the wrappers of the generator break them. The
+  descriptions wrap at `total_width - indent_spaces`, their lines broken
+  before that width aren't counted.
+- Messages containing each section (description, commands, arguments
+  and options), as written by the generator (`HelpGenerator.sections`).
+- Distribution of each argument: the count of each value, or of the bins
+  of its range for the arguments drawn from a continuous distribution.
+  The values of an argument are bounded by its distribution in the config,
+  the report keeps the MAX_VALUES most frequent ones.
+
+Everything is an integer count, so the stats of different processes
+(or parts of the dataset) are merged exactly, in any order, and stored
+in the checkpoints without loss:
+
+>>> stats = DatasetStats.from_sampler(sampler)
+>>> for kwargs, annotations, sections in samples:
+...     stats.add(kwargs, annotations, sections)
+>>> total.merge(stats)
+>>> total.write(Path("stats.json"))
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import srsly
+
+from .generator import ARG, CMD, OPT, SECTIONS
+from .instrumentation import CHARS_BUCKETS, SPANS_BUCKETS
+from .sampling import ArgumentSampler, UniformContinuousSampler
+
+LINES_BUCKETS = (0, 5, 10, 20, 50, 100, 200, 500)
+# Histograms of each message: name -> upper bounds of the buckets.
+HISTOGRAMS = {
+    "chars": CHARS_BUCKETS,
+    "lines": LINES_BUCKETS,
+    "wrapped_lines": SPANS_BUCKETS,
+    **{f"spans_{label}": SPANS_BUCKETS for label in (CMD, ARG, OPT)},
+}
+# Bins of the arguments drawn from a continuous distribution.
+ARGUMENT_BINS = 10
+# Distinct values reported per argument, the rest are reported as "other".
+MAX_VALUES = 50
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _value_key(value: Any) -> str:
+    """Name of a value of an argument in the report."""
+    if isinstance(value, tuple):
+        value = list(value)
+    return value if isinstance(value, str) else srsly.json_dumps(value)
+
+
+def wrapped_lines(message: str, width: int) -> int:
+    """Lines of a message broken because the next word didn't fit in `width`."""
+    lines = message.split("\n")
+    wrapped = 0
+    for line, next_line in zip(lines, lines[1:]):
+        words = next_line.split(None, 1)
+        if line and words and len(line) + 1 + len(words[0]) > width:
+            wrapped += 1
+    return wrapped
+
+
+class DatasetStats:
+    """Streaming summary of the samples of a dataset.
+
+    Args:
+        ranges (dict[str, tuple[float, float]] or None, optional): Range of
+            the arguments drawn from a continuous distribution, whose values
+            are counted in ARGUMENT_BINS bins. Defaults to None.
+    """
+
+    def __init__(self, ranges: dict[str, tuple[float, float]] | None = None) -> None:
+        self.ranges = dict(ranges or {})
+        self.samples = 0
+        self.labels = Counter()
+        # Sum of each histogram, its mean is computed from them.
+        self.totals = Counter()
+        self.histograms = {name: [0] * (len(b) + 1) for name, b in HISTOGRAMS.items()}
+        self.sections = Counter()
+        self.arguments: dict[str, Counter] = {}
+        self.bins = {name: [0] * ARGUMENT_BINS for name in self.ranges}
+
+    @classmethod
+    def from_sampler(cls, sampler: ArgumentSampler) -> "DatasetStats":
+        """Stats with the ranges of the continuous arguments of a sampler,
+        see `main.compile_config`."""
+        return cls(
+            {
+                name: (s.low, s.high)
+                for name, s in sampler.samplers.items()
+                if isinstance(s, UniformContinuousSampler)
+            }
+        )
+
+    def _observe(self, name: str, value: int, weight: int) -> None:
+        self.histograms[name][bisect_left(HISTOGRAMS[name], value)] += weight
+        self.totals[name] += value * weight
+
+    def _bin(self, name: str, value: float) -> int:
+        low, high = self.ranges[name]
+        if high <= low:
+            return 0
+        index = int((value - low) / (high - low) * ARGUMENT_BINS)
+        return min(max(index, 0), ARGUMENT_BINS - 1)
+
+    def add(
+        self,
+        kwargs: dict[str, Any],
+        annotations: dict[str, Any],
+        sections: list[str],
+        weight: int = 1,
+    ) -> None:
+        """Adds a sample.
+
+        Args:
+            kwargs (dict[str, Any]): Arguments of the sample.
+            annotations (dict[str, Any]): Message and annotations generated.
+            sections (list[str]): Sections written in the message, see
+                `HelpGenerator.sections`.
+            weight (int, optional): Times the sample is added, -1 removes a
+                sample added before (i.e. a duplicate replaced). Defaults to 1.
+        """
+        message = annotations["message"]
+        self.samples += weight
+        labels = [span[0] for span in annotations["annotations"]]
+        for label in (CMD, ARG, OPT):
+            count = labels.count(label)
+            self.labels[label] += count * weight
+            self._observe(f"spans_{label}", count, weight)
+        self._observe("chars", len(message), weight)
+        self._observe("lines", message.count("\n") + 1, weight)
+        width = int(kwargs.get("total_width", 78))
+        self._observe("wrapped_lines", wrapped_lines(message, width), weight)
+        for section in set(sections):
+            self.sections[section] += weight
+
+        bins, arguments = self.bins, self.arguments
+        for name, value in kwargs.items():
+            if name in bins:
+                bins[name][self._bin(name, value)] += weight
+                continue
+            if name == "seed":
+                continue
+            if isinstance(value, list):
+                value = tuple(value)
+            values = arguments.get(name)
+            if values is None:
+                values = arguments[name] = Counter()
+            values[value] += weight
+
+    def merge(self, other: "DatasetStats") -> None:
+        """Adds the samples of other stats, i.e. from another process."""
+        self.samples += other.samples
+        self.labels.update(other.labels)
+        self.totals.update(other.totals)
+        self.sections.update(other.sections)
+        for name, counts in other.histograms.items():
+            for i, count in enumerate(counts):
+                self.histograms[name][i] += count
+        for name, values in other.arguments.items():
+            self.arguments.setdefault(name, Counter()).update(values)
+        for name, counts in other.bins.items():
+            current = self.bins.setdefault(name, [0] * ARGUMENT_BINS)
+            self.ranges.setdefault(name, other.ranges[name])
+            for i, count in enumerate(counts):
+                current[i] += count
+
+    def pop(self) -> "DatasetStats":
+        """Returns the stats of the samples added and resets them, used to send
+        the stats of a worker process to the main one."""
+        stats = DatasetStats(self.ranges)
+        stats.__dict__, self.__dict__ = self.__dict__, stats.__dict__
+        return stats
+
+    def to_dict(self) -> dict[str, Any]:
+        """The counts, to be stored in a checkpoint."""
+        return {
+            "samples": self.samples,
+            "labels": dict(self.labels),
+            "totals": dict(self.totals),
+            "histograms": {name: list(c) for name, c in self.histograms.items()},
+            "sections": dict(self.sections),
+            "arguments": {
+                name: [[value, count] for value, count in values.items()]
+                for name, values in self.arguments.items()
+            },
+            "ranges": {name: list(r) for name, r in self.ranges.items()},
+            "bins": {name: list(counts) for name, counts in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "DatasetStats":
+        """Stats from the counts of `to_dict`."""
+        stats = cls({name: tuple(r) for name, r in data["ranges"].items()})
+        stats.samples = data["samples"]
+        stats.labels.update(data["labels"])
+        stats.totals.update(data["totals"])
+        stats.histograms = {name: list(c) for name, c in data["histograms"].items()}
+        stats.sections.update(data["sections"])
+        stats.arguments = {
+            name: Counter({_hashable(value): count for value, count in values})
+            for name, values in data["arguments"].items()
+        }
+        stats.bins = {name: list(counts) for name, counts in data["bins"].items()}
+        return stats
+
+    def report(self) -> dict[str, Any]:
+        """Summary of the dataset.
+
+        Returns:
+            dict[str, Any]: samples, spans of each label, histogram (buckets,
+                counts and mean) of each measure per message, fraction of the
+                messages with each section and the distribution of each
+                argument, the counts of its values or of the bins of its range.
+        """
+        samples = self.samples
+
+        def fraction(count: int) -> float:
+            return count / samples if samples else 0.0
+
+        histograms = {
+            name: {
+                "buckets": [*HISTOGRAMS[name], "+Inf"],
+                "counts": counts,
+                "mean": fraction(self.totals[name]),
+            }
+            for name, counts in self.histograms.items()
+        }
+        arguments = {}
+        for name, values in self.arguments.items():
+            counts = {
+                _value_key(value): count for value, count in values.items() if count
+            }
+            # The most frequent values, the ties broken by the value.
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            arguments[name] = {"values": dict(sorted(ranked[:MAX_VALUES]))}
+            other = sum(count for _, count in ranked[MAX_VALUES:])
+            if other:
+                arguments[name]["other"] = other
+        for name, counts in self.bins.items():
+            low, high = self.ranges[name]
+            edges = [
+                low + (high - low) * i / ARGUMENT_BINS for i in range(ARGUMENT_BINS + 1)
+            ]
+            arguments[name] = {"bins": edges, "counts": counts}
+        return {
+            "samples": samples,
+            "labels": dict(sorted(self.labels.items())),
+            "histograms": histograms,
+            "sections": {
+                section: fraction(self.sections[section]) for section in SECTIONS
+            },
+            "arguments": dict(sorted(arguments.items())),
+        }
+
+    def write(self, path: Path) -> None:
+        """Writes the report to a json file."""
+        srsly.write_json(path, self.report())
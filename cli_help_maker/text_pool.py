@@ -0,0 +1,114 @@
+"""Batched generation of the text used in the descriptions.
+
+The descriptions of the programs, arguments and options make up most of
+a help message, and `make_paragraph` generates them one word (and with
+`TEXT_FROM_STATISTICS` one letter) at a time. A `TextPool` draws the
+lengths, letters or words of thousands of sentences at once with NumPy,
+and hands them to a HelpGenerator as they are requested:
+
+>>> pool = TextPool(seed=1)
+>>> HelpGenerator(text_pool=pool).help_message
+
+The text follows the same distributions of `make_sentence` and
+`make_paragraph`, but it's drawn from the pool's own generator, so
+the content differs from the one generated by the random module.
+"""
+
+from collections import deque
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover
+    np = None
+
+from . import utils
+
+_LETTERS = "".join(utils.LETTERS).encode("ascii")
+
+
+class TextPool:
+    """Pool of sentences and paragraphs, filled in batches.
+
+    Args:
+        use_statistics (bool, optional): If set to True words are made up from
+            letter frequencies, otherwise selected from the corpus.
+            Defaults to TEXT_FROM_STATISTICS.
+        batch_size (int, optional): Number of sentences generated each time
+            the pool is empty. Defaults to 2048.
+        between_commas_prob (float, optional): Probability of a word
+            being between commas. Defaults to 0.05.
+        seed (int or None, optional): Seed of the NumPy generator. Defaults to None.
+
+    Raises:
+        ModuleNotFoundError: If numpy isn't installed.
+    """
+
+    def __init__(
+        self,
+        use_statistics: bool = utils.TEXT_FROM_STATISTICS,
+        batch_size: int = 2048,
+        between_commas_prob: float = 0.05,
+        seed: int | None = None,
+    ) -> None:
+        if np is None:  # pragma: no cover
+            raise ModuleNotFoundError(
+                "TextPool requires numpy, install it with: pip install numpy"
+            )
+        self.use_statistics = use_statistics
+        self.batch_size = batch_size
+        self.between_commas_prob = between_commas_prob
+        self._generator = np.random.default_rng(seed)
+        self._sentences = deque()
+        self._paragraph_lengths = deque()
+
+    def _words(self, n: int) -> list[str]:
+        """Draws `n` words at once."""
+        if self.use_statistics:
+            lengths = utils.WORD_LENGTH_SAMPLER.sample_array(n, self._generator)
+            ends = np.cumsum(lengths)
+            letters = utils.LETTER_SAMPLER.sample_indices(
+                int(ends[-1]) if n else 0, self._generator
+            )
+            text = np.frombuffer(_LETTERS, dtype=np.uint8)[letters].tobytes().decode()
+            ends = ends.tolist()
+            return [text[s:e] for s, e in zip([0] + ends[:-1], ends)]
+
+        words = utils.word_list.load()
+        indices = self._generator.integers(len(words), size=n)
+        return [words[i].lower() for i in indices.tolist()]
+
+    def _fill(self) -> None:
+        """Generates a batch of sentences, see `make_sentence`."""
+        lengths = utils.SENTENCE_LENGTH_SAMPLER.sample_array(
+            self.batch_size, self._generator
+        )
+        words = self._words(int(lengths.sum()))
+        # The style of the commas is chosen per sentence.
+        single = np.repeat(self._generator.random(self.batch_size) < 0.25, lengths)
+        between_commas = self._generator.random(len(words)) < self.between_commas_prob
+        for i in np.flatnonzero(between_commas).tolist():
+            words[i] = utils.add_comma(
+                words[i], style="single" if single[i] else "double"
+            )
+
+        ends = np.cumsum(lengths).tolist()
+        self._sentences.extend(
+            " ".join(words[s:e]).capitalize() for s, e in zip([0] + ends[:-1], ends)
+        )
+
+    def sentence(self) -> str:
+        """Returns a sentence, equivalent to `make_sentence`."""
+        if not self._sentences:
+            self._fill()
+        return self._sentences.popleft()
+
+    def paragraph(self) -> str:
+        """Returns a paragraph, equivalent to `make_paragraph`."""
+        if not self._paragraph_lengths:
+            self._paragraph_lengths.extend(
+                utils.PARAGRAPH_LENGTH_SAMPLER.sample_array(
+                    self.batch_size, self._generator
+                ).tolist()
+            )
+        sentences = [self.sentence() for _ in range(self._paragraph_lengths.popleft())]
+        return ". ".join(sentences)[:-1] + "."
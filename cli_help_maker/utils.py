@@ -1,35 +1,25 @@
 """Helper functions to allow generating different parts of
 a help message and more.
+
+Every function that makes a random choice accepts an optional `rng`
+(a random.Random instance) to generate reproducible content, when
+it isn't given the global random module is used.
 """
 
 import random
 from itertools import accumulate
+from typing import Callable
 from warnings import warn
 
 from rich.console import Console
 from rich.text import Text
 
-try:
-    from nltk.corpus import words
-
-    word_list = words.words()
-
-except ModuleNotFoundError:  # pragma: no cover
-    import textwrap
+from .corpus import WordCorpus
+from .sampling import DiscreteSampler
 
-    msg = textwrap.dedent(
-        """
-        To generate words for the command arguments, and options
-        you need the nltk's `words` dataset, otherwise `get_word`
-        function will fail.
- 
-        Please use the NLTK Downloader to obtain the resource:
-
-        >>> import nltk
-        >>> nltk.download('words')
-        """
-    )
-    warn(msg)
+# Words used to name the programs, commands... Loaded on first use,
+# see cli_help_maker.corpus.
+word_list = WordCorpus()
 
 
 # A bool to change between text generated from letter frequencies
@@ -37,11 +27,13 @@ except ModuleNotFoundError:  # pragma: no cover
 TEXT_FROM_STATISTICS = False
 
 
-def get_word() -> str:
+def get_word(rng: random.Random | None = None) -> str:
     """Selects a word from the wordlist corpora defined in:
     https://www.nltk.org/book/ch02.html#code-unusual
     """
-    return word_list[random.randint(0, len(word_list))].lower()
+    rng = rng or random
+    words = word_list.load()
+    return words[rng.randrange(len(words))].lower()
 
 
 # Letter frequency, obtained from the following link with the "script":
@@ -131,6 +123,26 @@ g = lambda x: 1.1 * x * 0.9**x
 _sentence_length_probs = list(accumulate([f(x) for x in range(1, 80)]))
 SENTENCE_LENGTH_PROBABILITIES = [i for i in _sentence_length_probs if i < 100] + [100]
 
+# The distributions are frozen once, instead of computing the cumulative
+# weights in every call to random.choices. text_pool.TextPool draws from the
+# same samplers, so both generate the same distribution of text.
+LETTER_SAMPLER = DiscreteSampler(LETTERS, weights=LETTER_FREQUENCIES)
+WORD_LENGTH_SAMPLER = DiscreteSampler(
+    range(1, len(WORD_LENGTH_PROBABILITIES) + 1),
+    cum_weights=WORD_LENGTH_PROBABILITIES,
+)
+SENTENCE_LENGTH_SAMPLER = DiscreteSampler(
+    range(1, len(SENTENCE_LENGTH_PROBABILITIES) + 1),
+    cum_weights=SENTENCE_LENGTH_PROBABILITIES,
+)
+# The number of sentences per paragraph is totally made up.
+PARAGRAPH_LENGTH_SAMPLER = DiscreteSampler(
+    range(1, 7), weights=[10.0, 25.0, 30.0, 20.0, 10.0, 5.0]
+)
+COMPOSED_WORD_LENGTH_SAMPLER = DiscreteSampler(
+    range(1, 5), cum_weights=[0.6, 0.95, 0.99, 1]
+)
+
 
 argument_styles = {
     "between_brackets": lambda w: f"<{w}>",
@@ -138,9 +150,12 @@ argument_styles = {
 }
 
 
-def capitalize(content: str, probability: float = 0.5) -> str:
+def capitalize(
+    content: str, probability: float = 0.5, rng: random.Random | None = None
+) -> str:
     """Capitalizes a string string with a given probability."""
-    if random.random() > 1 - probability:
+    rng = rng or random
+    if rng.random() > 1 - probability:
         return content.capitalize()
     return content
 
@@ -154,7 +169,11 @@ def usage_pattern(capitalized: bool = True, upper: bool = False) -> str:
     return usage
 
 
-def section_pattern(section: str | None = "options", capitalized: bool = True) -> str:
+def section_pattern(
+    section: str | None = "options",
+    capitalized: bool = True,
+    rng: random.Random | None = None,
+) -> str:
     """Creates a section header.
 
     In general, the possible sections are `Arguments` or `Options`,
@@ -166,7 +185,7 @@ def section_pattern(section: str | None = "options", capitalized: bool = True) -
 
     """
     if not section:
-        section = make_word() + ":"
+        section = make_word(rng=rng) + ":"
     else:
         section += ":"
 
@@ -191,7 +210,9 @@ def do_optional(content: str) -> str:
     return f"[{content}]"
 
 
-def maybe_do_optional(content: str, probability: float = 0.5) -> str:
+def maybe_do_optional(
+    content: str, probability: float = 0.5, rng: random.Random | None = None
+) -> str:
     """Calls `do_optional` with a probability given.
 
     Args:
@@ -201,7 +222,8 @@ def maybe_do_optional(content: str, probability: float = 0.5) -> str:
     Returns:
         str: _description_
     """
-    if random.random() > (1 - probability):
+    rng = rng or random
+    if rng.random() > (1 - probability):
         return do_optional(content)
     return content
 
@@ -222,9 +244,12 @@ def do_required(content: str) -> str:
     return f"({content})"
 
 
-def maybe_do_required(content: str, probability: float = 0.5) -> str:
+def maybe_do_required(
+    content: str, probability: float = 0.5, rng: random.Random | None = None
+) -> str:
     """Equivalent to `maybe_do_optional` with `do_required`."""
-    if random.random() > (1 - probability):
+    rng = rng or random
+    if rng.random() > (1 - probability):
         return do_required(content)
     return content
 
@@ -250,6 +275,7 @@ def do_mutually_exclusive_groups(
     probability: float = 0.5,
     groups: list[int] = [0, 2],
     optional_probability: float = 0.5,
+    rng: random.Random | None = None,
 ) -> list[str]:
     """Creates groups of mutually exclusive elements
 
@@ -272,18 +298,19 @@ def do_mutually_exclusive_groups(
         # The groups only have sense if there are 2 or more.
         return elements
 
+    rng = rng or random
     new_elements = []
     to_group = []
-    group_size = random.choice(groups)
+    group_size = rng.choice(groups)
     for e in elements:
         to_group.append(e)
         if (
             len(to_group) == group_size
         ):  # Start with a simple option, later will use `groups`
 
-            if random.random() > (1 - probability):
+            if rng.random() > (1 - probability):
                 to_group = do_mutually_exclusive(to_group)
-                if random.random() > (1 - optional_probability):
+                if rng.random() > (1 - optional_probability):
                     to_group = do_optional(to_group)
                 else:
                     to_group = do_required(to_group)
@@ -294,7 +321,7 @@ def do_mutually_exclusive_groups(
 
             to_group = []
             # Restart the group size to allow taking a range of possibilities
-            group_size = random.choice(groups)
+            group_size = rng.choice(groups)
 
     # Take care of the last options which didn't fit into a group
     # to avoid losing them
@@ -322,7 +349,9 @@ def add_comma(element: str, style: str = "single") -> str:
 
 
 def options_shortcut(
-    capitalized_probability: float = 0.0, all_caps: bool = False
+    capitalized_probability: float = 0.0,
+    all_caps: bool = False,
+    rng: random.Random | None = None,
 ) -> str:
     """Returns the shortcut for any options.
 
@@ -338,57 +367,52 @@ def options_shortcut(
     Note:
         https://github.com/jazzband/docopt-ng
     """
-    options = capitalize("options", probability=capitalized_probability)
+    options = capitalize("options", probability=capitalized_probability, rng=rng)
     shortcut = f"[{options}]"
     if all_caps:
         return shortcut.upper()
     return shortcut
 
 
-def word_length() -> int:
+def word_length(rng: random.Random | None = None) -> int:
     """Generates the number of letters in a word using a more
     appropriate probability distribution than uniform.
 
     Returns:
         int: number of letters in a word.
     """
-    return random.choices(
-        range(1, len(WORD_LENGTH_PROBABILITIES) + 1),
-        cum_weights=WORD_LENGTH_PROBABILITIES,
-    )[0]
+    return WORD_LENGTH_SAMPLER.sample(rng)
 
 
-def sentence_length() -> int:
+def sentence_length(rng: random.Random | None = None) -> int:
     """Like word length but for sentences.
 
     Returns:
         int: number of words in a sentence.
     """
-    return random.choices(
-        range(1, len(SENTENCE_LENGTH_PROBABILITIES) + 1),
-        cum_weights=SENTENCE_LENGTH_PROBABILITIES,
-    )[0]
+    return SENTENCE_LENGTH_SAMPLER.sample(rng)
 
 
-def paragraph_length() -> int:
-    # The number of sentences per paragraph is totally made up.
-    return random.choices(
-        range(1, 7),
-        weights=[10.0, 25.0, 30.0, 20.0, 10.0, 5.0],
-    )[0]
+def paragraph_length(rng: random.Random | None = None) -> int:
+    return PARAGRAPH_LENGTH_SAMPLER.sample(rng)
 
 
-def make_word() -> str:
+def make_word(rng: random.Random | None = None) -> str:
     """Creates a random word from made up letters. The letters
     are obtained from observed frequencies.
 
     Note:
         See https://math.wvu.edu/~hdiamond/Math222F17/Sigurd_et_al-2004-Studia_Linguistica.pdf
     """
-    return "".join(random.choices(LETTERS, weights=LETTER_FREQUENCIES, k=word_length()))
+    rng = rng or random
+    return "".join(LETTER_SAMPLER.sample_k(word_length(rng=rng), rng=rng))
 
 
-def make_sentence(use_statistics: bool = TEXT_FROM_STATISTICS, between_commas_prob: float = 0.05) -> str:
+def make_sentence(
+    use_statistics: bool = TEXT_FROM_STATISTICS,
+    between_commas_prob: float = 0.05,
+    rng: random.Random | None = None,
+) -> str:
     """Creates a sentence.
 
     There is a probability of a 5% of a word being between commas
@@ -402,21 +426,22 @@ def make_sentence(use_statistics: bool = TEXT_FROM_STATISTICS, between_commas_pr
     Returns:
         str: made up sentence to fill the messages with content.
     """
+    rng = rng or random
     gen = make_word if use_statistics else get_word
-    [gen() for _ in range(sentence_length())]
+    [gen(rng=rng) for _ in range(sentence_length(rng=rng))]
     wrds = []
-    style = "single" if (1 - random.random()) < 0.25 else "double"
-    for _ in range(sentence_length()):
-        w = gen()
-        if (1 - random.random()) < between_commas_prob:
+    style = "single" if (1 - rng.random()) < 0.25 else "double"
+    for _ in range(sentence_length(rng=rng)):
+        w = gen(rng=rng)
+        if (1 - rng.random()) < between_commas_prob:
             w = add_comma(w, style=style)
         wrds.append(w)
-    return capitalize(
-        " ".join(wrds), probability=1
-    )
+    return capitalize(" ".join(wrds), probability=1, rng=rng)
 
 
-def make_paragraph(use_statistics: bool = TEXT_FROM_STATISTICS) -> str:
+def make_paragraph(
+    use_statistics: bool = TEXT_FROM_STATISTICS, rng: random.Random | None = None
+) -> str:
     """Creates a paragraph, in a similar way as `make_sentence`.
 
     Args:
@@ -430,15 +455,17 @@ def make_paragraph(use_statistics: bool = TEXT_FROM_STATISTICS) -> str:
     return (
         ". ".join(
             [
-                make_sentence(use_statistics=use_statistics)
-                for _ in range(paragraph_length())
+                make_sentence(use_statistics=use_statistics, rng=rng)
+                for _ in range(paragraph_length(rng=rng))
             ]
         )[:-1]
         + "."
     )
 
 
-def update_paragraph(description: str, element: str) -> str:
+def update_paragraph(
+    description: str, element: str, rng: random.Random | None = None
+) -> str:
     """Add an element to a description paragraph.
 
     Helper function to simplify inserting an example in a given paragraph.
@@ -451,11 +478,16 @@ def update_paragraph(description: str, element: str) -> str:
         str: The original text with the element added in between
     """
     text = description.split(" ")
-    text.insert(random.randint(0, len(text)), element)
+    text.insert((rng or random).randint(0, len(text)), element)
     return " ".join(text)
 
 
-def make_list(elements: int = 2, numbered: bool = False) -> str:
+def make_list(
+    elements: int = 2,
+    numbered: bool = False,
+    rng: random.Random | None = None,
+    sentence: Callable[[], str] | None = None,
+) -> str:
     """Creates a list of elements.
 
     Args:
@@ -463,6 +495,9 @@ def make_list(elements: int = 2, numbered: bool = False) -> str:
             Number of elements in the list. Defaults to 2.
         numbered (bool, optional):
             Whether the list is numbered or not. Defaults to False.
+        sentence (Callable[[], str] or None, optional):
+            Function to generate the content of each element, i.e.
+            TextPool.sentence. Defaults to None, `make_sentence` is used.
 
     Notes:
         It can creates list as in markdown.
@@ -487,12 +522,14 @@ def make_list(elements: int = 2, numbered: bool = False) -> str:
             pip also supports installing from "requirements files", which provide
             an easy way to specify a whole environment to be installed.
     """
+    if sentence is None:
+        sentence = lambda: make_sentence(rng=rng)
     content = []
     for i in range(elements):
         if numbered:
-            content.append(f"{i + 1}. {make_sentence()}")
+            content.append(f"{i + 1}. {sentence()}")
         else:
-            content.append(f"- {make_sentence()}")
+            content.append(f"- {sentence()}")
 
     return "\n".join(content)
 
@@ -509,18 +546,12 @@ def make_set(elements: list[str]) -> str:
     return f"{{{', '.join(elements)}}}" if len(elements) > 0 else ""
 
 
-def make_composed_word() -> str:
+def make_composed_word(rng: random.Random | None = None) -> str:
     """Generator of composed words for arguments, with
     made-up probabilities."""
+    rng = rng or random
     return "-".join(
-        [
-            get_word()
-            for _ in range(
-                random.choices(
-                    population=range(1, 5), cum_weights=[0.6, 0.95, 0.99, 1]
-                )[0]
-            )
-        ]
+        [get_word(rng=rng) for _ in range(COMPOSED_WORD_LENGTH_SAMPLER.sample(rng))]
     )
 
 
@@ -529,6 +560,7 @@ def make_argument(
     style: str = "between_brackets",
     any_number: bool = False,
     nested: bool = False,
+    rng: random.Random | None = None,
 ) -> str:
     """Create an argument for a program.
 
@@ -554,13 +586,19 @@ def make_argument(
         warn(f"style not defined: {style}, set by default: 'between_brackets'")
         styler = argument_styles["between_brackets"]
 
-    arg = styler(capitalize(make_composed_word(), probability=capitalized_prob))
+    rng = rng or random
+    arg = styler(
+        capitalize(make_composed_word(rng=rng), probability=capitalized_prob, rng=rng)
+    )
 
     if any_number:
         arg += "..."
 
     if nested:
-        arg += f" {do_optional(make_argument(style=style, any_number=bool(random.randint(0, 1)), nested=False))}"
+        nested_arg = make_argument(
+            style=style, any_number=bool(rng.randint(0, 1)), nested=False, rng=rng
+        )
+        arg += f" {do_optional(nested_arg)}"
 
     return arg
 
@@ -579,6 +617,7 @@ def make_option(
     style: str = "between_brackets",
     any_number: bool = False,
     set_size: int = 0,
+    rng: random.Random | None = None,
 ):
     """Optional argument generator.
 
@@ -617,11 +656,14 @@ def make_option(
             Defaults to 0, not used. If a number is set, only a long
             option will be used.
     """
+    rng = rng or random
     option = ""
-    name = capitalize(make_composed_word(), probability=probability_name_cap)
+    name = capitalize(
+        make_composed_word(rng=rng), probability=probability_name_cap, rng=rng
+    )
 
     if set_size > 0:
-        option += f"--{name} " + make_set([make_word() for _ in range(set_size)])
+        option += f"--{name} " + make_set([make_word(rng=rng) for _ in range(set_size)])
         return option
 
     # The following block is not covered just to avoid mocking the name
@@ -632,10 +674,13 @@ def make_option(
         long = False
 
     value = make_argument(
-        capitalized_prob=probability_value_cap, style=style, any_number=any_number
+        capitalized_prob=probability_value_cap,
+        style=style,
+        any_number=any_number,
+        rng=rng,
     )
     if short:
-        option += "-" + capitalize(name[0], short_capitalized_prob)
+        option += "-" + capitalize(name[0], short_capitalized_prob, rng=rng)
         if with_value:
             option += short_separator + value
             return option
@@ -643,7 +688,7 @@ def make_option(
     if long:
         if short:
             option += short_long_separator
-        option += "--" + capitalize(name, long_capitalized_prob)
+        option += "--" + capitalize(name, long_capitalized_prob, rng=rng)
         if with_value:
             option += long_separator + value
             return option
@@ -0,0 +1,281 @@
+"""Validation of the annotations of the generated messages.
+
+The spans of a message are moved when the programs are wrapped, a span
+misplaced points to the wrong text of the message. `validate_batch` checks
+every span of a batch of samples at once with numpy:
+
+- `bounds`: the span is inside the message and isn't empty.
+- `overlap`: the span doesn't overlap with another span of the message.
+- `whitespace`: the span doesn't start or end on whitespace.
+- `text`: the text of the span is the element annotated, as it was emitted
+  by the generator (`HelpGenerator.tokens`), ignoring the whitespace added
+  by the wrapping.
+
+>>> generator = HelpGenerator(seed=0)
+>>> annotations = generator.annotations
+>>> validate_batch([annotations], [generator.tokens])
+[[]]
+
+With `cli-help-maker --validate` the samples are validated in the workers,
+and those with problems are written to a `Quarantine` file and generated
+again.
+"""
+
+import functools
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import srsly
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover
+    np = None
+
+# Counts of a Quarantine: samples checked, samples with problems written to
+# the file, samples generated again and invalid samples kept after MAX_ATTEMPTS.
+COUNTS = ("checked", "invalid", "regenerated", "kept")
+# The last whitespace code point (str.isspace) is 0x3000.
+_MAX_SPACE = 0x3000
+
+
+def _check_numpy() -> None:
+    if np is None:  # pragma: no cover
+        raise ModuleNotFoundError(
+            "The validation requires numpy, install it with: "
+            "pip install cli-help-maker[numpy]"
+        )
+
+
+def _codes(text: str) -> "np.ndarray":
+    """Code point of each character of a text."""
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+@functools.lru_cache(maxsize=None)
+def _space_table() -> "np.ndarray":
+    """Whether each code point up to _MAX_SPACE + 1 is whitespace."""
+    return np.array([chr(c).isspace() for c in range(_MAX_SPACE + 2)], dtype=bool)
+
+
+def _is_space(codes: "np.ndarray") -> "np.ndarray":
+    """Whether each code point is whitespace."""
+    return _space_table()[np.minimum(codes, _MAX_SPACE + 1)]
+
+
+def _cumulative(flags: "np.ndarray") -> "np.ndarray":
+    """Cumulative count of the flags, with a leading 0: the flags set between
+    i and j are `c[j] - c[i]`."""
+    counts = np.zeros(len(flags) + 1, dtype=np.int64)
+    np.cumsum(flags, out=counts[1:])
+    return counts
+
+
+def _concat_ranges(starts: "np.ndarray", lengths: "np.ndarray") -> "np.ndarray":
+    """Indices of the ranges [starts[i], starts[i] + lengths[i]) concatenated."""
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(int(lengths.sum())) - offsets
+
+
+class _Text:
+    """Characters of a text (the messages or the tokens of a batch joined)
+    to compare the pieces of text ignoring the whitespace."""
+
+    def __init__(self, text: str) -> None:
+        self.codes = _codes(text)
+        self.is_space = _is_space(self.codes)
+        # The non whitespace characters of any piece of the text are
+        # contiguous in `chars`, from `before[start]` to `before[end]`.
+        self.chars = self.codes[~self.is_space]
+        self.before = _cumulative(~self.is_space)
+
+
+def _text_differs(
+    text: _Text,
+    starts: "np.ndarray",
+    ends: "np.ndarray",
+    tokens: _Text,
+    token_starts: "np.ndarray",
+    token_ends: "np.ndarray",
+) -> "np.ndarray":
+    """Whether the non whitespace characters of each piece of the text differ
+    from those of its token."""
+    sizes = text.before[ends] - text.before[starts]
+    differ = sizes != tokens.before[token_ends] - tokens.before[token_starts]
+    same_size = np.flatnonzero(~differ)
+    sizes = sizes[same_size]
+    first = text.before[starts[same_size]]
+    token_first = tokens.before[token_starts[same_size]]
+    mismatches = _cumulative(
+        text.chars[_concat_ranges(first, sizes)]
+        != tokens.chars[_concat_ranges(token_first, sizes)]
+    )
+    last = np.cumsum(sizes)
+    differ[same_size] = mismatches[last] > mismatches[last - sizes]
+    return differ
+
+
+def validate_batch(
+    samples: list[dict[str, Any]], tokens: list[list[str]] | None = None
+) -> list[list[str]]:
+    """Checks the spans of a batch of samples.
+
+    Args:
+        samples (list[dict[str, Any]]): Outputs of HelpGenerator.annotations.
+        tokens (list[list[str]] or None, optional): Elements annotated in each
+            sample (HelpGenerator.tokens), the text of the spans isn't checked
+            without them. Defaults to None.
+
+    Raises:
+        ModuleNotFoundError: If numpy isn't installed.
+
+    Returns:
+        list[list[str]]: Problems found in each sample, empty if it's valid.
+    """
+    _check_numpy()
+    messages = [sample["message"] for sample in samples]
+    spans = [span for sample in samples for span in sample["annotations"]]
+    problems: list[list[str]] = [[] for _ in samples]
+    if not spans:
+        return problems
+
+    lengths = np.array([len(message) for message in messages], dtype=np.int64)
+    num_spans = np.array([len(s["annotations"]) for s in samples], dtype=np.int64)
+    # Sample of each span, and the position of its message in the whole text.
+    owner = np.repeat(np.arange(len(samples)), num_spans)
+    offsets = (np.cumsum(lengths) - lengths)[owner]
+    starts = np.array([span[1] for span in spans], dtype=np.int64)
+    ends = np.array([span[2] for span in spans], dtype=np.int64)
+
+    bounds = (starts < 0) | (ends <= starts) | (ends > lengths[owner])
+    # The spans out of bounds are checked as empty spans at the start.
+    first = offsets + np.where(bounds, 0, starts)
+    last = offsets + np.where(bounds, 0, ends)
+
+    text = _Text("".join(messages))
+    whitespace = ~bounds & (
+        text.is_space[first] | text.is_space[np.maximum(last - 1, 0)]
+    )
+
+    # The positions in the whole text are sorted by start, a span overlaps
+    # with a later one if it ends after the next start, and with a previous
+    # one if it starts before the end of any of them.
+    valid = np.flatnonzero(~bounds)
+    order = valid[np.argsort(first[valid], kind="stable")]
+    span_starts, span_ends = first[order], last[order]
+    overlap = np.zeros(len(spans), dtype=bool)
+    overlap[order[:-1][span_ends[:-1] > span_starts[1:]]] = True
+    overlap[order[1:][span_starts[1:] < np.maximum.accumulate(span_ends)[:-1]]] = True
+
+    differ = np.zeros(len(spans), dtype=bool)
+    if tokens is not None:
+        num_tokens = np.array([len(t) for t in tokens], dtype=np.int64)
+        for i in np.flatnonzero(num_tokens != num_spans):
+            problems[i].append(
+                f"tokens: {num_tokens[i]} tokens for {num_spans[i]} spans"
+            )
+        if (num_tokens == num_spans).all():
+            flat = [token for sample_tokens in tokens for token in sample_tokens]
+            token_lengths = np.array([len(token) for token in flat], dtype=np.int64)
+            token_ends = np.cumsum(token_lengths)
+            differ = ~bounds & _text_differs(
+                text,
+                first,
+                last,
+                _Text("".join(flat)),
+                token_ends - token_lengths,
+                token_ends,
+            )
+
+    for kind, flags in (
+        ("bounds", bounds),
+        ("overlap", overlap),
+        ("whitespace", whitespace),
+        ("text", differ),
+    ):
+        for j in np.flatnonzero(flags):
+            label, start, end = spans[j]
+            problems[owner[j]].append(f"{kind}: {label} [{start}, {end})")
+    return problems
+
+
+class Quarantine:
+    """Samples that failed the validation, appended to a jsonl file with the
+    problems found, their index and attempt, and their arguments to
+    reproduce them.
+
+    The file is only created when a sample is added.
+
+    Args:
+        path (Path): Path of the file.
+        size (int, optional): Bytes of the file to keep, from a checkpoint.
+            The samples after them are removed, the file is written again
+            if 0. Defaults to 0.
+
+    Raises:
+        ModuleNotFoundError: If numpy isn't installed, to fail before
+            generating the samples.
+    """
+
+    def __init__(self, path: Path, size: int = 0) -> None:
+        _check_numpy()
+        self.path = path
+        self.counts = Counter()
+        if size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        else:
+            path.unlink(missing_ok=True)
+        self._file = None
+
+    def check(
+        self, index: int, attempt: int, sample: tuple, problems: list[str]
+    ) -> bool:
+        """Counts a sample validated, and writes it if it has problems.
+
+        Args:
+            index (int): Position of the sample in the dataset.
+            attempt (int): Attempt of the sample, see `main.generate_sample`.
+            sample (tuple): Arguments and annotations of the sample.
+            problems (list[str]): Problems found by `validate_batch`.
+
+        Returns:
+            bool: Whether the sample is invalid.
+        """
+        self.counts["checked"] += 1
+        if not problems:
+            return False
+        self.counts["invalid"] += 1
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        kwargs, annotations = sample[:2]
+        line = {
+            "index": index,
+            "attempt": attempt,
+            "problems": problems,
+            **annotations,
+            "arguments": kwargs,
+        }
+        self._file.write(srsly.json_dumps(line).encode() + b"\n")
+        return True
+
+    def flush(self) -> int:
+        """Writes the samples to disk, and returns the size of the file."""
+        if self._file is None:
+            return self.path.stat().st_size if self.path.is_file() else 0
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def restore(self, report: dict[str, Any]) -> None:
+        """Sets the counts of a `report`, to continue a dataset."""
+        self.counts.update({key: report[key] for key in COUNTS})
+
+    def report(self) -> dict[str, Any]:
+        """Counts of the validation, and the size of the file."""
+        return {**{key: self.counts[key] for key in COUNTS}, "bytes": self.flush()}
@@ -0,0 +1,264 @@
+"""Text wrapping that keeps track of the position of the characters.
+
+Wrapping a text drops the whitespace where the lines are broken and adds
+the indentation of the new lines, so the labels placed on the original text
+must be moved to the same characters of the wrapped one.
+
+The wrappers are cached by width and indentation (`get_wrapper`), as the
+same few configurations are used for every line of every message.
+
+The text of the messages is made of words separated by single spaces, which
+`wrap` and `fill` break greedily looking only at the spaces (and hyphens)
+around the end of each line, instead of splitting the whole text in chunks
+as textwrap does. The result is the same as the one of textwrap, which is
+used for any other text.
+"""
+
+import functools
+import re
+import textwrap
+from bisect import bisect_right
+from typing import NamedTuple
+
+# Maximum number of wrappers cached, each message uses a handful of them.
+WRAPPERS_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=WRAPPERS_CACHE_SIZE)
+def get_wrapper(
+    width: int = 70, initial_indent: str = "", subsequent_indent: str = ""
+) -> textwrap.TextWrapper:
+    """Returns a TextWrapper, shared by the calls with the same arguments.
+
+    The wrapper mustn't be modified, it keeps no state between calls
+    to `wrap` or `fill`.
+
+    Args:
+        width (int, optional): Maximum length of the lines. Defaults to 70.
+        initial_indent (str, optional): Prepended to the first line. Defaults to "".
+        subsequent_indent (str, optional): Prepended to the rest of the lines.
+            Defaults to "".
+
+    Returns:
+        textwrap.TextWrapper: The wrapper.
+    """
+    return textwrap.TextWrapper(
+        width=width, initial_indent=initial_indent, subsequent_indent=subsequent_indent
+    )
+
+
+# Text the greedy wrapper doesn't handle: whitespace other than single spaces
+# between the words.
+_unsupported_text = re.compile(r"[\t\n\x0b\x0c\r]|  |^ | $").search
+_wordsep_split = textwrap.TextWrapper.wordsep_re.split
+
+
+@functools.lru_cache(maxsize=4096)
+def _chunk_ends(word: str) -> tuple[int, ...]:
+    """Positions where textwrap can break a hyphenated word (and its end)."""
+    ends = []
+    end = 0
+    for chunk in _wordsep_split(word):
+        if chunk:
+            end += len(chunk)
+            ends.append(end)
+    return tuple(ends)
+
+
+def _greedy_spans(
+    text: str, width: int, initial_indent: str, subsequent_indent: str
+) -> list[tuple[int, int]] | None:
+    """Start and end of the content of each line, as wrapped by textwrap.
+
+    Returns None if the text isn't made of words separated by single spaces,
+    or a word doesn't fit in a line and should be broken.
+    """
+    if _unsupported_text(text):
+        return None
+    spans = []
+    n = len(text)
+    start = 0
+    line_width = width - len(initial_indent)
+    while start < n:
+        if line_width < 1:
+            return None
+        limit = start + line_width
+        if limit >= n:
+            spans.append((start, n))
+            break
+        if text[limit] == " ":
+            # The last word ends just at the limit.
+            spans.append((start, limit))
+            start = limit + 1
+        else:
+            space = text.rfind(" ", start, limit)
+            word_start = space + 1 if space >= 0 else start
+            word_end = text.find(" ", limit)
+            if word_end < 0:
+                word_end = n
+            end = next_start = word_start
+            first_chunk_end = word_end
+            if "-" in text[word_start:word_end]:
+                ends = _chunk_ends(text[word_start:word_end])
+                first_chunk_end = word_start + ends[0]
+                # The last piece of the hyphenated word that fits.
+                i = bisect_right(ends, limit - word_start)
+                if i > 0:
+                    end = next_start = word_start + ends[i - 1]
+                    first_chunk_end = word_start + ends[i]
+            if end == start or first_chunk_end - next_start > line_width:
+                # A long word, textwrap splits it.
+                return None
+            if end == word_start:
+                end -= 1  # Drop the space
+            spans.append((start, end))
+            start = next_start
+        line_width = width - len(subsequent_indent)
+    return spans
+
+
+def _wrap_with_spans(
+    text: str, width: int, initial_indent: str, subsequent_indent: str
+) -> tuple[list[str], list[tuple[int, int]]]:
+    """The lines wrapped and the span of the content of each line in the text."""
+    spans = _greedy_spans(text, width, initial_indent, subsequent_indent)
+    if spans is not None:
+        lines = [
+            (subsequent_indent if i else initial_indent) + text[start:end]
+            for i, (start, end) in enumerate(spans)
+        ]
+        return lines, spans
+
+    lines = get_wrapper(width, initial_indent, subsequent_indent).wrap(text)
+    spans = []
+    pos = 0
+    for i, line in enumerate(lines):
+        length = len(line) - len(subsequent_indent if i else initial_indent)
+        if i > 0:
+            # Skip the whitespace dropped at the break.
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+        spans.append((pos, pos + length))
+        pos += length
+    return lines, spans
+
+
+def line_spans(
+    text: str, width: int = 70, initial_indent: str = "", subsequent_indent: str = ""
+) -> list[tuple[int, int]]:
+    """Start and end in the text of the content of each line, once wrapped.
+
+    The content of each line appears in the original text in the same
+    order, only the whitespace at the breaks is removed (and the long words
+    split), so the lines are placed on the original text in a single pass.
+
+    Args:
+        text (str): Text to wrap, without tabs nor new lines.
+        width (int, optional): Maximum length of the lines. Defaults to 70.
+        initial_indent (str, optional): Prepended to the first line. Defaults to "".
+        subsequent_indent (str, optional): Prepended to the rest of the lines.
+            Defaults to "".
+
+    Returns:
+        list[tuple[int, int]]: The lines of textwrap.wrap are the indentation
+            plus the text between each start and end.
+    """
+    return _wrap_with_spans(text, width, initial_indent, subsequent_indent)[1]
+
+
+def wrap(
+    text: str, width: int = 70, initial_indent: str = "", subsequent_indent: str = ""
+) -> list[str]:
+    """Equivalent to textwrap.wrap, faster for words separated by single spaces.
+
+    Args:
+        text (str): Text to wrap.
+        width (int, optional): Maximum length of the lines. Defaults to 70.
+        initial_indent (str, optional): Prepended to the first line. Defaults to "".
+        subsequent_indent (str, optional): Prepended to the rest of the lines.
+            Defaults to "".
+
+    Returns:
+        list[str]: The lines.
+    """
+    spans = _greedy_spans(text, width, initial_indent, subsequent_indent)
+    if spans is None:
+        return get_wrapper(width, initial_indent, subsequent_indent).wrap(text)
+    return [
+        (subsequent_indent if i else initial_indent) + text[start:end]
+        for i, (start, end) in enumerate(spans)
+    ]
+
+
+def fill(
+    text: str, width: int = 70, initial_indent: str = "", subsequent_indent: str = ""
+) -> str:
+    """Equivalent to textwrap.fill, see `wrap`."""
+    return "\n".join(wrap(text, width, initial_indent, subsequent_indent))
+
+
+class WrappedText(NamedTuple):
+    """A text wrapped with the offsets of each line.
+
+    Attributes:
+        text (str): The wrapped text, lines separated by a new line.
+        sources (list[int]): Position in the original text of the first
+            character of each line.
+        targets (list[int]): Position in the wrapped text of the same
+            characters (after the indentation).
+    """
+
+    text: str
+    sources: list[int]
+    targets: list[int]
+
+    def position(self, pos: int) -> int:
+        """Position in the wrapped text of the character at `pos` in the
+        original text."""
+        line = max(bisect_right(self.sources, pos) - 1, 0)
+        return self.targets[line] + pos - self.sources[line]
+
+    def span(self, start: int, end: int) -> tuple[int, int]:
+        """Moves a span of the original text to the wrapped one.
+
+        The end is the position after the last character, if the span
+        is broken in two lines, the new line and indentation are included.
+        """
+        if end <= start:
+            start = self.position(start)
+            return start, start
+        return self.position(start), self.position(end - 1) + 1
+
+
+def fill_with_offsets(
+    text: str,
+    width: int = 70,
+    initial_indent: str = "",
+    subsequent_indent: str = "",
+) -> WrappedText:
+    """Equivalent to textwrap.fill, but keeps the offsets of the lines.
+
+    The content of each line appears in the original text in the same
+    order, only the whitespace at the breaks is removed (and the long words
+    split), so the lines are placed on the original text in a single pass.
+
+    Args:
+        text (str): Text to wrap, without tabs nor new lines.
+        width (int, optional): Maximum length of the lines. Defaults to 70.
+        initial_indent (str, optional): Prepended to the first line. Defaults to "".
+        subsequent_indent (str, optional): Prepended to the rest of the lines.
+            Defaults to "".
+
+    Returns:
+        WrappedText: the text as returned by textwrap.fill with the offsets
+            of each line.
+    """
+    lines, spans = _wrap_with_spans(text, width, initial_indent, subsequent_indent)
+    sources, targets = [], []
+    target = 0
+    for i, (line, (start, _)) in enumerate(zip(lines, spans)):
+        sources.append(start)
+        targets.append(target + len(subsequent_indent if i else initial_indent))
+        target += len(line) + 1
+
+    return WrappedText("\n".join(lines), sources, targets)
@@ -0,0 +1,616 @@
+"""Writers for the files of a dataset of help messages.
+
+A dataset is made of two aligned streams, `dataset` (the annotated messages)
+and `arguments` (the arguments used to generate each message), which can be
+split in shards of a fixed number of lines.
+
+With the columnar formats (parquet and arrow, which require pyarrow) both
+streams are written to a single table, `dataset`, with the message, its
+annotations and a typed column per argument. With docbin (requires spaCy)
+the `dataset` stream is written as spaCy docs, see `docbin.DocBinShard`.
+
+The jsonl files can be compressed while they are written, see `compression`.
+The uncompressed ones can have a sidecar index (`.idx`) with the end offset
+of every line, to read any of them without scanning the file, see `readers`.
+"""
+
+import hashlib
+import math
+import os
+import struct
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import srsly
+
+from .compression import DEFAULT_FRAME_SIZE, BackgroundCompressor, Compression
+from .docbin import DocBinShard
+from .sampling import (
+    ArgumentSampler,
+    ConstantSampler,
+    DiscreteSampler,
+    SetSampler,
+    UniformContinuousSampler,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:  # pragma: no cover
+    pa = pq = None
+
+
+class OutputFormat(str, Enum):
+    """Formats of the files of a dataset."""
+
+    jsonl = "jsonl"
+    parquet = "parquet"
+    arrow = "arrow"
+    docbin = "docbin"
+
+    @property
+    def suffix(self) -> str:
+        """Extension of the `dataset` files."""
+        return ".spacy" if self is OutputFormat.docbin else "." + self.value
+
+
+# Sidecar index of a jsonl file: the end of each line, as little endian uint64.
+INDEX_SUFFIX = ".idx"
+INDEX_OFFSET = struct.Struct("<Q")
+
+
+def index_path(path: Path) -> Path:
+    """Path of the sidecar index of a jsonl file."""
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def shard_names(name: str, num_shards: int, suffix: str = ".jsonl") -> list[str]:
+    """Names of the files of a stream.
+
+    Args:
+        name (str): Name of the stream, `dataset` or `arguments`.
+        num_shards (int): Number of shards. If 1, the file isn't numbered.
+        suffix (str, optional): Extension of the files. Defaults to ".jsonl".
+
+    Returns:
+        list[str]: i.e. ["dataset-00000-of-00002.jsonl", "dataset-00001-of-00002.jsonl"]
+    """
+    if num_shards == 1:
+        return [name + suffix]
+    return [f"{name}-{i:05d}-of-{num_shards:05d}{suffix}" for i in range(num_shards)]
+
+
+class Shard:
+    """A file of a stream, keeps track of the lines, bytes and checksum
+    of the content written.
+
+    Args:
+        path (Path): Path of the file.
+        info (dict[str, str | int] or None, optional): Entry of the shard
+            in a checkpoint to continue writing it. The content written after
+            the checkpoint is removed. Defaults to None.
+        compression (Compression or None, optional): Compress the lines in
+            a background thread. The bytes and checksum are those of the
+            compressed file. Defaults to None.
+        compress_level (int or None, optional): Compression level. Defaults to None.
+        frame_size (int, optional): Minimum uncompressed bytes per frame.
+            Defaults to DEFAULT_FRAME_SIZE.
+        index (bool, optional): Write the sidecar index with the end of every
+            line, only for uncompressed files. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        info: dict[str, str | int] | None = None,
+        compression: Compression | None = None,
+        compress_level: int | None = None,
+        frame_size: int = DEFAULT_FRAME_SIZE,
+        index: bool = False,
+    ) -> None:
+        self.path = path
+        self.lines = 0
+        self.bytes = 0
+        self._sha256 = hashlib.sha256()
+        if info is None:
+            self._file = open(path, "wb")
+        else:
+            self.lines = info["lines"]
+            self.bytes = info["bytes"]
+            with open(path, "r+b") as f:
+                f.truncate(self.bytes)
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    self._sha256.update(chunk)
+            self._file = open(path, "ab")
+
+        self._compressor = None
+        if compression is not None:
+            self._compressor = BackgroundCompressor(
+                self._write_output, compression, compress_level, frame_size
+            )
+        self._index = None
+        if index:
+            if info is None:
+                self._index = open(index_path(path), "wb")
+            else:
+                with open(index_path(path), "r+b") as f:
+                    f.truncate(self.lines * INDEX_OFFSET.size)
+                self._index = open(index_path(path), "ab")
+
+    def _write_output(self, data: bytes) -> None:
+        self._file.write(data)
+        self._sha256.update(data)
+        self.bytes += len(data)
+
+    def write(self, line: bytes) -> None:
+        self.lines += 1
+        if self._compressor is None:
+            self._write_output(line)
+            if self._index is not None:
+                self._index.write(INDEX_OFFSET.pack(self.bytes))
+        else:
+            self._compressor.write(line)
+
+    def flush(self, sync: bool = False) -> None:
+        if self._compressor is not None:
+            # The frame ends on a checkpoint (sync), the file can be continued there.
+            self._compressor.flush(end_frame=sync)
+        for f in (self._file, self._index):
+            if f is not None:
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._compressor is not None:
+            self._compressor.close()
+        self._file.close()
+        if self._index is not None:
+            self._index.close()
+
+    def info(self) -> dict[str, str | int]:
+        """Entry of the shard in the manifest."""
+        return {
+            "path": self.path.name,
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "sha256": self._sha256.hexdigest(),
+        }
+
+
+def _sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def arrow_schema(sampler: ArgumentSampler) -> "pa.Schema":
+    """Schema of the columnar files of a dataset, with a column per argument
+    of the sampler typed after all the values it can draw (i.e. a `custom`
+    distribution of ints and floats is a float column), and the `seed`.
+
+    Args:
+        sampler (ArgumentSampler): Sampler of the arguments, see
+            `main.compile_config`.
+
+    Returns:
+        pa.Schema: Schema shared by every shard.
+    """
+    span = pa.struct(
+        [("label", pa.string()), ("start", pa.int32()), ("end", pa.int32())]
+    )
+    fields = [("message", pa.string()), ("annotations", pa.list_(span))]
+    for name, s in sampler.samplers.items():
+        if isinstance(s, UniformContinuousSampler):
+            fields.append((name, pa.float64()))
+            continue
+        if isinstance(s, ConstantSampler):
+            values = [s.value]
+        elif isinstance(s, SetSampler):
+            values = list(s.values)
+        elif isinstance(s, DiscreteSampler):
+            values = list(s.population)
+        else:  # UniformDiscreteSampler
+            values = [s.low, s.high]
+        fields.append((name, pa.array(values).type))
+    fields.append(("seed", pa.uint64()))
+    return pa.schema(fields)
+
+
+class ColumnarShard:
+    """A parquet (zstd compressed) or arrow (IPC file format, uncompressed
+    to be memory mapped) file of the dataset.
+
+    The samples are buffered and written in row groups (record batches for
+    arrow) of `row_group_size` rows. The columns are:
+
+    - message: the help message.
+    - annotations: list of structs with the label, start and end of each span.
+    - A column per argument passed to HelpGenerator, see `arrow_schema`.
+
+    The file can only be read once closed, so it can't be continued
+    from a checkpoint like a jsonl `Shard`.
+
+    Args:
+        path (Path): Path of the file.
+        output_format (OutputFormat): parquet or arrow.
+        schema (pa.Schema): Schema of the file, the same for every shard.
+        row_group_size (int, optional): Number of samples per row group.
+            Defaults to 10000.
+
+    Raises:
+        ModuleNotFoundError: If pyarrow isn't installed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        output_format: OutputFormat,
+        schema: "pa.Schema",
+        row_group_size: int = 10000,
+    ) -> None:
+        if pa is None:  # pragma: no cover
+            raise ModuleNotFoundError(
+                "The parquet and arrow formats require pyarrow, install it with: "
+                "pip install cli-help-maker[arrow]"
+            )
+        self.path = path
+        self.output_format = OutputFormat(output_format)
+        self.row_group_size = row_group_size
+        self.lines = 0
+        self._rows: list[tuple[dict[str, Any], dict[str, Any]]] = []
+        self._writer = None
+        self._schema = schema
+        self._info = None
+
+    def _open(self) -> None:
+        if self.output_format == OutputFormat.parquet:
+            self._writer = pq.ParquetWriter(
+                str(self.path), self._schema, compression="zstd"
+            )
+        else:
+            self._writer = pa.ipc.new_file(str(self.path), self._schema)
+
+    def _write_row_group(self) -> None:
+        if self._writer is None:
+            self._open()
+        if not self._rows:
+            return
+        schema = self._schema
+        offsets, labels, starts, ends = [0], [], [], []
+        for _, annotations in self._rows:
+            for label, start, end in annotations["annotations"]:
+                labels.append(label)
+                starts.append(start)
+                ends.append(end)
+            offsets.append(len(labels))
+        spans = pa.StructArray.from_arrays(
+            [
+                pa.array(labels, pa.string()),
+                pa.array(starts, pa.int32()),
+                pa.array(ends, pa.int32()),
+            ],
+            fields=list(schema.field("annotations").type.value_type),
+        )
+        columns = [
+            pa.array([a["message"] for _, a in self._rows], pa.string()),
+            pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), spans),
+        ]
+        for field in list(schema)[2:]:
+            columns.append(
+                pa.array([kwargs[field.name] for kwargs, _ in self._rows], field.type)
+            )
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        self._rows = []
+
+    def write(self, kwargs: dict[str, Any], annotations: dict[str, Any]) -> None:
+        self._rows.append((kwargs, annotations))
+        self.lines += 1
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def flush(self, sync: bool = False) -> None:
+        """Nothing to do, the file can't be read until it's closed."""
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+        self._info = {
+            "path": self.path.name,
+            "lines": self.lines,
+            "bytes": self.path.stat().st_size,
+            "sha256": _sha256(self.path),
+        }
+
+    def info(self) -> dict[str, str | int]:
+        """Entry of the shard in the manifest, the bytes and sha256
+        are only known once the shard is closed."""
+        if self._info is not None:
+            return self._info
+        return {"path": self.path.name, "lines": self.lines, "bytes": 0, "sha256": ""}
+
+
+class DatasetWriter:
+    """Writes the samples of a dataset to jsonl (or columnar) files.
+
+    Each sample writes a line to the `dataset` stream and its
+    arguments to the `arguments` stream, both shards share the index
+    so the files are aligned line by line. With the parquet and arrow formats
+    there is only the `dataset` stream, see `ColumnarShard`. With docbin the
+    `dataset` stream contains spaCy docs, and the arguments are still jsonl.
+
+    Args:
+        output_path (Path): Directory where the files are written.
+        size (int): Total number of samples of the dataset.
+        shard_size (int, optional): Maximum number of samples per shard. If 0,
+            everything is written to a single file. Defaults to 0.
+        flush_every (int, optional): Number of samples between flushes, to allow
+            reading the files while being written. Defaults to 1000.
+        state (dict[str, Any] or None, optional): Manifest stored in a checkpoint,
+            the files are written from the point they were left. Defaults to None.
+        output_format (OutputFormat, optional): Format of the files.
+            Defaults to OutputFormat.jsonl.
+        row_group_size (int, optional): Number of samples per row group of the
+            columnar formats. Defaults to 10000.
+        sampler (ArgumentSampler or None, optional): Sampler of the arguments,
+            required by the columnar formats to type their columns
+            (see `arrow_schema`). Defaults to None.
+        compression (Compression or None, optional): Compression of the jsonl
+            files, not available for the columnar formats. A frame ends on every
+            checkpoint. Defaults to None.
+        compress_level (int or None, optional): Compression level, the default
+            of the format if None. Defaults to None.
+        frame_size (int, optional): Minimum uncompressed bytes per frame of
+            the compressed files. Defaults to DEFAULT_FRAME_SIZE.
+        index (bool, optional): Write the sidecar index of the jsonl files
+            (see `readers.Dataset`). Defaults to False.
+
+    Raises:
+        ValueError: If a columnar format is compressed or has no sampler, or an
+            index is requested for files that aren't uncompressed jsonl.
+
+    Example:
+        >>> with DatasetWriter(Path("dataset_v0"), size=10, shard_size=5) as writer:
+        ...     writer.write(kwargs, annotations)
+        >>> writer.manifest()
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        size: int,
+        shard_size: int = 0,
+        flush_every: int = 1000,
+        state: dict[str, Any] | None = None,
+        output_format: OutputFormat = OutputFormat.jsonl,
+        row_group_size: int = 10000,
+        sampler: ArgumentSampler | None = None,
+        compression: Compression | None = None,
+        compress_level: int | None = None,
+        frame_size: int = DEFAULT_FRAME_SIZE,
+        index: bool = False,
+    ) -> None:
+        self.output_path = output_path
+        self.size = size
+        self.shard_size = shard_size if shard_size > 0 else max(size, 1)
+        self.num_shards = max(1, math.ceil(size / self.shard_size))
+        self.flush_every = flush_every
+        self.output_format = OutputFormat(output_format)
+        self.row_group_size = row_group_size
+        self.columnar = self.output_format in (OutputFormat.parquet, OutputFormat.arrow)
+        # Only the jsonl files can be continued from a checkpoint.
+        self.appendable = self.output_format == OutputFormat.jsonl
+        self.streams = ("dataset",) if self.columnar else ("dataset", "arguments")
+        self.compression = None if compression is None else Compression(compression)
+        if self.columnar and self.compression is not None:
+            raise ValueError(
+                f"The {self.output_format.value} files can't be compressed"
+            )
+        if index and (self.columnar or self.compression is not None):
+            raise ValueError("Only the uncompressed jsonl files can be indexed")
+        if self.columnar and sampler is None:
+            raise ValueError(
+                f"The {self.output_format.value} files require the sampler "
+                "of the arguments"
+            )
+        # Derived once, so every shard has the same schema.
+        self._schema = arrow_schema(sampler) if self.columnar else None
+        self.index = index
+        self._shard_kwargs = {
+            "compression": self.compression,
+            "compress_level": compress_level,
+            "frame_size": frame_size,
+            "index": index,
+        }
+        self.written = 0
+        jsonl_suffix = ".jsonl" + (self.compression.suffix if self.compression else "")
+        self._names = {
+            "dataset": shard_names(
+                "dataset",
+                self.num_shards,
+                suffix=(
+                    jsonl_suffix
+                    if self.output_format == OutputFormat.jsonl
+                    else self.output_format.suffix
+                ),
+            ),
+            "arguments": shard_names("arguments", self.num_shards, suffix=jsonl_suffix),
+        }
+        # Entries of the shards already closed, and the shards being written.
+        self._finished: list[dict[str, dict[str, str | int]]] = []
+        self._current: dict[str, Shard] | None = None
+        if state is not None:
+            self._restore(state)
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _restore(self, state: dict[str, Any]) -> None:
+        self.written = state["size"]
+        self._finished = state["shards"]
+        if self.written % self.shard_size != 0:
+            # The last shard wasn't completed, keep writing on it.
+            last = self._finished.pop()
+            self._current = {
+                s: Shard(
+                    self.output_path / last[s]["path"],
+                    info=last[s],
+                    **self._shard_kwargs,
+                )
+                for s in self.streams
+            }
+
+    def _close_shard(self) -> None:
+        for shard in self._current.values():
+            shard.close()
+        self._finished.append({s: shard.info() for s, shard in self._current.items()})
+        self._current = None
+
+    def _open_shard(self) -> None:
+        index = len(self._finished)
+        paths = {s: self.output_path / self._names[s][index] for s in self.streams}
+        if self.columnar:
+            self._current = {
+                "dataset": ColumnarShard(
+                    paths["dataset"],
+                    self.output_format,
+                    self._schema,
+                    row_group_size=self.row_group_size,
+                )
+            }
+        elif self.output_format == OutputFormat.docbin:
+            self._current = {
+                "dataset": DocBinShard(paths["dataset"]),
+                "arguments": Shard(paths["arguments"], **self._shard_kwargs),
+            }
+        else:
+            self._current = {
+                s: Shard(path, **self._shard_kwargs) for s, path in paths.items()
+            }
+
+    def write(
+        self,
+        kwargs: dict[str, Any],
+        annotations: dict[str, Any],
+        doc: bytes | None = None,
+    ) -> None:
+        """Writes a sample.
+
+        Args:
+            kwargs (dict[str, Any]): Arguments used to generate the message.
+            annotations (dict[str, Any]): Output of HelpGenerator.annotations.
+            doc (bytes or None, optional): The message serialized by
+                `docbin.doc_bytes`, only used by the docbin format. Defaults to None.
+        """
+        if self._current is None:
+            self._open_shard()
+
+        if self.columnar:
+            self._current["dataset"].write(kwargs, annotations)
+        else:
+            if self.output_format == OutputFormat.docbin:
+                self._current["dataset"].write(annotations, doc=doc)
+            else:
+                self._current["dataset"].write(
+                    (srsly.json_dumps(annotations) + "\n").encode("utf8")
+                )
+            self._current["arguments"].write(
+                (srsly.json_dumps(kwargs) + "\n").encode("utf8")
+            )
+        self.written += 1
+        if self.written % self.shard_size == 0:
+            self._close_shard()
+        elif self.written % self.flush_every == 0:
+            self.flush()
+
+    def flush(self, sync: bool = False) -> None:
+        if self._current is not None:
+            for shard in self._current.values():
+                shard.flush(sync=sync)
+
+    def close(self) -> None:
+        if self.written == 0 and not self._finished and self._current is None:
+            # Write the (empty) files even if there are no samples.
+            self._open_shard()
+        if self._current is not None:
+            self._close_shard()
+
+    def manifest(self) -> dict[str, Any]:
+        """Description of the files written.
+
+        Contains the number of lines, bytes and the sha256 of every shard,
+        to read the shards in parallel and check a dataset is complete
+        without reading it.
+        """
+        shards = list(self._finished)
+        if self._current is not None:
+            shards.append({s: shard.info() for s, shard in self._current.items()})
+        return {
+            "size": self.written,
+            "format": self.output_format.value,
+            "compression": self.compression and self.compression.value,
+            "index": self.index,
+            "shard_size": self.shard_size,
+            "num_shards": len(shards),
+            "shards": shards,
+        }
+
+    def checkpoint(self, path: Path, **metadata: Any) -> None:
+        """Stores the state of the writer to continue from this point.
+
+        The files are synced to disk before writing the checkpoint, which is
+        replaced atomically, so a checkpoint always points to content on disk.
+        The columnar and docbin files can't be continued, their checkpoint
+        points to the last shard closed, and the current one is written again.
+
+        Args:
+            path (Path): Path of the checkpoint file.
+            metadata (Any): Extra fields to store in the checkpoint.
+        """
+        self.flush(sync=True)
+        state = self.manifest()
+        if not self.appendable and self._current is not None:
+            state["shards"].pop()
+            state["size"] = len(state["shards"]) * self.shard_size
+            state["num_shards"] = len(state["shards"])
+        tmp = path.with_suffix(".tmp")
+        srsly.write_json(tmp, {**metadata, "writer": state})
+        os.replace(tmp, path)
+
+
+def verify_manifest(output_path: Path, checksums: bool = False) -> list[str]:
+    """Checks the files of a dataset against its manifest.json.
+
+    By default only the size of the files is checked, which doesn't
+    require reading them.
+
+    Args:
+        output_path (Path): Directory of the dataset.
+        checksums (bool, optional): Whether to compute the sha256 of the files
+            too. Defaults to False.
+
+    Returns:
+        list[str]: Problems found, empty if the dataset is complete.
+    """
+    manifest = srsly.read_json(output_path / "manifest.json")
+    problems = []
+    for shard in manifest["shards"]:
+        for info in shard.values():
+            path = output_path / info["path"]
+            if not path.is_file():
+                problems.append(f"Missing file: {info['path']}")
+                continue
+            if path.stat().st_size != info["bytes"]:
+                problems.append(f"Unexpected size: {info['path']}")
+                continue
+            if checksums:
+                if _sha256(path) != info["sha256"]:
+                    problems.append(f"Checksum mismatch: {info['path']}")
+
+    return problems
@@ -1,10 +1,12 @@
 import nox
 
+
 @nox.session(reuse_venv=True)
 def unit_tests(session):
     session.run("flit", "install", "--deps", "develop")
     session.run("pytest", "tests/unit")
 
+
 @nox.session(reuse_venv=True)
 def integration_tests(session):
     session.run("flit", "install", "--deps", "develop")
@@ -22,3 +24,11 @@ def format(session):
     session.run("flit", "install", "--deps", "develop")
     session.run("isort", "cli_help_maker", "examples", "tests")
     session.run("black", "cli_help_maker", "examples", "tests")
+
+
+@nox.session(reuse_venv=True)
+def benchmarks(session):
+    """Runs the benchmarks and compares them against benchmarks/baseline.json,
+    pass arguments after --, i.e. `nox -s benchmarks -- --update-baseline`."""
+    session.run("flit", "install", "--deps", "develop")
+    session.run("python", "benchmarks/run.py", *session.posargs)
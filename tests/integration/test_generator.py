@@ -10,6 +10,7 @@ import random
 import pytest
 
 import cli_help_maker.generator as gen
+from cli_help_maker.generator import OPT
 from cli_help_maker.utils import highlight_message
 
 FIXED_SEED = 6798
@@ -337,6 +338,7 @@ labels = [
 ]
 # fmt: on
 
+
 # FIXME: A bug places the annotations separated by a single position in most cases
 # (only when the program has more than 3 lines), and other times even full
 @pytest.mark.parametrize(
@@ -514,3 +516,211 @@ def test_annotations(help_generator_default):
     assert isinstance(ann, dict)
     keys = ["message", "annotations"]
     assert all([k in keys for k in ann.keys()])
+
+
+def test_annotations_again():
+    kwargs = {"number_of_options": 6, "options_section": True}
+    help_gen = gen.HelpGenerator(seed=FIXED_SEED, **kwargs)
+    first = help_gen.annotations
+    # Every access generates a new message, without the state of the previous one
+    ann = help_gen.annotations
+    assert ann != first
+    assert help_gen.sections.count("options") == 1
+    assert len(ann["annotations"]) == len(help_gen.tokens)
+    for (_, start, end), token in zip(ann["annotations"], help_gen.tokens):
+        assert "".join(ann["message"][start:end].split()) == "".join(token.split())
+
+
+def test_seed():
+    kwargs = {"number_of_commands": 2, "number_of_options": 3, "options_section": True}
+    ann = gen.HelpGenerator(seed=FIXED_SEED, **kwargs).annotations
+    random.seed(0)  # The global state doesn't affect the instances with a seed
+    assert gen.HelpGenerator(seed=FIXED_SEED, **kwargs).annotations == ann
+    assert gen.HelpGenerator(seed=FIXED_SEED + 1, **kwargs).annotations != ann
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_add_program_labels_after_separator(seed):
+    # The options written after the options separator must be placed
+    # after it, even if there are commands before.
+    help_gen = gen.HelpGenerator(
+        seed=seed,
+        total_width=1000,
+        number_of_commands=2,
+        number_of_options=3,
+        number_of_arguments=2,
+        option_argument_separator=True,
+    )
+    help_gen._add_program("prog")
+    msg = help_gen.help_message
+    assert msg.split()[3] == "--"
+    for label, start, end in help_gen._annotations:
+        element = msg[start:end]
+        assert element == element.strip() and len(element) > 0
+        assert msg[start - 1] == " "
+        if label == OPT:
+            assert element[0] in "-["
+
+
+def test_write(help_generator_default):
+    help_generator_default._write("usage: ")
+    help_generator_default._write("prog")
+    assert help_generator_default._current_length == len("usage: prog")
+    assert help_generator_default.help_message == "usage: prog"
+    help_generator_default._write("\n")
+    assert help_generator_default.help_message == "usage: prog\n"
+
+
+def test_text_pool():
+    text_pool = pytest.importorskip("cli_help_maker.text_pool")
+    kwargs = {
+        "number_of_options": 3,
+        "options_section": True,
+        "option_documented_prob": 1,
+        "program_description_prob": 1,
+    }
+    ann = gen.HelpGenerator(
+        seed=FIXED_SEED, text_pool=text_pool.TextPool(seed=1), **kwargs
+    ).annotations
+    assert ann == (
+        gen.HelpGenerator(
+            seed=FIXED_SEED, text_pool=text_pool.TextPool(seed=1), **kwargs
+        ).annotations
+    )
+    for label, start, end in ann["annotations"]:
+        assert len(ann["message"][start:end].strip()) > 0
+
+
+@pytest.mark.parametrize("number_of_options", [0, [0, 2]])
+def test_options_shortcut_at_least_one_option(number_of_options):
+    help_gen = gen.HelpGenerator(
+        options_shortcut=1, number_of_options=number_of_options, seed=FIXED_SEED
+    )
+    assert all(help_gen.number_of_options >= 1 for _ in range(20))
+
+
+def test_instrument():
+    kwargs = {
+        "number_of_commands": 2,
+        "number_of_options": 3,
+        "options_section": True,
+        "commands_section": True,
+        "option_documented_prob": 1,
+        "program_description_prob": 1,
+    }
+    events = []
+    ann = gen.HelpGenerator(seed=FIXED_SEED, instrument=events.append, **kwargs)
+    ann = ann.annotations
+    # The instrument doesn't change the message
+    assert ann == gen.HelpGenerator(seed=FIXED_SEED, **kwargs).annotations
+
+    phases = {event.phase for event in events}
+    assert phases == {
+        "program_description",
+        "programs",
+        "program",
+        "annotations",
+        "section",
+        "documentation",
+    }
+    programs = [e for e in events if e.phase == "programs"]
+    assert len(programs) == 1
+    assert programs[0].spans == sum(e.spans for e in events if e.phase == "program")
+    # The spans added by each phase are those of the message
+    assert sum(e.spans for e in events if e.phase in ("programs", "section")) == len(
+        ann["annotations"]
+    )
+    assert all(e.elapsed_ns >= 0 and e.chars >= 0 for e in events)
+
+
+def test_reset():
+    configs = [
+        {"number_of_commands": 2, "number_of_options": 3, "options_section": True},
+        {"number_of_options": [1, 5], "options_shortcut": 0.5, "total_width": 60},
+        {"number_of_arguments": [0, 3], "arguments_section": True, "indent_spaces": 4},
+        {},
+    ]
+    help_gen = gen.HelpGenerator(seed=FIXED_SEED)
+    annotations, option_names = help_gen._annotations, help_gen._option_names
+    previous = help_gen.annotations
+    for seed in range(5):
+        for kwargs in configs:
+            ann = help_gen.reset(seed=seed, **kwargs).annotations
+            assert ann == gen.HelpGenerator(seed=seed, **kwargs).annotations
+    # The lists are reused, and the annotations returned aren't modified
+    assert help_gen._annotations is annotations
+    assert help_gen._option_names is option_names
+    assert previous == gen.HelpGenerator(seed=FIXED_SEED).annotations
+
+
+def test_reset_errored():
+    help_gen = gen.HelpGenerator(seed=FIXED_SEED)
+    with pytest.raises(TypeError):
+        help_gen.reset(seed=1, number_of_things=2)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {
+            "number_of_commands": [0, 3],
+            "number_of_options": [1, 8],
+            "options_section": True,
+        },
+        {"number_of_arguments": [0, 3], "arguments_section": True, "total_width": 60},
+    ],
+)
+def test_generate_batch(kwargs):
+    help_gen = gen.HelpGenerator(**kwargs)
+    batch = help_gen.generate_batch(10, seed=FIXED_SEED)
+    assert len(batch) == 10
+    for i, sample in enumerate(batch):
+        assert (
+            sample
+            == gen.HelpGenerator(
+                seed=gen.sample_seed(FIXED_SEED, i), **kwargs
+            ).annotations
+        )
+    # The same seed generates the same batch
+    assert help_gen.generate_batch(10, seed=FIXED_SEED) == batch
+
+    columns = gen.HelpGenerator(**kwargs).generate_batch(
+        10, seed=FIXED_SEED, columnar=True
+    )
+    assert len(columns) == 10
+    assert len(columns.offsets) == 11
+    assert columns.offsets[-1] == len(columns.labels) == len(columns.starts)
+    assert columns.to_annotations() == [
+        {"message": s["message"], "annotations": [tuple(a) for a in s["annotations"]]}
+        for s in batch
+    ]
+
+
+def test_generate_batch_text_pool():
+    text_pool = pytest.importorskip("cli_help_maker.text_pool")
+    kwargs = {"number_of_options": [1, 5], "program_description_prob": 1}
+    help_gen = gen.HelpGenerator(text_pool=text_pool.TextPool(seed=1), **kwargs)
+    batch = help_gen.generate_batch(5, seed=FIXED_SEED)
+    # The descriptions continue the stream of the pool, shared by the messages
+    pool = text_pool.TextPool(seed=1)
+    assert batch == [
+        gen.HelpGenerator(
+            seed=gen.sample_seed(FIXED_SEED, i), text_pool=pool, **kwargs
+        ).annotations
+        for i in range(5)
+    ]
+    assert batch[1] != (
+        gen.HelpGenerator(
+            seed=gen.sample_seed(FIXED_SEED, 1),
+            text_pool=text_pool.TextPool(seed=1),
+            **kwargs,
+        ).annotations
+    )
+
+
+def test_generate_batch_without_seed():
+    kwargs = {"number_of_options": [1, 5]}
+    batch = gen.HelpGenerator(seed=FIXED_SEED, **kwargs).generate_batch(5)
+    # Consecutive draws of the instance generator.
+    assert batch == gen.HelpGenerator(seed=FIXED_SEED, **kwargs).generate_batch(5)
+    assert len({sample["message"] for sample in batch}) == 5
@@ -10,22 +10,49 @@ import subprocess
 import tempfile
 from collections import Counter
 
+import pytest
 import srsly
 from typer.testing import CliRunner
 
-from cli_help_maker import utils
+from cli_help_maker import compression, corpus, main, readers, utils, writers
 from cli_help_maker.main import app
 
 root = pathlib.Path(__file__).resolve().parent.parent.parent
 dataset_path = root / "dataset.yaml"
 
+input_path = root / "tests" / "data" / "dataset.yaml"
+
 runner = CliRunner()
 
 
+def run_interrupted(args, at=60):
+    """Runs the command with `args`, interrupted after generating `at` samples."""
+    generate_samples = main.generate_samples
+
+    def interrupted(*arguments, **kwargs):
+        for i, sample in enumerate(generate_samples(*arguments, **kwargs)):
+            if i == at:
+                raise KeyboardInterrupt
+            yield sample
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(main, "generate_samples", interrupted)
+        result = runner.invoke(app, args)
+    assert result.exit_code != 0
+
+
+def read_table(path):
+    pa = pytest.importorskip("pyarrow")
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
 def test_main():
     with tempfile.TemporaryDirectory() as tmpdir:
         tmpdir = pathlib.Path(tmpdir)
-        input_path = root / "tests" / "data" / "dataset.yaml"
         output_path = root / "tests" / "data" / tmpdir
 
         # subprocess.run(["cli-help-maker", str(input_path), str(output_path)], capture_output=True)
@@ -62,3 +89,422 @@ def test_main():
                 assert False, "A message has an annotation out of the content"
 
         # TODO: Add test to check the labels are not overlapping
+
+
+def test_main_workers():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        single, multi = tmpdir / "single", tmpdir / "multi"
+        for output_path, workers in [(single, "1"), (multi, "2")]:
+            result = runner.invoke(
+                app,
+                [
+                    str(input_path),
+                    str(output_path),
+                    "--workers",
+                    workers,
+                    "--seed",
+                    "42",
+                ],
+            )
+            assert result.exit_code == 0
+
+        for filename in ["arguments.jsonl", "dataset.jsonl", "stats.json"]:
+            assert (single / filename).read_bytes() == (multi / filename).read_bytes()
+
+
+def test_main_shards():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        result = runner.invoke(
+            app, [str(input_path), str(tmpdir), "--shard-size", "30"]
+        )
+        assert result.exit_code == 0
+        manifest = srsly.read_json(tmpdir / "manifest.json")
+        assert manifest["size"] == 100
+        assert manifest["num_shards"] == 4
+        assert [s["dataset"]["path"] for s in manifest["shards"]] == [
+            f"dataset-0000{i}-of-00004.jsonl" for i in range(4)
+        ]
+        assert [s["arguments"]["lines"] for s in manifest["shards"]] == [30, 30, 30, 10]
+        assert writers.verify_manifest(tmpdir, checksums=True) == []
+
+
+def test_main_resume():
+    options = ["--seed", "42", "--shard-size", "40", "--checkpoint-every", "25"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        complete, resumed = tmpdir / "complete", tmpdir / "resumed"
+        result = runner.invoke(app, [str(input_path), str(complete), *options])
+        assert result.exit_code == 0
+
+        run_interrupted([str(input_path), str(resumed), *options])
+        assert srsly.read_json(resumed / "checkpoint.json")["last_index"] == 49
+
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        assert not (resumed / "checkpoint.json").exists()
+        assert srsly.read_json(resumed / "manifest.json") == srsly.read_json(
+            complete / "manifest.json"
+        )
+        for path in complete.iterdir():
+            assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+
+@pytest.mark.parametrize("compress", ["zstd", "gzip"])
+def test_main_compress(compress):
+    options = ["--seed", "42", "--shard-size", "40", "--checkpoint-every", "25"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        plain, complete = tmpdir / "plain", tmpdir / "complete"
+        resumed = tmpdir / "resumed"
+        result = runner.invoke(app, [str(input_path), str(plain), *options])
+        assert result.exit_code == 0
+        compress_options = [*options, "--compress", compress, "--frame-size", "1000"]
+        result = runner.invoke(app, [str(input_path), str(complete), *compress_options])
+        assert result.exit_code == 0
+        manifest = srsly.read_json(complete / "manifest.json")
+        assert manifest["compression"] == compress
+        assert writers.verify_manifest(complete, checksums=True) == []
+        suffix = ".zst" if compress == "zstd" else ".gz"
+        for path in plain.glob("*.jsonl"):
+            with compression.open_compressed(complete / (path.name + suffix)) as f:
+                assert f.read() == path.read_bytes()
+
+        run_interrupted([str(input_path), str(resumed), *compress_options])
+
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        for path in complete.iterdir():
+            assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+
+def test_main_compress_columnar():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        result = runner.invoke(
+            app, [str(input_path), tmpdir, "--format", "parquet", "--compress", "zstd"]
+        )
+        assert result.exit_code != 0
+
+
+def test_main_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        result = runner.invoke(
+            app, [str(input_path), str(tmpdir), "--shard-size", "30", "--index"]
+        )
+        assert result.exit_code == 0
+        assert len(list(tmpdir.glob("*.jsonl.idx"))) == 8
+        arguments = [
+            row
+            for path in sorted(tmpdir.glob("arguments-*.jsonl"))
+            for row in srsly.read_jsonl(path)
+        ]
+        with readers.Dataset(tmpdir, with_arguments=True) as dataset:
+            assert len(dataset) == 100
+            annotations, kwargs = dataset[42]
+            assert kwargs == arguments[42]
+            expected = main.HelpGenerator(**kwargs).annotations
+            assert annotations["message"] == expected["message"]
+            assert annotations["annotations"] == [
+                list(span) for span in expected["annotations"]
+            ]
+
+        result = runner.invoke(
+            app, [str(input_path), str(tmpdir), "--index", "--compress", "gzip"]
+        )
+        assert result.exit_code != 0
+
+
+def test_main_dedup():
+    options = ["--seed", "42", "--shard-size", "40", "--checkpoint-every", "25"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        complete, resumed = tmpdir / "complete", tmpdir / "resumed"
+        options = [*options, "--dedup", "exact"]
+        result = runner.invoke(app, [str(input_path), str(complete), *options])
+        assert result.exit_code == 0
+        report = srsly.read_json(complete / "manifest.json")["dedup"]
+        assert report["mode"] == "exact"
+        assert report["checked"] == 100 + report["regenerated"]
+        messages = [
+            row["message"]
+            for path in sorted(complete.glob("dataset-*.jsonl"))
+            for row in srsly.read_jsonl(path)
+        ]
+        assert len(messages) == 100
+        assert len(set(messages)) == 100 - report["kept"]
+
+        run_interrupted([str(input_path), str(resumed), *options])
+
+        # The filters are rebuilt from the samples written
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        assert srsly.read_json(resumed / "manifest.json") == srsly.read_json(
+            complete / "manifest.json"
+        )
+        for path in complete.iterdir():
+            assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+        # A dataset generated without --dedup is resumed without it
+        without = tmpdir / "without"
+        run_interrupted([str(input_path), str(without), "--checkpoint-every", "25"])
+        result = runner.invoke(
+            app, [str(input_path), str(without), "--resume", "--dedup", "exact"]
+        )
+        assert result.exit_code == 0
+        assert "dedup" not in srsly.read_json(without / "manifest.json")
+
+        options = ["--dedup", "exact", "--dedup-error-rate", "1"]
+        result = runner.invoke(app, [str(input_path), str(tmpdir / "x"), *options])
+        assert result.exit_code != 0
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "parquet"])
+def test_main_validate(monkeypatch, output_format):
+    pytest.importorskip("numpy")
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    options = ["--seed", "42", "--shard-size", "40", "--checkpoint-every", "25"]
+    options = [*options, "--format", output_format, "--validate"]
+    validate_batch = main.validate_batch
+
+    def validate(samples, tokens):
+        # Every message with "usage:" in lowercase is invalid once
+        problems = validate_batch(samples, tokens)
+        for sample, sample_problems in zip(samples, problems):
+            if sample["message"].startswith("usage:"):
+                sample_problems.append("text: CMD [0, 1)")
+        return problems
+
+    monkeypatch.setattr(main, "validate_batch", validate)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        complete, resumed = tmpdir / "complete", tmpdir / "resumed"
+        result = runner.invoke(app, [str(input_path), str(complete), *options])
+        assert result.exit_code == 0
+        report = srsly.read_json(complete / "manifest.json")["validation"]
+        assert report["invalid"] > 0
+        assert report["checked"] == 100 + report["regenerated"]
+        lines = list(srsly.read_jsonl(complete / "quarantine.jsonl"))
+        assert len(lines) == report["invalid"]
+        assert report["bytes"] == (complete / "quarantine.jsonl").stat().st_size
+
+        run_interrupted([str(input_path), str(resumed), *options])
+
+        # The quarantine is truncated to the checkpoint and continued
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        assert srsly.read_json(resumed / "manifest.json") == srsly.read_json(
+            complete / "manifest.json"
+        )
+        for path in complete.iterdir():
+            assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "parquet"])
+def test_main_stats(output_format):
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    options = ["--seed", "42", "--shard-size", "40", "--checkpoint-every", "25"]
+    options = [*options, "--format", output_format]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        complete, resumed = tmpdir / "complete", tmpdir / "resumed"
+        result = runner.invoke(app, [str(input_path), str(complete), *options])
+        assert result.exit_code == 0
+        stats = srsly.read_json(complete / "stats.json")
+        assert stats["samples"] == 100
+        manifest = srsly.read_json(complete / "manifest.json")
+        chars = [len(m) for m in readers.iter_messages(complete, manifest)]
+        assert stats["histograms"]["chars"]["mean"] == sum(chars) / 100
+
+        run_interrupted([str(input_path), str(resumed), *options])
+
+        # The stats of the samples written are restored from the checkpoint
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        assert srsly.read_json(resumed / "stats.json") == stats
+
+        result = runner.invoke(
+            app, [str(input_path), str(tmpdir / "none"), *options, "--no-stats"]
+        )
+        assert result.exit_code == 0
+        assert not (tmpdir / "none" / "stats.json").exists()
+
+
+def test_main_resume_without_checkpoint():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        result = runner.invoke(app, [str(input_path), tmpdir, "--resume"])
+        assert result.exit_code != 0
+
+
+def test_main_compiled_corpus(monkeypatch):
+    # main modifies both, restore them after the test
+    monkeypatch.setattr(utils, "word_list", corpus.WordCorpus())
+    monkeypatch.delenv(corpus.CORPUS_ENV_VAR, raising=False)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        corpus_path = tmpdir / "words.bin"
+        corpus.compile_corpus(corpus_path)
+        nltk, compiled = tmpdir / "nltk", tmpdir / "compiled"
+        result = runner.invoke(app, [str(input_path), str(nltk), "--seed", "1"])
+        assert result.exit_code == 0
+        monkeypatch.setenv(corpus.CORPUS_ENV_VAR, str(corpus_path))
+        result = runner.invoke(
+            app,
+            [
+                str(input_path),
+                str(compiled),
+                "--seed",
+                "1",
+                "--workers",
+                "2",
+                "--corpus",
+                str(corpus_path),
+            ],
+        )
+        assert result.exit_code == 0
+        for filename in ["arguments.jsonl", "dataset.jsonl"]:
+            assert (nltk / filename).read_bytes() == (compiled / filename).read_bytes()
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_main_profile(workers):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = pathlib.Path(tmpdir)
+        result = runner.invoke(
+            app,
+            [
+                str(input_path),
+                str(output_path),
+                "--seed",
+                "1",
+                "-w",
+                workers,
+                "--profile",
+            ],
+        )
+        assert result.exit_code == 0
+        report = srsly.read_json(output_path / "profile.json")
+        stages = report["stages"]
+        assert stages["config"]["calls"] == 1
+        assert stages["sample"]["calls"] == report["samples"] == 100
+        assert stages["serialize"]["calls"] == 100
+        assert "sample;generator;programs" in stages
+        assert (output_path / "profile.collapsed").is_file()
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_main_columnar(output_format):
+    pytest.importorskip("pyarrow")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        jsonl, columnar = tmpdir / "jsonl", tmpdir / "columnar"
+        result = runner.invoke(app, [str(input_path), str(jsonl), "--seed", "3"])
+        assert result.exit_code == 0
+        result = runner.invoke(
+            app,
+            [
+                str(input_path),
+                str(columnar),
+                "--seed",
+                "3",
+                "--shard-size",
+                "60",
+                "--format",
+                output_format,
+                "--row-group-size",
+                "25",
+            ],
+        )
+        assert result.exit_code == 0
+        assert writers.verify_manifest(columnar, checksums=True) == []
+        manifest = srsly.read_json(columnar / "manifest.json")
+        assert manifest["format"] == output_format
+
+        rows = []
+        for shard in manifest["shards"]:
+            rows.extend(read_table(columnar / shard["dataset"]["path"]).to_pylist())
+        data = list(srsly.read_jsonl(jsonl / "dataset.jsonl"))
+        args = list(srsly.read_jsonl(jsonl / "arguments.jsonl"))
+        assert len(rows) == len(data) == 100
+        for row, line, kwargs in zip(rows, data, args):
+            assert row["message"] == line["message"]
+            assert [
+                [span["label"], span["start"], span["end"]]
+                for span in row["annotations"]
+            ] == line["annotations"]
+            assert row["seed"] == kwargs["seed"]
+            assert row["arguments_style"] == kwargs["arguments_style"]
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_main_columnar_resume(output_format):
+    pytest.importorskip("pyarrow")
+    options = ["--seed", "3", "--shard-size", "60", "--checkpoint-every", "20"]
+    options = [*options, "--format", output_format, "--row-group-size", "25"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        complete, resumed = tmpdir / "complete", tmpdir / "resumed"
+        result = runner.invoke(app, [str(input_path), str(complete), *options])
+        assert result.exit_code == 0
+
+        # The shard in progress is written again with the row group size
+        # of the checkpoint
+        run_interrupted([str(input_path), str(resumed), *options], at=90)
+        result = runner.invoke(app, [str(input_path), str(resumed), "--resume"])
+        assert result.exit_code == 0
+        assert srsly.read_json(resumed / "manifest.json") == srsly.read_json(
+            complete / "manifest.json"
+        )
+        for path in complete.iterdir():
+            assert path.read_bytes() == (resumed / path.name).read_bytes()
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            shard = sorted(resumed.glob("*.parquet"))[-1]
+            metadata = pq.ParquetFile(shard).metadata
+            rows = [
+                metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)
+            ]
+            assert rows == [25, 15]
+
+
+def test_main_docbin():
+    spacy = pytest.importorskip("spacy")
+    from spacy.tokens import DocBin
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        jsonl, docbin = tmpdir / "jsonl", tmpdir / "docbin"
+        result = runner.invoke(app, [str(input_path), str(jsonl), "--seed", "3"])
+        assert result.exit_code == 0
+        result = runner.invoke(
+            app,
+            [
+                str(input_path),
+                str(docbin),
+                "--seed",
+                "3",
+                "-w",
+                "2",
+                "--format",
+                "docbin",
+            ],
+        )
+        assert result.exit_code == 0
+        assert writers.verify_manifest(docbin, checksums=True) == []
+        assert not (docbin / "dataset.jsonl").exists()
+        assert (docbin / "arguments.jsonl").read_bytes() == (
+            jsonl / "arguments.jsonl"
+        ).read_bytes()
+
+        nlp = spacy.blank("en")
+        docs = list(DocBin().from_disk(docbin / "dataset.spacy").get_docs(nlp.vocab))
+        data = list(srsly.read_jsonl(jsonl / "dataset.jsonl"))
+        assert [doc.text for doc in docs] == [line["message"] for line in data]
+        for doc, line in zip(docs, data):
+            assert [ent.label_ for ent in doc.ents] == [
+                a[0] for a in line["annotations"]
+            ]
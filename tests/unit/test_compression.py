@@ -0,0 +1,68 @@
+import gzip
+
+import pytest
+
+from cli_help_maker import compression
+
+lines = [
+    f'{{"i": {i}, "text": "{"word " * (i % 20)}"}}\n'.encode() for i in range(2000)
+]
+
+
+def compress(path, kind, frame_size, checkpoints=()):
+    with open(path, "wb") as f:
+        compressor = compression.BackgroundCompressor(
+            f.write, kind, frame_size=frame_size
+        )
+        for i, line in enumerate(lines):
+            compressor.write(line)
+            if i % 300 == 0:
+                compressor.flush(end_frame=i in checkpoints)
+        compressor.close()
+
+
+@pytest.mark.parametrize(
+    "kind, suffix", [(compression.Compression.gzip, ".gz"), ("zstd", ".zst")]
+)
+@pytest.mark.parametrize("frame_size", [1 << 10, compression.DEFAULT_FRAME_SIZE])
+def test_background_compressor(tmp_path, kind, suffix, frame_size):
+    path = tmp_path / f"data.jsonl{suffix}"
+    compress(path, kind, frame_size, checkpoints=(600, 1200))
+    assert path.stat().st_size < sum(len(line) for line in lines)
+    with compression.open_compressed(path) as f:
+        assert f.read() == b"".join(lines)
+    assert [row["i"] for row in compression.read_jsonl(path)] == list(range(2000))
+    if kind == compression.Compression.gzip:
+        assert gzip.decompress(path.read_bytes()) == b"".join(lines)
+
+
+@pytest.mark.parametrize("kind", list(compression.Compression))
+def test_background_compressor_frames(tmp_path, kind):
+    # The frames end on the checkpoints, the output up to a checkpoint
+    # is a complete file.
+    path = tmp_path / f"data.jsonl{compression.Compression(kind).suffix}"
+    with open(path, "wb") as f:
+        compressor = compression.BackgroundCompressor(f.write, kind)
+        for line in lines[:100]:
+            compressor.write(line)
+        compressor.flush(end_frame=True)
+        size = f.tell()
+        for line in lines[100:]:
+            compressor.write(line)
+        compressor.close()
+
+    truncated = tmp_path / f"truncated.jsonl{compression.Compression(kind).suffix}"
+    truncated.write_bytes(path.read_bytes()[:size])
+    with compression.open_compressed(truncated) as f:
+        assert f.read() == b"".join(lines[:100])
+
+
+def test_compression_unknown():
+    with pytest.raises(ValueError):
+        compression.BackgroundCompressor(lambda data: None, "lz4")
+
+
+def test_open_uncompressed(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(b"".join(lines))
+    assert len(list(compression.read_jsonl(path))) == 2000
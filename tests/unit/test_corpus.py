@@ -0,0 +1,48 @@
+"""Tests for cli_help_maker.corpus. """
+
+import pytest
+
+from cli_help_maker import corpus, utils
+
+words = ["Zero", "one", "two", "", "fünf"]
+
+
+@pytest.fixture()
+def compiled_corpus(tmp_path):
+    path = tmp_path / "words.bin"
+    assert corpus.compile_corpus(path, words) == len(words)
+    yield path
+
+
+def test_mapped_words(compiled_corpus):
+    mapped = corpus.MappedWords(compiled_corpus)
+    assert len(mapped) == len(words)
+    assert list(mapped) == [w.lower() for w in words]
+    assert mapped[-1] == "fünf"
+    with pytest.raises(IndexError):
+        mapped[len(words)]
+
+
+def test_mapped_words_errored(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_bytes(b"not a compiled corpus")
+    with pytest.raises(ValueError):
+        corpus.MappedWords(path)
+
+
+def test_word_corpus(compiled_corpus, monkeypatch):
+    monkeypatch.delenv(corpus.CORPUS_ENV_VAR, raising=False)
+    word_corpus = corpus.WordCorpus(compiled_corpus)
+    # Nothing is read until the words are requested
+    assert word_corpus._words is None
+    assert len(word_corpus) == len(words)
+    assert word_corpus[1] == "one"
+
+    monkeypatch.setenv(corpus.CORPUS_ENV_VAR, str(compiled_corpus))
+    word_corpus = corpus.WordCorpus()
+    assert isinstance(word_corpus.load(), corpus.MappedWords)
+
+
+def test_get_word_compiled_corpus(compiled_corpus, monkeypatch):
+    monkeypatch.setattr(utils, "word_list", corpus.WordCorpus(compiled_corpus))
+    assert all(utils.get_word() in {w.lower() for w in words} for _ in range(20))
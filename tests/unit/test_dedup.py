@@ -0,0 +1,93 @@
+"""Tests for cli_help_maker.dedup. """
+
+import random
+
+import pytest
+
+from cli_help_maker.dedup import COUNTS, BloomFilter, Deduplicator, normalize
+
+WORDS = "usage options show this help message and exit the version of input file"
+
+
+def random_message(rng, words=40):
+    return " ".join(rng.choices(WORDS.split() + [str(i) for i in range(100)], k=words))
+
+
+def test_normalize():
+    assert normalize("Usage:\n  prog  [-h]\n\nOptions:") == "usage: prog [-h] options:"
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    keys = [f"key-{i}".encode() for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.nbytes == (bloom.num_bits + 7) // 8
+
+
+@pytest.mark.parametrize("error_rate", [0, 1, 1.5])
+def test_bloom_filter_errored(error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(10, error_rate=error_rate)
+
+
+def test_bloom_filter_array():
+    np = pytest.importorskip("numpy")
+    bloom = BloomFilter(100)
+    keys = np.arange(10, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    positions = bloom.array_positions(keys)
+    assert positions.shape == (10, bloom.num_hashes)
+    assert not bloom.contains_any(positions)
+    bloom.set_array(positions[3:4])
+    assert bloom.contains_any(positions)
+    assert not bloom.contains_any(positions[4:])
+
+
+def test_deduplicator_exact():
+    rng = random.Random(0)
+    messages = [random_message(rng) for _ in range(50)]
+    deduplicator = Deduplicator(100)
+    for message in messages:
+        assert deduplicator.check(message) is None
+        deduplicator.insert(message)
+    # The whitespace and case don't matter
+    assert deduplicator.check(messages[10].upper().replace(" ", "\n  ")) == "exact"
+    # A word changed isn't detected
+    assert deduplicator.check(messages[10] + " more") is None
+    assert deduplicator.counts["checked"] == 52
+    assert deduplicator.counts["exact"] == 1
+
+
+def test_deduplicator_near():
+    pytest.importorskip("numpy")
+    rng = random.Random(0)
+    messages = [random_message(rng, words=200) for _ in range(50)]
+    deduplicator = Deduplicator(100, mode="near")
+    for message in messages:
+        assert deduplicator.check(message) is None
+        deduplicator.insert(message)
+    assert deduplicator.check(messages[0]) == "exact"
+    assert deduplicator.check(messages[5] + " one more word") == "near"
+    assert deduplicator.check(random_message(rng, words=200)) is None
+
+
+def test_deduplicator_report():
+    deduplicator = Deduplicator(10)
+    for message in ["a", "b", "a", "c", "a"]:
+        if deduplicator.check(message) is None:
+            deduplicator.insert(message)
+    report = deduplicator.report()
+    assert report["mode"] == "exact"
+    assert report["checked"] == 5
+    assert report["exact"] == 2
+    assert report["hit_rate"] == 0.4
+    assert report["memory_bytes"] == deduplicator.nbytes
+
+    restored = Deduplicator(10)
+    restored.restore(report)
+    assert {key: restored.report()[key] for key in COUNTS} == {
+        key: report[key] for key in COUNTS
+    }
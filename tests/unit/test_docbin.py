@@ -0,0 +1,53 @@
+"""Tests for cli_help_maker.docbin. """
+
+import pytest
+
+from cli_help_maker import docbin
+from cli_help_maker.generator import HelpGenerator
+
+spacy = pytest.importorskip("spacy")
+from spacy.tokens import DocBin  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    return docbin.blank_nlp()
+
+
+def test_annotations_to_doc(nlp):
+    annotations = {
+        "message": "usage: prog cmd [--verbose] <file>...",
+        "annotations": [("CMD", 12, 15), ("OPT", 17, 26), ("ARG", 28, 37)],
+    }
+    doc = docbin.annotations_to_doc(nlp, annotations)
+    assert doc.text == annotations["message"]
+    assert [ent.label_ for ent in doc.ents] == ["CMD", "OPT", "ARG"]
+    # The entities cover at least the characters annotated.
+    for ent, (_, start, end) in zip(doc.ents, annotations["annotations"]):
+        assert ent.start_char <= start and end <= ent.end_char
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_doc_bytes(nlp, seed):
+    annotations = HelpGenerator(seed=seed, number_of_options=[1, 5]).annotations
+    doc_bin = DocBin().from_bytes(docbin.doc_bytes(nlp, annotations))
+    (doc,) = doc_bin.get_docs(nlp.vocab)
+    assert doc.text == annotations["message"]
+    assert len(doc.ents) == len(annotations["annotations"])
+
+
+def test_docbin_shard(tmp_path, nlp):
+    path = tmp_path / "dataset.spacy"
+    shard = docbin.DocBinShard(path)
+    samples = [HelpGenerator(seed=i).annotations for i in range(4)]
+    for i, annotations in enumerate(samples):
+        # Serialized in a worker or in the shard itself.
+        doc = docbin.doc_bytes(nlp, annotations) if i % 2 else None
+        shard.write(annotations, doc=doc)
+    assert shard.info()["sha256"] == ""
+    shard.close()
+    assert shard.info()["lines"] == 4
+    assert shard.info()["bytes"] == path.stat().st_size
+
+    docs = list(DocBin().from_disk(path).get_docs(nlp.vocab))
+    assert [doc.text for doc in docs] == [a["message"] for a in samples]
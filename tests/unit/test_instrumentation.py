@@ -0,0 +1,43 @@
+"""Tests for cli_help_maker.instrumentation. """
+
+from cli_help_maker.instrumentation import Event, Histogram, PhaseHistograms
+
+
+def test_histogram():
+    histogram = Histogram((1, 5))
+    for value in [0, 1, 2, 5, 6]:
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.count == 5
+    assert histogram.sum == 14
+    other = Histogram((1, 5))
+    other.observe(10)
+    histogram.merge(other)
+    assert histogram.counts == [2, 2, 2]
+
+
+def test_phase_histograms(tmp_path):
+    histograms = PhaseHistograms()
+    histograms(Event("section", 2_000, 120, 3))
+    histograms(Event("section", 20_000_000, 0, 0))
+    other = PhaseHistograms()
+    other(Event("programs", 1_000, 40, 2))
+    histograms.merge(other)
+
+    text = histograms.to_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE cli_help_maker_phase_duration_seconds histogram" in lines
+    assert (
+        'cli_help_maker_phase_duration_seconds_bucket{phase="section",le="1e-05"} 1'
+        in lines
+    )
+    assert (
+        'cli_help_maker_phase_duration_seconds_bucket{phase="section",le="+Inf"} 2'
+        in lines
+    )
+    assert 'cli_help_maker_phase_spans_sum{phase="section"} 3.0' in lines
+    assert 'cli_help_maker_phase_chars_count{phase="programs"} 1' in lines
+
+    path = tmp_path / "metrics.prom"
+    histograms.write(path)
+    assert path.read_text() == text
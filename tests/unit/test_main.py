@@ -1,8 +1,10 @@
 """Tests for cli_help_maker.cli functionalities. """
 
 import pathlib
+import random
 
 import pytest
+import srsly
 
 from cli_help_maker import main
 
@@ -39,6 +41,10 @@ def test_get_distribution():
         "parameters": {"min": 0, "max": 10},
     }
     assert isinstance(main.get_distribution(uniform_discrete_dist)(), int)
+    sampler = main.get_distribution(uniform_discrete_dist)
+    assert [sampler(random.Random(1)) for _ in range(3)] == [
+        random.Random(1).randint(0, 10)
+    ] * 3
 
 
 @pytest.mark.parametrize(
@@ -57,9 +63,151 @@ def test_get_distribution_errored(a):
         assert main.get_distribution(a)() == 1
 
 
+def test_compile_config():
+    conf = main.read_config(dataset_path)
+    sampler = main.compile_config(main.load_config(dataset_path))
+    assert sampler.names == main.HELP_ARGUMENTS
+    for i in range(50):
+        expected = main.sample_arguments(conf["arguments"], random.Random(i))
+        assert main.sample_arguments(sampler, random.Random(i)) == expected
+    assert main.generate_sample(3, 42, sampler) == main.generate_sample(
+        3, 42, conf["arguments"]
+    )
+
+
+def test_compile_config_missing_argument():
+    dataset_config = main.load_config(dataset_path)
+    del dataset_config.arguments["total_width"]
+    with pytest.raises(ValueError, match="total_width"):
+        main.compile_config(dataset_config)
+
+
 def test_argument_generator():
     conf = main.read_config(dataset_path)
     output = main.argument_generator(conf["size"], conf["arguments"])
     element = next(output)
     assert isinstance(element, dict)
     assert len(element) == 37
+
+
+def test_sample_seed():
+    assert main.sample_seed(1, 0) == main.sample_seed(1, 0)
+    assert main.sample_seed(1, 0) != main.sample_seed(1, 1)
+    assert main.sample_seed(1, 0) != main.sample_seed(2, 0)
+    assert main.sample_seed(1, 0) == main.sample_seed(1, 0, 0)
+    assert main.sample_seed(1, 0) != main.sample_seed(1, 0, 1)
+
+
+def test_generate_sample():
+    conf = main.read_config(dataset_path)
+    kwargs, annotations = main.generate_sample(3, 42, conf["arguments"])
+    assert len(kwargs) == 38
+    assert main.generate_sample(3, 42, conf["arguments"]) == (kwargs, annotations)
+    # The seed stored with the arguments reproduces the message
+    assert main.HelpGenerator(**kwargs).annotations == annotations
+    # Also when reusing a generator
+    generator = main.HelpGenerator(seed=0)
+    main.generate_sample(2, 42, conf["arguments"], generator=generator)
+    assert main.generate_sample(3, 42, conf["arguments"], generator=generator) == (
+        kwargs,
+        annotations,
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generate_samples(workers):
+    conf = main.read_config(dataset_path)
+    samples = list(main.generate_samples(dataset_path, 10, 42, workers, block_size=3))
+    assert len(samples) == 10
+    assert samples[3] == main.generate_sample(3, 42, conf["arguments"])
+
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generate_samples_dedup(workers):
+    conf = main.read_config(dataset_path)
+    deduplicator = main.Deduplicator(20)
+    # The sample 3 is seen before, it's generated again with the next attempt
+    deduplicator.insert(main.generate_sample(3, 42, conf["arguments"])[1]["message"])
+    samples = list(
+        main.generate_samples(
+            dataset_path, 10, 42, workers, block_size=3, deduplicator=deduplicator
+        )
+    )
+    assert len(samples) == 10
+    assert samples[2] == main.generate_sample(2, 42, conf["arguments"])
+    assert samples[3] == main.generate_sample(3, 42, conf["arguments"], attempt=1)
+    assert deduplicator.counts["checked"] == 11
+    assert deduplicator.counts["exact"] == 1
+    assert deduplicator.counts["regenerated"] == 1
+
+
+def test_generate_samples_dedup_kept():
+    conf = main.read_config(dataset_path)
+    deduplicator = main.Deduplicator(20)
+    # Every message is a duplicate
+    deduplicator.check = lambda message: "exact"
+    samples = list(
+        main.generate_samples(
+            dataset_path, 2, 42, deduplicator=deduplicator, max_attempts=3
+        )
+    )
+    assert samples[1] == main.generate_sample(1, 42, conf["arguments"], attempt=3)
+    assert deduplicator.counts["regenerated"] == 6
+    assert deduplicator.counts["kept"] == 2
+
+
+def test_generate_samples_validate(monkeypatch, tmp_path):
+    pytest.importorskip("numpy")
+    conf = main.read_config(dataset_path)
+    invalid = main.generate_sample(3, 42, conf["arguments"])[1]["message"]
+    validate_batch = main.validate_batch
+
+    def validate(samples, tokens):
+        # The first attempt of the sample 3 is invalid
+        problems = validate_batch(samples, tokens)
+        for sample, sample_problems in zip(samples, problems):
+            if sample["message"] == invalid:
+                sample_problems.append("text: CMD [0, 1)")
+        return problems
+
+    monkeypatch.setattr(main, "validate_batch", validate)
+    quarantine = main.Quarantine(tmp_path / "quarantine.jsonl")
+    samples = list(
+        main.generate_samples(dataset_path, 10, 42, 1, 3, quarantine=quarantine)
+    )
+    assert samples[3] == main.generate_sample(3, 42, conf["arguments"], attempt=1)
+    assert samples[4] == main.generate_sample(4, 42, conf["arguments"])
+    assert quarantine.report()["checked"] == 11
+    assert quarantine.counts["invalid"] == quarantine.counts["regenerated"] == 1
+    quarantine.close()
+    (line,) = srsly.read_jsonl(tmp_path / "quarantine.jsonl")
+    assert (line["index"], line["attempt"]) == (3, 0)
+    assert line["message"] == invalid
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generate_samples_stats(workers):
+    sampler = main.compile_config(main.load_config(dataset_path))
+    expected = main.DatasetStats.from_sampler(sampler)
+    generator = main.HelpGenerator()
+    for i in range(10):
+        sample = main.generate_sample(i, 42, sampler, generator=generator)
+        expected.add(*sample, generator.sections)
+    stats = main.DatasetStats.from_sampler(sampler)
+    samples = main.generate_samples(dataset_path, 10, 42, workers, 3, stats=stats)
+    assert len(list(samples)) == 10
+    assert stats.report() == expected.report()
+
+
+@pytest.mark.parametrize(
+    "start, align, expected",
+    [
+        (0, (), [(0, 4), (4, 8), (8, 10)]),
+        (0, (5,), [(0, 4), (4, 5), (5, 9), (9, 10)]),
+        (3, (5, 6), [(3, 5), (5, 6), (6, 10)]),
+    ],
+)
+def test_blocks(start, align, expected):
+    blocks = main._blocks(start, 10, 4, align)
+    assert [(block.start, block.stop) for block in blocks] == expected
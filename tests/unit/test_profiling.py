@@ -0,0 +1,55 @@
+"""Tests for cli_help_maker.profiling. """
+
+import srsly
+
+from cli_help_maker.profiling import NULL_PROFILER, Profiler
+
+
+def test_profiler(tmp_path):
+    profiler = Profiler()
+    for _ in range(3):
+        with profiler.stage("sample"):
+            with profiler.stage("arguments"):
+                pass
+            with profiler.stage("generator"):
+                with profiler.stage("programs"):
+                    pass
+    with profiler.stage("serialize"):
+        pass
+
+    report = profiler.report()
+    assert list(report["stages"]) == [
+        "sample",
+        "sample;arguments",
+        "sample;generator",
+        "sample;generator;programs",
+        "serialize",
+    ]
+    sample = report["stages"]["sample"]
+    assert sample["calls"] == 3
+    nested = sum(
+        report["stages"][k]["total_s"] for k in ("sample;arguments", "sample;generator")
+    )
+    assert abs(sample["self_s"] - (sample["total_s"] - nested)) < 1e-6
+
+    profiler.write(tmp_path, samples=3)
+    assert srsly.read_json(tmp_path / "profile.json")["samples"] == 3
+    lines = (tmp_path / "profile.collapsed").read_text().splitlines()
+    assert [line.rsplit(" ", 1)[0] for line in lines] == list(report["stages"])
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profiler_merge():
+    worker, profiler = Profiler(), Profiler()
+    with worker.stage("sample"):
+        pass
+    profiler.merge(worker.pop_stats())
+    profiler.merge({"sample": [10, 1]})
+    assert worker.report()["stages"] == {}
+    assert profiler.report()["stages"]["sample"]["calls"] == 2
+
+
+def test_null_profiler():
+    with NULL_PROFILER.stage("sample"):
+        pass
+    assert NULL_PROFILER.report()["stages"] == {}
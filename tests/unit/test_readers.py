@@ -0,0 +1,102 @@
+"""Tests for cli_help_maker.readers. """
+
+import pickle
+
+import pytest
+import srsly
+
+from cli_help_maker import readers, writers
+
+
+def sample(i):
+    return {"indent_spaces": i}, {"message": f"msg {i}", "annotations": []}
+
+
+def write_dataset(path, size, **kwargs):
+    with writers.DatasetWriter(path, size, **kwargs) as writer:
+        for i in range(size):
+            writer.write(*sample(i))
+    srsly.write_json(path / "manifest.json", writer.manifest())
+
+
+@pytest.mark.parametrize(
+    "content, lines",
+    [
+        (b"", []),
+        (b"{}\n", [b"{}\n"]),
+        (b'{"a": 1}\n{}\n[1, 2]\n', [b'{"a": 1}\n', b"{}\n", b"[1, 2]\n"]),
+        (b"{}\n[]", [b"{}\n", b"[]"]),
+    ],
+)
+def test_jsonl_file(tmp_path, content, lines):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(content)
+    jsonl = readers.JsonlFile(path)
+    assert len(jsonl) == len(lines)
+    assert [jsonl.line(i) for i in range(len(lines))] == lines
+    jsonl.close()
+    # The index is written next to the file, and used afterwards.
+    assert writers.index_path(path).is_file()
+    jsonl = readers.JsonlFile(path)
+    assert [jsonl.line(i) for i in range(len(lines))] == lines
+    jsonl.close()
+
+
+def test_jsonl_file_outdated_index(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(b"{}\n")
+    readers.JsonlFile(path).close()
+    path.write_bytes(b"{}\n[]\n")
+    jsonl = readers.JsonlFile(path)
+    assert [jsonl.line(0), jsonl.line(1)] == [b"{}\n", b"[]\n"]
+    jsonl.close()
+
+
+def test_jsonl_file_compressed(tmp_path):
+    with pytest.raises(ValueError):
+        readers.JsonlFile(tmp_path / "data.jsonl.gz")
+
+
+@pytest.mark.parametrize("shard_size, index", [(0, False), (3, True), (4, False)])
+def test_dataset(tmp_path, shard_size, index):
+    write_dataset(tmp_path, 10, shard_size=shard_size, index=index)
+    with readers.Dataset(tmp_path) as dataset:
+        assert len(dataset) == 10
+        assert dataset[4] == sample(4)[1]
+        assert dataset[-1] == sample(9)[1]
+        assert dataset.arguments[4] == sample(4)[0]
+        assert dataset[2:9:3] == [sample(i)[1] for i in (2, 5, 8)]
+        assert list(dataset) == [sample(i)[1] for i in range(10)]
+        with pytest.raises(IndexError):
+            dataset[10]
+
+    dataset = readers.Dataset(str(tmp_path), with_arguments=True)
+    assert dataset[7] == sample(7)[::-1]
+    assert pickle.loads(pickle.dumps(dataset))[7] == sample(7)[::-1]
+    dataset.close()
+
+
+def test_dataset_without_manifest(tmp_path):
+    write_dataset(tmp_path, 5, shard_size=2)
+    (tmp_path / "manifest.json").unlink()
+    with readers.Dataset(tmp_path) as dataset:
+        assert dataset[:] == [sample(i)[1] for i in range(5)]
+    (tmp_path / "dataset-00001-of-00003.jsonl").unlink()
+    with pytest.raises(FileNotFoundError):
+        readers.Dataset(tmp_path)
+
+
+def test_dataset_errored(tmp_path):
+    write_dataset(tmp_path, 5, compression="gzip")
+    with pytest.raises(ValueError):
+        readers.Dataset(tmp_path)
+
+
+def test_iter_messages(tmp_path):
+    write_dataset(tmp_path, 5, shard_size=2)
+    manifest = srsly.read_json(tmp_path / "manifest.json")
+    messages = list(readers.iter_messages(str(tmp_path), manifest))
+    assert messages == [sample(i)[1]["message"] for i in range(5)]
+    (tmp_path / "manifest.json").unlink()
+    paths = readers.stream_paths(str(tmp_path), "arguments")
+    assert [p.name for p in paths] == writers.shard_names("arguments", 3)
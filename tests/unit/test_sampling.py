@@ -0,0 +1,130 @@
+"""Tests for cli_help_maker.sampling. """
+
+import pickle
+import random
+
+import pytest
+
+from cli_help_maker import utils
+from cli_help_maker.sampling import (
+    ArgumentSampler,
+    ConstantSampler,
+    DiscreteSampler,
+    SetSampler,
+    UniformContinuousSampler,
+    UniformDiscreteSampler,
+)
+
+
+@pytest.mark.parametrize(
+    "population, weights, cum_weights",
+    [
+        (range(1, 7), [10.0, 25.0, 30.0, 20.0, 10.0, 5.0], None),
+        (range(1, 5), None, [0.6, 0.95, 0.99, 1]),
+        (utils.LETTERS, utils.LETTER_FREQUENCIES, None),
+        (["a", "b", "c"], None, None),
+    ],
+)
+def test_sampler_matches_choices(population, weights, cum_weights):
+    sampler = DiscreteSampler(population, weights=weights, cum_weights=cum_weights)
+    assert len(sampler) == len(population)
+    rng, expected = random.Random(42), random.Random(42)
+    for _ in range(200):
+        assert (
+            sampler.sample(rng)
+            == expected.choices(population, weights=weights, cum_weights=cum_weights)[0]
+        )
+    assert sampler.sample_k(50, rng=rng) == expected.choices(
+        population, weights=weights, cum_weights=cum_weights, k=50
+    )
+
+
+def test_sampler_global_random():
+    sampler = DiscreteSampler(range(1, 5), cum_weights=[0.6, 0.95, 0.99, 1])
+    random.seed(1)
+    first = [sampler.sample() for _ in range(10)]
+    random.seed(1)
+    assert first == [sampler.sample() for _ in range(10)]
+
+
+@pytest.mark.parametrize(
+    "kwargs, error",
+    [
+        ({"weights": [1, 2], "cum_weights": [1, 3]}, TypeError),
+        ({"weights": [1]}, ValueError),
+        ({"weights": [0, 0]}, ValueError),
+    ],
+)
+def test_sampler_errored(kwargs, error):
+    with pytest.raises(error):
+        DiscreteSampler(["a", "b"], **kwargs)
+
+
+def test_sample_array():
+    np = pytest.importorskip("numpy")
+    sampler = DiscreteSampler(range(1, 5), cum_weights=[0.6, 0.95, 0.99, 1])
+    values = sampler.sample_array(10000, np.random.default_rng(1))
+    assert values.shape == (10000,)
+    assert set(values.tolist()) <= {1, 2, 3, 4}
+    assert abs((values == 1).mean() - 0.6) < 0.05
+
+
+@pytest.mark.parametrize(
+    "sampler, draw",
+    [
+        (ConstantSampler(3), lambda rng: 3),
+        (SetSampler([2, 4, 8]), lambda rng: rng.choice([2, 4, 8])),
+        (UniformDiscreteSampler(1, 6), lambda rng: rng.randint(1, 6)),
+        (UniformContinuousSampler(2, 5), lambda rng: 2 + (5 - 2) * rng.random()),
+    ],
+)
+def test_samplers_match_random(sampler, draw):
+    rng, expected = random.Random(7), random.Random(7)
+    assert [sampler.sample(rng) for _ in range(100)] == [
+        draw(expected) for _ in range(100)
+    ]
+
+
+def arguments_sampler():
+    return ArgumentSampler(
+        {
+            "width": SetSampler([70, 80]),
+            "prob": UniformContinuousSampler(0, 1),
+            "header": ConstantSampler(1),
+            "style": DiscreteSampler(["a", "b"], weights=[0.9, 0.1]),
+            "number": UniformDiscreteSampler(0, 3),
+        }
+    )
+
+
+def test_argument_sampler():
+    sampler = arguments_sampler()
+    assert len(sampler) == 5
+    arguments = sampler.sample(random.Random(1))
+    assert list(arguments) == ["width", "prob", "header", "style", "number"]
+    rng = random.Random(1)
+    assert arguments == {
+        "width": rng.choice([70, 80]),
+        "prob": rng.random(),
+        "header": 1,
+        "style": rng.choices(["a", "b"], weights=[0.9, 0.1])[0],
+        "number": rng.randint(0, 3),
+    }
+    unpickled = pickle.loads(pickle.dumps(sampler))
+    assert unpickled.sample(random.Random(1)) == arguments
+
+
+def test_argument_sampler_block():
+    np = pytest.importorskip("numpy")
+    sampler = arguments_sampler()
+    block = sampler.sample_block(1000, np.random.default_rng(1))
+    assert all(len(column) == 1000 for column in block.values())
+    assert set(block["width"].tolist()) == {70, 80}
+    assert ((block["prob"] >= 0) & (block["prob"] < 1)).all()
+    assert (block["header"] == 1).all()
+    assert set(block["number"].tolist()) == {0, 1, 2, 3}
+
+    rows = sampler.sample_rows(10, np.random.default_rng(1))
+    assert len(rows) == 10
+    assert rows == sampler.sample_rows(10, np.random.default_rng(1))
+    assert all(type(row["width"]) is int and type(row["style"]) is str for row in rows)
@@ -0,0 +1,174 @@
+"""Tests for cli_help_maker.stats. """
+
+import pathlib
+
+import pytest
+import srsly
+
+from cli_help_maker import main
+from cli_help_maker.generator import HelpGenerator
+from cli_help_maker.stats import (
+    ARGUMENT_BINS,
+    MAX_VALUES,
+    DatasetStats,
+    wrapped_lines,
+)
+
+root = pathlib.Path(__file__).resolve().parent.parent.parent
+dataset_path = root / "tests" / "data" / "dataset.yaml"
+
+
+@pytest.fixture(scope="module")
+def sampler():
+    return main.compile_config(main.load_config(dataset_path))
+
+
+@pytest.fixture(scope="module")
+def samples(sampler):
+    generator = HelpGenerator()
+    samples = []
+    for i in range(20):
+        kwargs, annotations = main.generate_sample(i, 42, sampler, generator=generator)
+        samples.append((kwargs, annotations, generator.sections))
+    return samples
+
+
+@pytest.mark.parametrize(
+    "message, width, expected",
+    [
+        ("usage: prog [-h]", 20, 0),
+        ("usage: prog [-h]\n       [--version]", 20, 1),
+        ("usage: prog [-h]\n       [--version]", 40, 0),
+        ("Options:\n\n  -h  Show this help message and exit.", 10, 0),
+    ],
+)
+def test_wrapped_lines(message, width, expected):
+    assert wrapped_lines(message, width) == expected
+
+
+def test_dataset_stats(samples, sampler):
+    stats = DatasetStats.from_sampler(sampler)
+    assert stats.ranges["prob_name_capitalized"] == (0, 1)
+    for sample in samples:
+        stats.add(*sample)
+    report = stats.report()
+    assert report["samples"] == 20
+    assert sum(report["labels"].values()) == sum(
+        len(annotations["annotations"]) for _, annotations, _ in samples
+    )
+    chars = report["histograms"]["chars"]
+    assert sum(chars["counts"]) == 20
+    assert chars["mean"] == sum(len(a["message"]) for _, a, _ in samples) / 20
+    assert 0 < report["sections"]["commands"] < 1
+    assert sum(report["arguments"]["total_width"]["values"].values()) == 20
+    bins = report["arguments"]["prob_name_capitalized"]
+    assert len(bins["bins"]) == ARGUMENT_BINS + 1
+    assert sum(bins["counts"]) == 20
+    assert "seed" not in report["arguments"]
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        # The flags of the sections without anything to write
+        (
+            {
+                "description_before": True,
+                "program_description_prob": 0,
+                "commands_section": True,
+                "number_of_commands": 0,
+            },
+            {"description": 0, "commands": 0, "arguments": 0, "options": 0},
+        ),
+        (
+            {
+                "description_before": True,
+                "program_description_prob": 1,
+                "options_section": True,
+                "options_header": True,
+                "number_of_options": 3,
+            },
+            {"description": 1, "commands": 0, "arguments": 0, "options": 1},
+        ),
+    ],
+)
+def test_dataset_stats_sections(kwargs, expected):
+    stats = DatasetStats()
+    generator = HelpGenerator(seed=1, **kwargs)
+    for _ in range(10):
+        annotations = generator.annotations
+        stats.add(kwargs, annotations, generator.sections)
+        # The options header and the description (before it) are in the message
+        message = annotations["message"].lower()
+        assert ("options:" in message) == bool(expected["options"])
+        assert message.startswith("usage:") != bool(expected["description"])
+    assert stats.report()["sections"] == expected
+
+
+def test_dataset_stats_merge(samples, sampler):
+    expected = DatasetStats.from_sampler(sampler)
+    for sample in samples:
+        expected.add(*sample)
+
+    worker = DatasetStats.from_sampler(sampler)
+    stats = DatasetStats()
+    for i in range(0, 20, 6):
+        for sample in samples[i : i + 6]:
+            worker.add(*sample)
+        stats.merge(worker.pop())
+        assert worker.samples == 0
+    assert stats.report() == expected.report()
+
+    # A sample removed, i.e. a duplicate replaced
+    stats.add(*samples[3], weight=-1)
+    stats.add(*samples[3])
+    assert stats.report() == expected.report()
+
+
+def test_dataset_stats_to_dict(samples, sampler):
+    stats = DatasetStats.from_sampler(sampler)
+    for sample in samples:
+        stats.add(*sample)
+    # Stored in a checkpoint without loss, as a snapshot
+    data = srsly.json_loads(srsly.json_dumps(stats.to_dict()))
+    snapshot = stats.to_dict()
+    stats.add(*samples[1])
+    assert sum(snapshot["histograms"]["chars"]) == snapshot["samples"] == 20
+    stats.add(*samples[1], weight=-1)
+    restored = DatasetStats.from_dict(data)
+    assert restored.report() == stats.report()
+    restored.add(*samples[0])
+    stats.add(*samples[0])
+    assert restored.report() == stats.report()
+
+
+def test_dataset_stats_max_values():
+    stats = DatasetStats()
+    annotations = {"message": "usage: prog", "annotations": [["CMD", 7, 11]]}
+    for i in range(MAX_VALUES + 5):
+        kwargs = {"number_of_options": i, "option_set_size": [1, 3]}
+        stats.add(kwargs, annotations, [])
+    arguments = stats.report()["arguments"]
+    assert len(arguments["number_of_options"]["values"]) == MAX_VALUES
+    assert arguments["number_of_options"]["other"] == 5
+    assert arguments["option_set_size"]["values"] == {"[1,3]": MAX_VALUES + 5}
+
+
+def test_dataset_stats_max_values_merge():
+    annotations = {"message": "usage: prog", "annotations": []}
+    first, second = DatasetStats(), DatasetStats()
+    for i in range(MAX_VALUES + 5):
+        first.add({"number_of_options": i}, annotations, [])
+    for i in range(5):
+        second.add({"number_of_options": MAX_VALUES + i}, annotations, [], weight=3)
+    # The values reported don't depend on the order of the merges
+    merged = DatasetStats()
+    merged.merge(first)
+    merged.merge(second)
+    reversed_merge = DatasetStats()
+    reversed_merge.merge(second)
+    reversed_merge.merge(first)
+    assert merged.report() == reversed_merge.report()
+    arguments = merged.report()["arguments"]["number_of_options"]
+    assert arguments["values"][str(MAX_VALUES)] == 4
+    assert arguments["other"] == 5
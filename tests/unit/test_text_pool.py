@@ -0,0 +1,50 @@
+"""Tests for cli_help_maker.text_pool. """
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from cli_help_maker import utils
+from cli_help_maker.sampling import DiscreteSampler
+from cli_help_maker.text_pool import TextPool
+
+
+@pytest.mark.parametrize("use_statistics", [True, False])
+def test_text_pool(use_statistics):
+    pool = TextPool(use_statistics=use_statistics, batch_size=16, seed=1)
+    sentences = [pool.sentence() for _ in range(40)]
+    assert all(len(s) > 0 and s[0] == s[0].upper() for s in sentences)
+    # The batches are refilled transparently
+    assert len(pool._sentences) == 3 * 16 - 40
+    paragraph = pool.paragraph()
+    assert paragraph.endswith(".")
+
+
+def test_text_pool_statistics():
+    pool = TextPool(use_statistics=True, between_commas_prob=0, seed=1)
+    words = " ".join(pool.sentence() for _ in range(100)).lower().split(" ")
+    assert set("".join(words)) <= set(utils.LETTERS)
+    assert max(len(w) for w in words) <= len(utils.WORD_LENGTH_PROBABILITIES)
+
+
+def test_text_pool_samplers(monkeypatch):
+    # The pool draws from the distributions of utils
+    monkeypatch.setattr(utils, "WORD_LENGTH_SAMPLER", DiscreteSampler([3]))
+    monkeypatch.setattr(utils, "SENTENCE_LENGTH_SAMPLER", DiscreteSampler([4]))
+    pool = TextPool(use_statistics=True, between_commas_prob=0, seed=1)
+    words = pool.sentence().split(" ")
+    assert len(words) == 4
+    assert all(len(word) == 3 for word in words)
+
+
+def test_text_pool_between_commas():
+    pool = TextPool(use_statistics=True, between_commas_prob=1, seed=1)
+    for word in pool.sentence().split(" "):
+        assert word[0] in "'\"" and word[-1] == word[0]
+
+
+def test_text_pool_seed():
+    first, second = TextPool(seed=3), TextPool(seed=3)
+    assert [first.paragraph() for _ in range(5)] == [
+        second.paragraph() for _ in range(5)
+    ]
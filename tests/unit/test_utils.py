@@ -392,3 +392,19 @@ def test_make_list(e, n, expected):
 )
 def test_make_set(e, expected):
     assert ut.make_set(e) == expected
+
+
+def test_rng():
+    # Functions given the same generator state return the same content,
+    # independently of the global random state.
+    rng = random.Random(FIXED_SEED)
+    random.seed(0)
+    first = ut.make_option(set_size=2, rng=rng), ut.make_paragraph(rng=rng)
+    rng = random.Random(FIXED_SEED)
+    random.seed(1)
+    assert (ut.make_option(set_size=2, rng=rng), ut.make_paragraph(rng=rng)) == first
+    # The global random state isn't used
+    state = random.getstate()
+    ut.make_option(set_size=2, rng=rng)
+    ut.make_paragraph(rng=rng)
+    assert random.getstate() == state
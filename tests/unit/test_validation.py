@@ -0,0 +1,123 @@
+"""Tests for cli_help_maker.validation. """
+
+import pathlib
+
+import pytest
+import srsly
+
+from cli_help_maker import main
+from cli_help_maker.generator import HelpGenerator
+from cli_help_maker.validation import COUNTS, Quarantine, validate_batch
+
+pytest.importorskip("numpy")
+
+root = pathlib.Path(__file__).resolve().parent.parent.parent
+dataset_path = root / "tests" / "data" / "dataset.yaml"
+
+
+@pytest.fixture(scope="module")
+def batch():
+    sampler = main.compile_config(main.load_config(dataset_path))
+    generator = HelpGenerator()
+    samples, tokens = [], []
+    for i in range(20):
+        samples.append(main.generate_sample(i, 42, sampler, generator=generator)[1])
+        tokens.append(generator.tokens)
+    return samples, tokens
+
+
+def test_tokens(batch):
+    for annotations, tokens in zip(*batch):
+        assert len(tokens) == len(annotations["annotations"])
+        # The wrapping may break an element (i.e. on a hyphen)
+        for (_, start, end), token in zip(annotations["annotations"], tokens):
+            text = annotations["message"][start:end]
+            assert "".join(text.split()) == "".join(token.split())
+
+
+def test_validate_batch(batch):
+    samples, tokens = batch
+    assert validate_batch(samples, tokens) == [[]] * 20
+    assert validate_batch(samples) == [[]] * 20
+    assert validate_batch([{"message": "", "annotations": []}]) == [[]]
+
+
+@pytest.mark.parametrize(
+    "annotations, expected",
+    [
+        ([("CMD", 7, 11), ("OPT", 13, 15)], []),
+        ([("CMD", 7, 11), ("OPT", 13, 25)], ["bounds: OPT [13, 25)"]),
+        ([("CMD", 7, 11), ("OPT", 13, 13)], ["bounds: OPT [13, 13)"]),
+        (
+            [("CMD", 7, 14), ("OPT", 13, 15)],
+            [
+                "overlap: CMD [7, 14)",
+                "overlap: OPT [13, 15)",
+                "text: CMD [7, 14)",
+            ],
+        ),
+        ([("CMD", 6, 11), ("OPT", 13, 15)], ["whitespace: CMD [6, 11)"]),
+        ([("CMD", 7, 11), ("OPT", 12, 14)], ["text: OPT [12, 14)"]),
+    ],
+)
+def test_validate_batch_problems(annotations, expected):
+    valid = {"message": "usage: prog [-h]", "annotations": [("CMD", 7, 11)]}
+    sample = {"message": "usage: prog [-h]", "annotations": annotations}
+    tokens = [["prog"], ["prog", "-h"]]
+    assert validate_batch([valid, sample], tokens) == [[], expected]
+
+
+def test_validate_batch_overlap_nested():
+    # A long span overlapping with a span that isn't the next one
+    sample = {
+        "message": "usage: prog [-a] [-b]",
+        "annotations": [("CMD", 7, 21), ("OPT", 13, 15), ("OPT", 18, 20)],
+    }
+    problems = validate_batch([sample])[0]
+    assert problems == [
+        "overlap: CMD [7, 21)",
+        "overlap: OPT [13, 15)",
+        "overlap: OPT [18, 20)",
+    ]
+
+
+def test_validate_batch_tokens_count():
+    sample = {"message": "usage: prog [-h]", "annotations": [("CMD", 7, 11)]}
+    problems = validate_batch([sample], [["prog", "-h"]])
+    assert problems == [["tokens: 2 tokens for 1 spans"]]
+
+
+def test_quarantine(tmp_path):
+    path = tmp_path / "quarantine.jsonl"
+    sample = (
+        {"seed": 1},
+        {"message": "usage: prog", "annotations": [("CMD", 7, 12)]},
+    )
+    quarantine = Quarantine(path)
+    assert not quarantine.check(0, 0, sample, [])
+    assert not path.exists()
+    assert quarantine.check(1, 0, sample, ["bounds: CMD [7, 12)"])
+    report = quarantine.report()
+    assert report == {
+        "checked": 2,
+        "invalid": 1,
+        "regenerated": 0,
+        "kept": 0,
+        "bytes": path.stat().st_size,
+    }
+    quarantine.check(1, 1, sample, ["bounds: CMD [7, 12)"])
+    quarantine.close()
+    lines = list(srsly.read_jsonl(path))
+    assert [(line["index"], line["attempt"]) for line in lines] == [(1, 0), (1, 1)]
+    assert lines[0]["problems"] == ["bounds: CMD [7, 12)"]
+    assert lines[0]["arguments"] == {"seed": 1}
+
+    # Continued from the report, the samples after it are removed
+    restored = Quarantine(path, report["bytes"])
+    restored.restore(report)
+    assert len(list(srsly.read_jsonl(path))) == 1
+    assert {key: restored.report()[key] for key in COUNTS} == {
+        key: report[key] for key in COUNTS
+    }
+    Quarantine(path)
+    assert not path.exists()
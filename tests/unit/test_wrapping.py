@@ -0,0 +1,111 @@
+"""Tests for cli_help_maker.wrapping. """
+
+import textwrap
+
+import pytest
+
+from cli_help_maker import wrapping
+
+program = (
+    "prog command [-o <output-file>] [--verbose] [--some-really-long-option-name] "
+    "<input-argument> [<other-argument>...]"
+)
+
+
+@pytest.mark.parametrize(
+    "text, width, initial_indent, subsequent_indent",
+    [
+        ("", 20, "", ""),
+        ("short", 20, "", ""),
+        (program, 200, "", ""),
+        (program, 40, "", "      "),
+        (program, 30, "  ", "    "),
+        (program, 12, "", "  "),
+    ],
+)
+def test_fill_with_offsets(text, width, initial_indent, subsequent_indent):
+    wrapped = wrapping.fill_with_offsets(
+        text,
+        width=width,
+        initial_indent=initial_indent,
+        subsequent_indent=subsequent_indent,
+    )
+    assert wrapped.text == textwrap.fill(
+        text,
+        width=width,
+        initial_indent=initial_indent,
+        subsequent_indent=subsequent_indent,
+    )
+    # Every character that isn't whitespace is found in the new position
+    for pos, char in enumerate(text):
+        if not char.isspace():
+            assert wrapped.text[wrapped.position(pos)] == char
+
+
+@pytest.mark.parametrize(
+    "element, width",
+    [
+        ("[--verbose]", 40),
+        ("<input-argument>", 40),
+        ("[--some-really-long-option-name]", 40),
+        ("[--some-really-long-option-name]", 55),
+        ("[<other-argument>...]", 100),
+    ],
+)
+def test_wrapped_text_span(element, width):
+    start = program.index(element)
+    wrapped = wrapping.fill_with_offsets(program, width=width, subsequent_indent="  ")
+    new_start, new_end = wrapped.span(start, start + len(element))
+    text = wrapped.text[new_start:new_end]
+    assert text == text.strip()
+    assert "".join(text.split()) == element.replace(" ", "")
+
+
+def test_get_wrapper():
+    wrapper = wrapping.get_wrapper(30, "  ", "    ")
+    assert wrapper is wrapping.get_wrapper(30, "  ", "    ")
+    assert wrapper is not wrapping.get_wrapper(30, "", "    ")
+    assert wrapper.fill(program) == textwrap.fill(
+        program, width=30, initial_indent="  ", subsequent_indent="    "
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "short",
+        program,
+        "a well-known option --use-the-force-luke with ---many--dashes- in it",
+        "words with a verylongwordthatdoesntfitinanyline in the middle",
+        "  leading spaces and  double spaces ",
+        "tabs\tand\nnew lines",
+    ],
+)
+@pytest.mark.parametrize(
+    "width, initial_indent, subsequent_indent",
+    [
+        (70, "", ""),
+        (20, "", "   "),
+        (15, "    ", ""),
+        (9, " ", "  "),
+        (30, "  ", "    "),
+    ],
+)
+def test_wrap(text, width, initial_indent, subsequent_indent):
+    expected = textwrap.wrap(
+        text,
+        width=width,
+        initial_indent=initial_indent,
+        subsequent_indent=subsequent_indent,
+    )
+    assert wrapping.wrap(text, width, initial_indent, subsequent_indent) == expected
+    assert wrapping.fill(text, width, initial_indent, subsequent_indent) == "\n".join(
+        expected
+    )
+    if text == " ".join(text.split()):
+        spans = wrapping.line_spans(text, width, initial_indent, subsequent_indent)
+        assert [
+            (subsequent_indent if i else initial_indent) + text[start:end]
+            for i, (start, end) in enumerate(spans)
+        ] == expected
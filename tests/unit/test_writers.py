@@ -0,0 +1,328 @@
+"""Tests for cli_help_maker.writers. """
+
+import pytest
+import srsly
+
+from cli_help_maker import compression as compression_module
+from cli_help_maker import writers
+from cli_help_maker.sampling import (
+    ArgumentSampler,
+    DiscreteSampler,
+    SetSampler,
+    UniformContinuousSampler,
+    UniformDiscreteSampler,
+)
+
+
+@pytest.mark.parametrize(
+    "name, num_shards, expected",
+    [
+        ("dataset", 1, ["dataset.jsonl"]),
+        (
+            "arguments",
+            2,
+            ["arguments-00000-of-00002.jsonl", "arguments-00001-of-00002.jsonl"],
+        ),
+    ],
+)
+def test_shard_names(name, num_shards, expected):
+    assert writers.shard_names(name, num_shards) == expected
+
+
+def sample(i):
+    return {"indent_spaces": i}, {"message": f"msg {i}", "annotations": []}
+
+
+@pytest.mark.parametrize(
+    "size, shard_size, lines",
+    [(0, 0, [0]), (5, 0, [5]), (5, 2, [2, 2, 1]), (4, 2, [2, 2])],
+)
+def test_dataset_writer(tmp_path, size, shard_size, lines):
+    with writers.DatasetWriter(tmp_path, size, shard_size=shard_size) as writer:
+        for i in range(size):
+            writer.write(*sample(i))
+
+    manifest = writer.manifest()
+    assert manifest["size"] == size
+    assert manifest["num_shards"] == len(lines)
+    for shard, expected in zip(manifest["shards"], lines):
+        for info in shard.values():
+            assert info["lines"] == expected
+            assert (tmp_path / info["path"]).stat().st_size == info["bytes"]
+
+    # The streams are aligned line by line
+    last = manifest["shards"][-1]
+    if size > 0:
+        data = list(srsly.read_jsonl(tmp_path / last["dataset"]["path"]))
+        args = list(srsly.read_jsonl(tmp_path / last["arguments"]["path"]))
+        assert data[-1]["message"] == f"msg {args[-1]['indent_spaces']}"
+
+
+def test_verify_manifest(tmp_path):
+    with writers.DatasetWriter(tmp_path, 4, shard_size=2) as writer:
+        for i in range(4):
+            writer.write(*sample(i))
+    srsly.write_json(tmp_path / "manifest.json", writer.manifest())
+    assert writers.verify_manifest(tmp_path, checksums=True) == []
+
+    shard = tmp_path / "dataset-00001-of-00002.jsonl"
+    shard.write_bytes(shard.read_bytes().replace(b"msg", b"MSG"))
+    assert writers.verify_manifest(tmp_path) == []
+    assert writers.verify_manifest(tmp_path, checksums=True) == [
+        "Checksum mismatch: dataset-00001-of-00002.jsonl"
+    ]
+    shard.unlink()
+    assert writers.verify_manifest(tmp_path) == [
+        "Missing file: dataset-00001-of-00002.jsonl"
+    ]
+
+
+def test_dataset_writer_resume(tmp_path):
+    complete, resumed = tmp_path / "complete", tmp_path / "resumed"
+    complete.mkdir()
+    resumed.mkdir()
+    with writers.DatasetWriter(complete, 5, shard_size=2) as writer:
+        for i in range(5):
+            writer.write(*sample(i))
+    expected = writer.manifest()
+
+    writer = writers.DatasetWriter(resumed, 5, shard_size=2)
+    for i in range(3):
+        writer.write(*sample(i))
+    writer.checkpoint(resumed / "checkpoint.json", seed=1)
+    # Written after the checkpoint, must be discarded.
+    writer.write(*sample(3))
+    writer.close()
+
+    checkpoint = srsly.read_json(resumed / "checkpoint.json")
+    assert checkpoint["seed"] == 1
+    with writers.DatasetWriter(
+        resumed, 5, shard_size=2, state=checkpoint["writer"]
+    ) as writer:
+        for i in range(3, 5):
+            writer.write(*sample(i))
+
+    assert writer.manifest() == expected
+    for path in complete.iterdir():
+        assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+
+def test_dataset_writer_index(tmp_path):
+    writer = writers.DatasetWriter(tmp_path, 5, index=True)
+    for i in range(3):
+        writer.write(*sample(i))
+    writer.checkpoint(tmp_path / "checkpoint.json")
+    writer.write(*sample(3))
+    writer.close()
+
+    state = srsly.read_json(tmp_path / "checkpoint.json")["writer"]
+    assert state["index"]
+    with writers.DatasetWriter(tmp_path, 5, state=state, index=True) as writer:
+        for i in range(3, 5):
+            writer.write(*sample(i))
+
+    for stream in ("dataset", "arguments"):
+        path = tmp_path / f"{stream}.jsonl"
+        lines = path.read_bytes().splitlines(keepends=True)
+        ends = [sum(map(len, lines[: i + 1])) for i in range(5)]
+        assert writers.index_path(path).read_bytes() == b"".join(
+            writers.INDEX_OFFSET.pack(end) for end in ends
+        )
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"compression": "gzip"}, {"output_format": "parquet"}]
+)
+def test_dataset_writer_index_errored(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        writers.DatasetWriter(tmp_path, 5, index=True, **kwargs)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_dataset_writer_compressed_resume(tmp_path, compression):
+    complete, resumed = tmp_path / "complete", tmp_path / "resumed"
+    complete.mkdir()
+    resumed.mkdir()
+    options = {"shard_size": 3, "compression": compression, "frame_size": 64}
+    with writers.DatasetWriter(complete, 5, **options) as writer:
+        for i in range(5):
+            writer.write(*sample(i))
+            # The frames end on the checkpoints, both runs must checkpoint
+            # at the same samples.
+            if i == 3:
+                writer.checkpoint(complete / "checkpoint.json", seed=1)
+    expected = writer.manifest()
+    assert expected["compression"] == compression
+    suffix = compression_module.Compression(compression).suffix
+    assert expected["shards"][0]["dataset"]["path"] == (
+        "dataset-00000-of-00002.jsonl" + suffix
+    )
+    rows = list(
+        compression_module.read_jsonl(
+            complete / ("dataset-00000-of-00002.jsonl" + suffix)
+        )
+    )
+    assert [row["message"] for row in rows] == ["msg 0", "msg 1", "msg 2"]
+
+    writer = writers.DatasetWriter(resumed, 5, **options)
+    for i in range(4):
+        writer.write(*sample(i))
+    writer.checkpoint(resumed / "checkpoint.json", seed=1)
+    writer.write(*sample(4))
+    writer.close()
+
+    checkpoint = srsly.read_json(resumed / "checkpoint.json")
+    with writers.DatasetWriter(
+        resumed, 5, state=checkpoint["writer"], **options
+    ) as writer:
+        writer.write(*sample(4))
+
+    assert writer.manifest() == expected
+    for path in complete.iterdir():
+        assert path.read_bytes() == (resumed / path.name).read_bytes()
+
+
+def test_dataset_writer_compressed_columnar(tmp_path):
+    with pytest.raises(ValueError):
+        writers.DatasetWriter(tmp_path, 5, output_format="parquet", compression="zstd")
+
+
+def test_dataset_writer_columnar_sampler(tmp_path):
+    with pytest.raises(ValueError, match="sampler"):
+        writers.DatasetWriter(tmp_path, 5, output_format="parquet")
+
+
+sampler = ArgumentSampler(
+    {
+        "indent_spaces": UniformDiscreteSampler(0, 10),
+        "arguments_style": SetSampler(["caps", "between"]),
+    }
+)
+
+
+def test_arrow_schema():
+    pa = pytest.importorskip("pyarrow")
+    schema = writers.arrow_schema(
+        ArgumentSampler(
+            {
+                "indent_spaces": UniformDiscreteSampler(2, 4),
+                "arguments_style": SetSampler(["caps", "between"]),
+                "description_prob": UniformContinuousSampler(0, 1),
+                "custom": DiscreteSampler([1, 1.5], weights=[0.9, 0.1]),
+            }
+        )
+    )
+    assert schema.names == [
+        "message",
+        "annotations",
+        "indent_spaces",
+        "arguments_style",
+        "description_prob",
+        "custom",
+        "seed",
+    ]
+    assert schema.field("indent_spaces").type == pa.int64()
+    assert schema.field("arguments_style").type == pa.string()
+    assert schema.field("description_prob").type == pa.float64()
+    # Typed after all the values, not only those drawn first.
+    assert schema.field("custom").type == pa.float64()
+    assert schema.field("seed").type == pa.uint64()
+
+
+def columnar_sample(i):
+    kwargs = {"indent_spaces": i, "arguments_style": "caps", "seed": 2**64 - 1 - i}
+    annotations = {"message": f"msg {i}", "annotations": [("CMD", 0, 3), ("ARG", 4, 5)]}
+    return kwargs, annotations
+
+
+def read_table(path):
+    pa = pytest.importorskip("pyarrow")
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+@pytest.mark.parametrize("size, shard_size, lines", [(0, 0, [0]), (5, 2, [2, 2, 1])])
+def test_dataset_writer_columnar(tmp_path, output_format, size, shard_size, lines):
+    pytest.importorskip("pyarrow")
+    with writers.DatasetWriter(
+        tmp_path,
+        size,
+        shard_size=shard_size,
+        output_format=output_format,
+        row_group_size=1,
+        sampler=sampler,
+    ) as writer:
+        for i in range(size):
+            writer.write(*columnar_sample(i))
+
+    manifest = writer.manifest()
+    assert manifest["format"] == output_format
+    assert [list(shard) for shard in manifest["shards"]] == [["dataset"]] * len(lines)
+    srsly.write_json(tmp_path / "manifest.json", manifest)
+    assert writers.verify_manifest(tmp_path, checksums=True) == []
+
+    rows = []
+    for shard, expected in zip(manifest["shards"], lines):
+        path = tmp_path / shard["dataset"]["path"]
+        assert path.suffix == "." + output_format
+        table = read_table(path)
+        assert table.num_rows == shard["dataset"]["lines"] == expected
+        assert table.schema.equals(writers.arrow_schema(sampler))
+        rows.extend(table.to_pylist())
+
+    for i, row in enumerate(rows):
+        kwargs, annotations = columnar_sample(i)
+        assert row["message"] == annotations["message"]
+        assert row["annotations"] == [
+            {"label": label, "start": start, "end": end}
+            for label, start, end in annotations["annotations"]
+        ]
+        assert {k: row[k] for k in kwargs} == kwargs
+
+
+def test_dataset_writer_columnar_resume(tmp_path):
+    pytest.importorskip("pyarrow")
+    complete, resumed = tmp_path / "complete", tmp_path / "resumed"
+    complete.mkdir()
+    resumed.mkdir()
+    options = {"shard_size": 2, "output_format": "parquet", "sampler": sampler}
+    with writers.DatasetWriter(complete, 5, **options) as writer:
+        for i in range(5):
+            writer.write(*columnar_sample(i))
+    expected = writer.manifest()
+
+    writer = writers.DatasetWriter(resumed, 5, **options)
+    for i in range(3):
+        writer.write(*columnar_sample(i))
+    writer.checkpoint(resumed / "checkpoint.json")
+    # The shard being written isn't part of the checkpoint.
+    state = srsly.read_json(resumed / "checkpoint.json")["writer"]
+    assert state["size"] == 2
+    assert state["num_shards"] == 1
+
+    with writers.DatasetWriter(resumed, 5, state=state, **options) as writer:
+        for i in range(state["size"], 5):
+            writer.write(*columnar_sample(i))
+
+    assert writer.manifest() == expected
+
+
+def test_dataset_writer_docbin(tmp_path):
+    pytest.importorskip("spacy")
+    with writers.DatasetWriter(
+        tmp_path, 5, shard_size=2, output_format="docbin"
+    ) as writer:
+        for i in range(5):
+            writer.write(*sample(i))
+
+    manifest = writer.manifest()
+    assert [s["dataset"]["path"] for s in manifest["shards"]] == [
+        f"dataset-0000{i}-of-00003.spacy" for i in range(3)
+    ]
+    assert [s["arguments"]["lines"] for s in manifest["shards"]] == [2, 2, 1]
+    srsly.write_json(tmp_path / "manifest.json", manifest)
+    assert writers.verify_manifest(tmp_path, checksums=True) == []